@@ -0,0 +1,89 @@
+"""
+Production entry point:
+
+    python -m app [--workers N] [--loop auto|uvloop|asyncio] [--http auto|httptools|h11]
+
+Every option can also come from the environment (APP_HOST, APP_PORT, APP_WORKERS, APP_LOOP,
+APP_HTTP, APP_BACKLOG, APP_LIMIT_CONCURRENCY, APP_KEEPALIVE_SEC, APP_ACCESS_LOG).
+For local development keep using `uvicorn app.main:app --reload`.
+
+One worker is the default. Candidate sets registered with POST /candidate-sets, the inline
+weighted-set LRU, the signing cache and Merkle batches live in each worker process, so with
+--workers N a candidate_set_id is known only to the worker that registered it. Metrics are
+supported with one worker only: --workers N turns /metrics off (APP_METRICS=0). Scale out
+with one-worker instances, each client sticking to one of them.
+"""
+import argparse
+import importlib.util
+import os
+import sys
+
+import uvicorn
+
+
+def _has(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def _pick(choice: str, fast: str, fallback: str) -> str:
+    if choice != "auto":
+        if choice == fast and not _has(fast):
+            raise SystemExit(f"--{'loop' if fast == 'uvloop' else 'http'} {fast} requested but {fast} is not installed")
+        return choice
+    return fast if _has(fast) else fallback
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(prog="python -m app", description="Re4ctoR Fair Allocation API server")
+    ap.add_argument("--host", default=os.getenv("APP_HOST", "0.0.0.0"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("APP_PORT", "8091")))
+    ap.add_argument("--workers", type=int, default=int(os.getenv("APP_WORKERS", "0")) or 1,
+                    help="worker processes (default 1; state such as registered candidate sets is per worker)")
+    ap.add_argument("--loop", choices=("auto", "uvloop", "asyncio"), default=os.getenv("APP_LOOP", "auto"))
+    ap.add_argument("--http", choices=("auto", "httptools", "h11"), default=os.getenv("APP_HTTP", "auto"))
+    ap.add_argument("--backlog", type=int, default=int(os.getenv("APP_BACKLOG", "2048")))
+    ap.add_argument("--limit-concurrency", type=int, default=int(os.getenv("APP_LIMIT_CONCURRENCY", "0")) or None,
+                    help="per-worker cap on concurrent connections; excess gets 503")
+    ap.add_argument("--keepalive", type=int, default=int(os.getenv("APP_KEEPALIVE_SEC", "5")))
+    ap.add_argument("--access-log", action="store_true", default=os.getenv("APP_ACCESS_LOG", "0") == "1")
+    args = ap.parse_args()
+    if args.workers > 1 and os.getenv("RECEIPT_STORE_DIR", "").strip():
+        # сховище receipts - один процес на каталог (flock); інші воркери впали б на старті
+        raise SystemExit("RECEIPT_STORE_DIR requires --workers 1 (the receipt store allows one process per directory)")
+    if args.workers > 1:
+        print(f"warning: --workers {args.workers}: candidate sets registered with POST /candidate-sets, "
+              "inline weighted sets, the signing cache and Merkle batches are per worker; a candidate_set_id "
+              "may get 404 from another worker", file=sys.stderr)
+        # лічильники кожного воркера окремі: scrape бачив би випадковий воркер, тож /metrics вимикаємо
+        os.environ["APP_METRICS"] = "0"
+        print("warning: /metrics is off with more than one worker (metrics are supported with --workers 1)",
+              file=sys.stderr)
+
+    # кожен воркер uvicorn має власний SignerPool: ділимо ядра, а не множимо (інакше ~cpu² процесів)
+    if not int(os.getenv("RECEIPT_SIGN_WORKERS", "0")):
+        os.environ["RECEIPT_SIGN_WORKERS"] = str(max(1, (os.cpu_count() or 1) // args.workers))
+
+    loop = _pick(args.loop, "uvloop", "asyncio")
+    http = _pick(args.http, "httptools", "h11")
+    print(f"re4ctor-fair-allocation: {args.host}:{args.port} workers={args.workers} "
+          f"sign_workers={os.environ['RECEIPT_SIGN_WORKERS']} loop={loop} http={http} "
+          f"metrics={'on' if os.getenv('APP_METRICS', '1') != '0' else 'off'}")
+
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=loop,
+        http=http,
+        backlog=args.backlog,
+        limit_concurrency=args.limit_concurrency,
+        timeout_keep_alive=args.keepalive,
+        access_log=args.access_log,
+        proxy_headers=True,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from verify.canonical import canonical_sha256
+from verify.merkle import candidate_levels
+from verify.selection import AliasTable, check_weights, weights_sha256
+
+
+def candidate_set_id(sorted_candidates: List[str], weights: Optional[List[int]] = None) -> str:
+    """
+    sha256 hex over the canonical JSON of the lexicographically sorted list, or of
+    {"candidates": sorted, "weights": aligned} for a weighted set.
+    """
+    if weights is None:
+        return canonical_sha256(sorted_candidates).hex()
+    return canonical_sha256({"candidates": sorted_candidates, "weights": weights}).hex()
+
+
+class CandidateSet:
+    __slots__ = ("set_id", "candidates", "index", "weights", "weights_sha256", "_alias", "_levels")
+
+    def __init__(self, set_id: str, candidates: Tuple[str, ...], weights: Optional[Tuple[int, ...]] = None):
+        self.set_id = set_id
+        self.candidates = candidates
+        self.weights = weights
+        self.weights_sha256 = weights_sha256(weights) if weights is not None else None
+        self._alias: Optional[AliasTable] = None
+        self._levels: Optional[List[List[bytes]]] = None
+        # agent_id -> позиція у відсортованому списку (перше входження)
+        self.index: Dict[str, int] = {}
+        for i, c in enumerate(candidates):
+            self.index.setdefault(c, i)
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    def __contains__(self, agent_id: str) -> bool:
+        return agent_id in self.index
+
+    def alias_table(self) -> AliasTable:
+        # будується один раз на набір; гонка між потоками дає ту саму таблицю
+        if self._alias is None:
+            if self.weights is None:
+                raise ValueError("candidate set has no weights")
+            self._alias = AliasTable.build(self.weights)
+        return self._alias
+
+    def merkle_levels(self) -> List[List[bytes]]:
+        # дерево candidates_root - лише для компактних receipts, тож теж лениво (~2n хешів)
+        if self._levels is None:
+            self._levels = candidate_levels(self.candidates)
+        return self._levels
+
+
+class CandidateSetRegistry:
+    """
+    Content-addressed, bounded LRU of pre-sorted candidate sets.
+
+    Bounded both by number of sets (CANDIDATE_SETS_MAX) and by the total number of
+    candidates held (CANDIDATE_SETS_MAX_ITEMS); least recently used sets go first.
+    """
+
+    def __init__(self, max_sets: int = 256, max_items: int = 5_000_000):
+        self.max_sets = max_sets
+        self.max_items = max_items
+        self._sets: "OrderedDict[str, CandidateSet]" = OrderedDict()
+        self._items = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.registrations = 0
+
+    @classmethod
+    def from_env(cls, prefix: str = "CANDIDATE_SETS", max_sets: int = 256,
+                 max_items: int = 5_000_000) -> "CandidateSetRegistry":
+        return cls(
+            max_sets=int(os.getenv(f"{prefix}_MAX", str(max_sets))),
+            max_items=int(os.getenv(f"{prefix}_MAX_ITEMS", str(max_items))),
+        )
+
+    def register(self, candidates: List[str], weights: Optional[List[int]] = None) -> CandidateSet:
+        if not candidates:
+            raise ValueError("candidates must be non-empty")
+        if len(candidates) > self.max_items:
+            raise ValueError(f"candidate set too large: {len(candidates)} > {self.max_items}")
+        if weights is None:
+            ordered = tuple(sorted(candidates))
+            ordered_weights = None
+            set_id = candidate_set_id(list(ordered))
+        else:
+            pairs = sorted(zip(candidates, check_weights(weights, len(candidates))))
+            ordered = tuple(c for c, _ in pairs)
+            ordered_weights = tuple(w for _, w in pairs)
+            set_id = candidate_set_id(list(ordered), list(ordered_weights))
+
+        with self._lock:
+            self.registrations += 1
+            existing = self._sets.get(set_id)
+            if existing is not None:
+                self._sets.move_to_end(set_id)
+                return existing
+
+        cset = CandidateSet(set_id, ordered, ordered_weights)
+        with self._lock:
+            if set_id not in self._sets:
+                self._sets[set_id] = cset
+                self._items += len(cset)
+                self._evict()
+            return self._sets.get(set_id, cset)
+
+    def get(self, set_id: str) -> Optional[CandidateSet]:
+        with self._lock:
+            cset = self._sets.get(set_id)
+            if cset is None:
+                self.misses += 1
+                return None
+            self._sets.move_to_end(set_id)
+            self.hits += 1
+            return cset
+
+    def _evict(self) -> None:
+        while len(self._sets) > 1 and (len(self._sets) > self.max_sets or self._items > self.max_items):
+            _, old = self._sets.popitem(last=False)
+            self._items -= len(old)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "sets": len(self._sets),
+                "items": self._items,
+                "max_sets": self.max_sets,
+                "max_items": self.max_items,
+                "registrations": self.registrations,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+
+DEFAULT_KEY_ID = "default"
+DEFAULT_SK_PATH = "keys/ed25519_sk.bin"
+
+
+def private_key_from_raw(raw: bytes, source: str) -> Ed25519PrivateKey:
+    # 32 байти seed або 64 байти (seed || pk)
+    if len(raw) == 32:
+        return Ed25519PrivateKey.from_private_bytes(raw)
+    if len(raw) == 64:
+        return Ed25519PrivateKey.from_private_bytes(raw[:32])
+    raise ValueError(f"Unsupported key length in {source}: {len(raw)}")
+
+
+def load_private_key(path: str) -> Ed25519PrivateKey:
+    p = Path(path)
+    if not p.exists():
+        raise FileNotFoundError(f"Signing key not found: {path}")
+    return private_key_from_raw(p.read_bytes(), path)
+
+
+def _parse_key_specs(spec: str) -> List[Tuple[str, str]]:
+    """
+    RECEIPT_SIGNER_KEYS="prod=keys/prod_sk.bin,stage=keys/stage_sk.bin"
+    """
+    out = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        key_id, sep, path = item.partition("=")
+        if not sep or not key_id.strip() or not path.strip():
+            raise ValueError(f"Bad RECEIPT_SIGNER_KEYS entry: {item!r} (expected key_id=path)")
+        out.append((key_id.strip(), path.strip()))
+    return out
+
+
+class LoadedKey:
+    __slots__ = ("key_id", "sk", "pubkey_hex", "path", "mtime_ns", "size")
+
+    def __init__(self, key_id: str, sk: Ed25519PrivateKey, path: Optional[str] = None,
+                 mtime_ns: int = 0, size: int = 0):
+        self.key_id = key_id
+        self.sk = sk
+        self.pubkey_hex = sk.public_key().public_bytes_raw().hex()
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+
+    def sign(self, msg_hash: bytes) -> bytes:
+        return self.sk.sign(msg_hash)
+
+
+class KeyManager:
+    """
+    Resident signing keys: parsed once, then served from memory.
+
+    Key sources (in priority order):
+      1) RECEIPT_SIGNER_SK_HEX - hex of the private key (32-byte seed or 64 bytes), key id "default"
+      2) RECEIPT_SIGNER_KEYS - "key_id=path,..." for several keys (per-environment rotation)
+      3) RECEIPT_SIGNER_SK_PATH - bin file (default keys/ed25519_sk.bin), key id "default"
+
+    File-backed keys are re-read only when the file's mtime/size changes; the stat
+    itself is throttled to once per RECEIPT_SIGNER_RELOAD_CHECK_SEC per key.
+    """
+
+    def __init__(self, sk_hex: str = "", key_paths: Optional[Dict[str, str]] = None,
+                 default_key_id: str = DEFAULT_KEY_ID, reload_check_sec: float = 1.0):
+        self.sk_hex = (sk_hex or "").strip()
+        self.key_paths = dict(key_paths or {})
+        self.default_key_id = default_key_id
+        self.reload_check_sec = reload_check_sec
+        self._keys: Dict[str, LoadedKey] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "KeyManager":
+        sk_hex = (os.getenv("RECEIPT_SIGNER_SK_HEX") or "").strip()
+        key_paths = dict(_parse_key_specs(os.getenv("RECEIPT_SIGNER_KEYS", "")))
+        sk_path = os.getenv("RECEIPT_SIGNER_SK_PATH", "")
+        if not sk_hex and DEFAULT_KEY_ID not in key_paths and (sk_path or not key_paths):
+            key_paths[DEFAULT_KEY_ID] = sk_path or DEFAULT_SK_PATH
+        default_key_id = os.getenv("RECEIPT_SIGNER_DEFAULT_KEY_ID", "").strip()
+        if not default_key_id:
+            default_key_id = DEFAULT_KEY_ID if (sk_hex or DEFAULT_KEY_ID in key_paths) else next(iter(key_paths))
+        return cls(
+            sk_hex=sk_hex,
+            key_paths=key_paths,
+            default_key_id=default_key_id,
+            reload_check_sec=float(os.getenv("RECEIPT_SIGNER_RELOAD_CHECK_SEC", "1.0")),
+        )
+
+    def key_ids(self) -> List[str]:
+        ids = list(self.key_paths)
+        if self.sk_hex and DEFAULT_KEY_ID not in ids:
+            ids.insert(0, DEFAULT_KEY_ID)
+        return ids
+
+    def preload(self) -> Dict[str, str]:
+        """Load every configured key; returns {key_id: error} for the ones that failed."""
+        errors = {}
+        for key_id in self.key_ids():
+            try:
+                self.get(key_id)
+            except Exception as e:
+                errors[key_id] = str(e)
+        return errors
+
+    def get(self, key_id: Optional[str] = None) -> LoadedKey:
+        key_id = key_id or self.default_key_id
+        loaded = self._keys.get(key_id)
+        if loaded is not None and loaded.path is None:
+            return loaded
+        if loaded is not None:
+            now = time.monotonic()
+            if now - self._checked_at.get(key_id, 0.0) < self.reload_check_sec:
+                return loaded
+
+        with self._lock:
+            return self._refresh(key_id)
+
+    def _refresh(self, key_id: str) -> LoadedKey:
+        loaded = self._keys.get(key_id)
+
+        if key_id == DEFAULT_KEY_ID and self.sk_hex:
+            if loaded is None:
+                raw = bytes.fromhex(self.sk_hex)
+                if len(raw) not in (32, 64):
+                    raise ValueError("RECEIPT_SIGNER_SK_HEX must be 32 or 64 bytes hex")
+                loaded = LoadedKey(key_id, private_key_from_raw(raw, "RECEIPT_SIGNER_SK_HEX"))
+                self._keys[key_id] = loaded
+            return loaded
+
+        path = self.key_paths.get(key_id)
+        if path is None:
+            raise KeyError(f"Unknown signer key id: {key_id}")
+
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Signing key not found: {path}")
+        self._checked_at[key_id] = time.monotonic()
+
+        if loaded is not None and loaded.mtime_ns == st.st_mtime_ns and loaded.size == st.st_size:
+            return loaded
+
+        loaded = LoadedKey(key_id, load_private_key(path), path=path,
+                           mtime_ns=st.st_mtime_ns, size=st.st_size)
+        self._keys[key_id] = loaded
+        return loaded
@@ -1,151 +1,780 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
-from typing import List, Literal, Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exception_handlers import http_exception_handler, request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from pydantic import ValidationError
+from typing import List, Optional, Sequence, Tuple
 from hashlib import sha256
-from datetime import datetime, timezone
 import json
 import os
-from pathlib import Path
+import time
+
+from app.candidates import CandidateSet, CandidateSetRegistry
+from app.keys import KeyManager
+from app.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    ERRORS,
+    REGISTRY,
+    Counter,
+    Gauge,
+    MetricsMiddleware,
+    observe_candidates,
+    observe_stage,
+)
+from app.models import (
+    AllocateBatchOptions,
+    AllocateBatchRequest,
+    AllocateBatchTask,
+    AllocateRequest,
+    AllocateResponse,
+    AllocationMode,
+    CandidateOrder,
+    CandidateSetRequest,
+    ReceiptSignRequest,
+)
+from app.signer import (
+    SIGNATURE_SCHEMES,
+    BadItem,
+    MerkleBatcher,
+    ReceiptError,
+    SignerBusy,
+    SignerPool,
+    SignExecutor,
+    check_receipt_request,
+    prepare_receipt,
+    resolve_candidate_set,
+    sign_receipt,
+    verify_result,
+)
+from app.sign_cache import SignatureCache
+from app.store import RECEIPT_SHA256_RE, ReceiptStore, StoreError
+from verify.cbor import CBOR_MEDIA_TYPE, CBOR_SEQ_MEDIA_TYPE, CBORIncomplete, canonical_cbor, cbor_loads, decode_item
+from verify.merkle import MERKLE_SIGNATURE_SCHEME
+from verify.selection import RULE_COMMIT, pick_uniform_index, sample_k_indices
+from verify.verify_receipt import load_public_key
+
+
+key_manager = KeyManager.from_env()
+candidate_sets = CandidateSetRegistry.from_env()
+# alias-таблиці inline weighted-запитів: окремий LRU, щоб вони не витісняли зареєстровані набори
+inline_weighted_sets = CandidateSetRegistry.from_env("INLINE_WEIGHTED_SETS", max_sets=64, max_items=1_000_000)
+# None, якщо RECEIPT_SIGN_CACHE=0
+sign_cache = SignatureCache.from_env()
+signer_pool = SignerPool.from_env(key_manager, candidate_sets, sign_cache)
+sign_executor = SignExecutor.from_env()
+merkle_batcher = MerkleBatcher.from_env()
+# None, якщо RECEIPT_STORE_DIR не задано: receipts тоді ніде не зберігаються
+receipt_store = ReceiptStore.from_env()
+
+# ?scheme= за замовчуванням: "ed25519" (підпис на receipt) або "merkle" (підпис на батч)
+DEFAULT_SIGN_SCHEME = os.getenv("RECEIPT_SIGN_SCHEME", "ed25519")
+# ?form= за замовчуванням: "full" (повний candidates) або "compact" (candidates_root + доказ переможця)
+DEFAULT_RECEIPT_FORM = os.getenv("RECEIPT_FORM", "full")
+RECEIPT_FORMS = ("full", "compact")
+# лічильники живуть у процесі: python -m app --workers N (N > 1) вимикає /metrics (APP_METRICS=0)
+METRICS_ENABLED = os.getenv("APP_METRICS", "1") != "0"
+
+# inline-списки, більші за це, сортуємо/хешуємо поза event loop
+INLINE_OFFLOAD_CANDIDATES = 2048
+# CBOR-тіла, більші за це, декодуємо поза event loop (декодер на чистому Python)
+INLINE_OFFLOAD_BODY_BYTES = 256 << 10
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ключі парсимо один раз на старті; помилки повторяться (і стануть 500) на першому /receipt/sign
+    key_manager.preload()
+    if sign_cache is not None:
+        sign_cache.open()
+    if receipt_store is not None:
+        receipt_store.open()
+    yield
+    signer_pool.shutdown()
+    sign_executor.shutdown()
+    if receipt_store is not None:
+        receipt_store.close()
+    if sign_cache is not None:
+        sign_cache.close()
+
+
+app = FastAPI(title="Re4ctoR Fair Allocation API", version="0.1.0", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+
+REGISTRY.register(Gauge(
+    "re4ctor_candidate_sets_cached", "Candidate sets / candidates held by the registry.", ("kind",),
+    callback=lambda: {(k,): v for k, v in candidate_sets.stats().items() if k in ("sets", "items")},
+))
+REGISTRY.register(Counter(
+    "re4ctor_candidate_set_events_total", "Registry events: hits, misses, evictions, registrations.", ("event",),
+    callback=lambda: {(k,): v for k, v in candidate_sets.stats().items()
+                      if k in ("hits", "misses", "evictions", "registrations")},
+))
+REGISTRY.register(Counter(
+    "re4ctor_pubkey_cache_total", "Parsed Ed25519 public key cache lookups in this process.", ("result",),
+    callback=lambda: {("hit",): load_public_key.cache_info().hits, ("miss",): load_public_key.cache_info().misses},
+))
+REGISTRY.register(Gauge(
+    "re4ctor_sign_cache_entries", "Signatures held by the idempotent signing cache.",
+    callback=lambda: {(): sign_cache.stats()["entries"]} if sign_cache else {},
+))
+REGISTRY.register(Counter(
+    "re4ctor_sign_cache_total", "Signing cache lookups and evictions in the server process.", ("event",),
+    callback=lambda: {(k,): v for k, v in sign_cache.stats().items() if k != "entries"} if sign_cache else {},
+))
+REGISTRY.register(Gauge(
+    "re4ctor_receipt_store", "Receipt store: records appended since start, index entries, active segment.",
+    ("kind",),
+    callback=lambda: {(k,): v for k, v in receipt_store.stats().items() if k != "fsyncs"} if receipt_store else {},
+))
+REGISTRY.register(Counter(
+    "re4ctor_receipt_store_fsyncs_total", "Group-commit fsyncs of the receipt store.",
+    callback=lambda: {(): receipt_store.fsyncs} if receipt_store else {},
+))
+REGISTRY.register(Gauge(
+    "re4ctor_sign_inflight", "/receipt/sign jobs queued or running in the sign executor.",
+    callback=lambda: {(): sign_executor.inflight()},
+))
+
+
+# ---------- errors ----------
+class ApiError(HTTPException):
+    """HTTPException with a machine-readable reason code (counted in re4ctor_errors_total)."""
+
+    def __init__(self, status_code: int, reason: str, detail: str):
+        super().__init__(status_code=status_code, detail=detail)
+        self.reason = reason
+
+
+def _route_path(request: Request) -> str:
+    return getattr(request.scope.get("route"), "path", "unmatched")
+
+
+@app.exception_handler(StarletteHTTPException)
+async def _count_http_error(request: Request, exc: StarletteHTTPException):
+    ERRORS.inc(_route_path(request), getattr(exc, "reason", f"http_{exc.status_code}"))
+    return await http_exception_handler(request, exc)
+
+
+@app.exception_handler(RequestValidationError)
+async def _count_validation_error(request: Request, exc: RequestValidationError):
+    ERRORS.inc(_route_path(request), "request_validation")
+    return await request_validation_exception_handler(request, exc)
 
-from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 
+# ---------- helpers ----------
+def _ordered_candidates(candidate_order: CandidateOrder, candidates: List[str]) -> List[str]:
+    if not candidates:
+        raise ApiError(400, "missing_field", "candidates must be non-empty")
+    cands = list(candidates)
+    if candidate_order == "lexicographic":
+        cands.sort()
+    return cands
+
+
+def _get_candidate_set(set_id: str) -> CandidateSet:
+    cset = candidate_sets.get(set_id)
+    if cset is None:
+        raise ApiError(404, "unknown_candidate_set", f"Unknown candidate_set_id: {set_id}")
+    return cset
+
+
+def _request_candidates(candidate_order: CandidateOrder, candidates: Optional[List[str]],
+                        set_id: Optional[str], allocation_mode: AllocationMode = "uniform",
+                        weights: Optional[List[int]] = None) -> Tuple[Sequence[str], Optional[CandidateSet]]:
+    if set_id is not None and candidates is not None:
+        raise ApiError(400, "invalid_request", "Pass either candidates or candidate_set_id, not both")
+
+    if allocation_mode == "weighted":
+        if candidate_order != "lexicographic":
+            raise ApiError(400, "invalid_request", "allocation_mode=weighted requires candidate_order=lexicographic")
+        if set_id is None:
+            if weights is None:
+                raise ApiError(400, "missing_field", "weights are required for allocation_mode=weighted")
+            # inline-набір кешуємо (з alias-таблицею) за хешем набору, але не в candidate_sets:
+            # його id не видається клієнтам і не повинен витісняти явно зареєстровані набори
+            try:
+                cset = inline_weighted_sets.register(candidates or [], weights)
+            except ValueError as e:
+                raise ApiError(400, "bad_weights", str(e))
+        else:
+            if weights is not None:
+                raise ApiError(400, "invalid_request", "Pass either weights or a weighted candidate_set_id, not both")
+            cset = _get_candidate_set(set_id)
+            if cset.weights is None:
+                raise ApiError(400, "bad_weights", "candidate set has no weights")
+        return cset.candidates, cset
+
+    if weights is not None:
+        raise ApiError(400, "invalid_request", "weights require allocation_mode=weighted")
+    if set_id is None:
+        return _ordered_candidates(candidate_order, candidates or []), None
+    if candidate_order != "lexicographic":
+        raise ApiError(400, "invalid_request", "candidate_set_id requires candidate_order=lexicographic")
+    cset = _get_candidate_set(set_id)
+    return cset.candidates, cset
+
+
+def _pick_winner(task_commit_sha256: str, candidates: Sequence[str]) -> str:
+    return candidates[pick_uniform_index(task_commit_sha256, len(candidates))]
+
+
+def _pick_k_winners(task_commit_sha256: str, candidates: Sequence[str], k: int) -> List[str]:
+    return [candidates[i] for i in sample_k_indices(task_commit_sha256, len(candidates), k)]
+
+
+def _check_winners_option(k: Optional[int], allocation_mode: AllocationMode, n: int) -> None:
+    if k is None:
+        return
+    if allocation_mode != "uniform":
+        raise ApiError(400, "bad_winners", "winners is supported only with allocation_mode=uniform")
+    if k > n:
+        raise ApiError(400, "bad_winners", f"winners must be between 1 and {n}")
+
+
+def _pick_weighted_winner(task_commit_sha256: str, cset: CandidateSet) -> str:
+    return cset.candidates[cset.alias_table().pick_index(task_commit_sha256)]
+
+
+def _is_large(candidates: Optional[List[str]]) -> bool:
+    return candidates is not None and len(candidates) > INLINE_OFFLOAD_CANDIDATES
+
+
+# ---------- content negotiation (JSON | CBOR) ----------
+def _is_cbor(content_type: str) -> bool:
+    return "cbor" in content_type
+
+
+def _wants_cbor(request: Request) -> bool:
+    return _is_cbor(request.headers.get("accept", ""))
+
+
+async def _body_object(request: Request):
+    """Request body as JSON, or as CBOR with Content-Type: application/cbor."""
+    body = await request.body()
+    if not _is_cbor(request.headers.get("content-type", "")):
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            raise ApiError(400, "bad_json", f"bad_json: {e}")
+    try:
+        if len(body) > INLINE_OFFLOAD_BODY_BYTES:
+            return await run_in_threadpool(cbor_loads, body)
+        return cbor_loads(body)
+    except ValueError as e:
+        raise ApiError(400, "bad_cbor", f"bad_cbor: {e}")
 
-app = FastAPI(title="Re4ctoR Fair Allocation API", version="0.1.0")
 
+def _negotiated(request: Request, obj):
+    if not _wants_cbor(request):
+        return obj
+    return Response(canonical_cbor(obj), media_type=CBOR_MEDIA_TYPE)
 
-# ---------- models ----------
-CandidateOrder = Literal["as-listed", "lexicographic"]
 
+def _body_schema(model) -> dict:
+    schema = model.model_json_schema()
+    return {"requestBody": {"required": True, "content": {
+        "application/json": {"schema": schema},
+        CBOR_MEDIA_TYPE: {"schema": schema},
+    }}}
 
-class AllocateRequest(BaseModel):
-    task_id: str
-    task_commit_sha256: str = Field(min_length=64, max_length=64)
-    candidate_order: CandidateOrder = "lexicographic"
-    candidates: List[str]
 
+async def _persist(receipt: dict) -> None:
+    """Appends a signed receipt to the store and waits for its group fsync."""
+    if receipt_store is None:
+        return
+    t0 = time.perf_counter()
+    # append може чекати на lock, поки інший потік подвоює індекс, - тож завжди поза event loop
+    try:
+        seq = await run_in_threadpool(receipt_store.append, receipt)
+        await receipt_store.durable(seq)
+    except StoreError as e:
+        raise ApiError(500, "store_error", f"store_error: {e}")
+    observe_stage("persist", t0)
 
-class AllocateResponse(BaseModel):
-    ok: bool = True
-    task_id: str
-    task_commit_sha256: str
-    candidate_order: CandidateOrder
-    candidates: List[str]
-    winner: str
-    note: str
 
+# ---------- routes ----------
+@app.get("/health")
+async def health():
+    return {"ok": True}
 
-class ReceiptSignRequest(BaseModel):
-    task_id: str
-    task_commit_sha256: str
-    candidate_order: CandidateOrder
-    candidates: List[str]
-    winner: str
-    timestamp: Optional[str] = None
-    note: Optional[str] = None
-    # не блокуємо службові поля, якщо прийдуть
-    re4ctor_signature: Optional[dict] = None
-    re4ctor_error: Optional[str] = None
 
+@app.post("/candidate-sets")
+async def candidate_set_register(req: CandidateSetRequest):
+    try:
+        cset = await run_in_threadpool(candidate_sets.register, req.candidates, req.weights)
+    except ValueError as e:
+        raise ApiError(400, "bad_candidate_set", str(e))
+    out = {"ok": True, "candidate_set_id": cset.set_id, "count": len(cset)}
+    if cset.weights is not None:
+        out["weights_sha256"] = cset.weights_sha256
+    return out
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    if not METRICS_ENABLED:
+        raise ApiError(404, "metrics_disabled",
+                       "metrics_disabled: metrics are per process and need one server worker (python -m app --workers 1)")
+    return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/candidate-sets/stats")
+async def candidate_set_stats():
+    return candidate_sets.stats()
+
+
+@app.get("/candidate-sets/{set_id}")
+def candidate_set_get(set_id: str):
+    cset = _get_candidate_set(set_id)
+    out = {"ok": True, "candidate_set_id": cset.set_id, "count": len(cset), "candidates": list(cset.candidates)}
+    if cset.weights is not None:
+        out["weights"] = list(cset.weights)
+        out["weights_sha256"] = cset.weights_sha256
+    return out
+
+
+@app.post("/allocate", response_model=AllocateResponse, response_model_exclude_none=True)
+async def allocate(req: AllocateRequest):
+    if _is_large(req.candidates):
+        return await run_in_threadpool(_allocate, req)
+    return _allocate(req)
+
+
+def _allocate(req: AllocateRequest) -> AllocateResponse:
+    t0 = time.perf_counter()
+    cands, cset = _request_candidates(req.candidate_order, req.candidates, req.candidate_set_id,
+                                      req.allocation_mode, req.weights)
+    _check_winners_option(req.winners, req.allocation_mode, len(cands))
+    t0 = observe_stage("validation", t0)
+    observe_candidates("/allocate", len(cands))
+    weighted = req.allocation_mode == "weighted"
+    winners = None
+    try:
+        if weighted:
+            winner = _pick_weighted_winner(req.task_commit_sha256, cset)
+        elif req.winners is not None:
+            winners = _pick_k_winners(req.task_commit_sha256, cands, req.winners)
+            winner = winners[0]
+        else:
+            winner = _pick_winner(req.task_commit_sha256, cands)
+    except ValueError:
+        # той самий код, що й у рядку /allocate/batch
+        raise ApiError(400, "bad_commit", "bad_commit: task_commit_sha256 must be hex")
+    observe_stage("selection", t0)
+    # для зареєстрованого набору список не повертаємо - клієнт його вже має
+    by_id = req.candidate_set_id is not None
+
+    return AllocateResponse(
+        ok=True,
+        task_id=req.task_id,
+        task_commit_sha256=req.task_commit_sha256,
+        candidate_order=req.candidate_order,
+        candidates=None if by_id else list(cands),
+        candidate_set_id=cset.set_id if by_id else None,
+        allocation_mode="weighted" if weighted else None,
+        weights=list(cset.weights) if weighted and not by_id else None,
+        weights_sha256=cset.weights_sha256 if weighted else None,
+        winner=winner,
+        winners=winners,
+        allocation_rule=RULE_COMMIT,
+        note="deterministic mock allocation",
+    )
+
+
+ALLOCATE_BATCH_CHUNK = 256
 
-# ---------- helpers ----------
-def canonical_bytes(obj) -> bytes:
-    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
 
+def _allocate_line(t: AllocateBatchTask, cands: Sequence[str], cset: Optional[CandidateSet],
+                   k: Optional[int]) -> dict:
+    try:
+        line = {"ok": True, "task_id": t.task_id, "task_commit_sha256": t.task_commit_sha256}
+        if cset is not None:
+            line["winner"] = _pick_weighted_winner(t.task_commit_sha256, cset)
+        elif k is not None:
+            line["winners"] = _pick_k_winners(t.task_commit_sha256, cands, k)
+            line["winner"] = line["winners"][0]
+        else:
+            line["winner"] = _pick_winner(t.task_commit_sha256, cands)
+        return line
+    except ValueError:
+        ERRORS.inc("/allocate/batch", "bad_commit")
+        return {"ok": False, "task_id": t.task_id, "task_commit_sha256": t.task_commit_sha256,
+                "reason": "bad_commit", "error": "task_commit_sha256 must be hex"}
+
+
+def _task_error(reason: str, error: str, task_id=None) -> dict:
+    ERRORS.inc("/allocate/batch", reason)
+    line = {"ok": False, "reason": reason, "error": error}
+    if isinstance(task_id, str):
+        line["task_id"] = task_id
+    return line
+
+
+async def _allocate_batch_lines(tasks, cands: Sequence[str], cset: Optional[CandidateSet] = None,
+                                k: Optional[int] = None):
+    """tasks: async iterator of AllocateBatchTask, or of raw NDJSON lines / CBOR items (parsed here, one at a time)."""
+    chunk = []
+    async for t in tasks:
+        if isinstance(t, AllocateBatchTask):
+            line = _allocate_line(t, cands, cset, k)
+        elif isinstance(t, BadItem):
+            line = _task_error(t.reason, t.error)
+        else:
+            try:
+                obj = json.loads(t) if isinstance(t, bytes) else t
+            except ValueError as e:
+                line = _task_error("bad_json", str(e))
+            else:
+                try:
+                    line = _allocate_line(AllocateBatchTask.model_validate(obj), cands, cset, k)
+                except ValidationError as e:
+                    task_id = obj.get("task_id") if isinstance(obj, dict) else None
+                    err = e.errors(include_url=False)[0]
+                    line = _task_error("invalid_task", f"{'.'.join(map(str, err['loc'])) or 'task'}: {err['msg']}",
+                                       task_id)
+        chunk.append(json.dumps(line, ensure_ascii=False))
+        if len(chunk) >= ALLOCATE_BATCH_CHUNK:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+def _validated(model, obj):
+    try:
+        return model.model_validate(obj)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**err, "loc": ("body",) + tuple(err["loc"])} for err in e.errors(include_url=False)], body=obj)
 
-def _load_signing_key() -> Ed25519PrivateKey:
+
+async def _batch_options(items) -> AllocateBatchOptions:
+    """The first NDJSON line / CBOR item of a streamed /allocate/batch body."""
+    try:
+        first = await items.__anext__()
+    except StopAsyncIteration:
+        raise ApiError(400, "bad_json", "bad_json: empty body; the first line must be the batch options")
+    if isinstance(first, BadItem):
+        raise ApiError(400, first.reason, f"{first.reason}: {first.error}")
+    if isinstance(first, bytes):
+        try:
+            first = json.loads(first)
+        except ValueError as e:
+            raise ApiError(400, "bad_json", f"bad_json: {e}")
+    return _validated(AllocateBatchOptions, first)
+
+
+@app.post("/allocate/batch", openapi_extra=_body_schema(AllocateBatchRequest))
+async def allocate_batch(request: Request):
     """
-    Джерела ключа (у порядку пріоритету):
-      1) RECEIPT_SIGNER_SK_HEX - hex приватного ключа (32 байти seed або 64 байти)
-      2) RECEIPT_SIGNER_SK_PATH - шлях до bin-файлу (за замовчуванням keys/ed25519_sk.bin)
+    One candidate set, many tasks. Candidates are validated/sorted once; results are
+    streamed back as NDJSON (one line per task, input order) while they are computed.
+
+    Body: a JSON (or CBOR) object with tasks, or - for flat memory on large batches -
+    NDJSON (Content-Type: application/x-ndjson) or a CBOR sequence whose first item is
+    the options (the same object without tasks) and every further item one task. A
+    streamed task is parsed only when its turn comes; a bad one gets an error line.
     """
-    sk_hex = (os.getenv("RECEIPT_SIGNER_SK_HEX") or "").strip()
-    if sk_hex:
-        raw = bytes.fromhex(sk_hex)
-        if len(raw) == 32:
-            return Ed25519PrivateKey.from_private_bytes(raw)
-        if len(raw) == 64:
-            return Ed25519PrivateKey.from_private_bytes(raw[:32])
-        raise ValueError("RECEIPT_SIGNER_SK_HEX must be 32 or 64 bytes hex")
+    content_type = request.headers.get("content-type", "")
+    streamed = "ndjson" in content_type or "jsonl" in content_type or CBOR_SEQ_MEDIA_TYPE in content_type
+    if streamed:
+        items = _cbor_seq_items(request) if CBOR_SEQ_MEDIA_TYPE in content_type else _ndjson_lines(request)
+        req = await _batch_options(items)
+        tasks = items
+    else:
+        req = _validated(AllocateBatchRequest, await _body_object(request))
+        tasks = _iter_items(req.tasks)
+    args = (req.candidate_order, req.candidates, req.candidate_set_id, req.allocation_mode, req.weights)
+    if _is_large(req.candidates):
+        cands, cset = await run_in_threadpool(_request_candidates, *args)
+    else:
+        cands, cset = _request_candidates(*args)
+    _check_winners_option(req.winners, req.allocation_mode, len(cands))
+    observe_candidates("/allocate/batch", len(cands))
+    headers = {"X-Candidate-Order": req.candidate_order, "X-Candidates-Count": str(len(cands)),
+               "X-Allocation-Rule": RULE_COMMIT}
+    if req.allocation_mode == "weighted":
+        headers["X-Weights-Sha256"] = cset.weights_sha256
+    else:
+        cset = None
+    # потокове тіло дочитуємо, поки віддаємо відповідь: без слухача disconnect (див. DuplexStreamingResponse)
+    response = DuplexStreamingResponse if streamed else StreamingResponse
+    return response(
+        _allocate_batch_lines(tasks, cands, cset, req.winners),
+        media_type="application/x-ndjson",
+        headers=headers,
+    )
 
-    sk_path = os.getenv("RECEIPT_SIGNER_SK_PATH", "keys/ed25519_sk.bin")
-    p = Path(sk_path)
-    if not p.exists():
-        raise FileNotFoundError(f"Signing key not found: {sk_path}")
-    raw = p.read_bytes()
-    if len(raw) == 32:
-        return Ed25519PrivateKey.from_private_bytes(raw)
-    if len(raw) == 64:
-        return Ed25519PrivateKey.from_private_bytes(raw[:32])
-    raise ValueError(f"Unsupported key length in {sk_path}: {len(raw)}")
 
+def _sign_scheme(scheme: Optional[str]) -> str:
+    name = scheme or DEFAULT_SIGN_SCHEME
+    if name not in SIGNATURE_SCHEMES:
+        raise ApiError(400, "unsupported_scheme",
+                       f"unsupported_scheme: {name} (expected one of {', '.join(SIGNATURE_SCHEMES)})")
+    return SIGNATURE_SCHEMES[name]
 
-def _pubkey_hex_from_sk(sk: Ed25519PrivateKey) -> str:
-    pk = sk.public_key().public_bytes_raw()
-    return pk.hex()
 
+def _compact_form(form: Optional[str]) -> bool:
+    name = form or DEFAULT_RECEIPT_FORM
+    if name not in RECEIPT_FORMS:
+        raise ApiError(400, "unsupported_form", f"unsupported_form: {name} (expected one of {', '.join(RECEIPT_FORMS)})")
+    return name == "compact"
 
-def _pick_winner(task_commit_sha256: str, candidates: List[str]) -> str:
-    idx = int(task_commit_sha256, 16) % len(candidates)
-    return candidates[idx]
 
+@app.post("/receipt/sign", openapi_extra=_body_schema(ReceiptSignRequest))
+async def receipt_sign(request: Request, key_id: Optional[str] = None, scheme: Optional[str] = None,
+                       form: Optional[str] = None):
+    """
+    Body: JSON, or CBOR with Content-Type: application/cbor. Accept: application/cbor
+    returns the signed receipt as canonical CBOR.
+
+    scheme=cbor signs sha256(canonical_cbor(unsigned)) instead of canonical JSON.
+    scheme=merkle: the receipt waits up to RECEIPT_MERKLE_WINDOW_MS for concurrent
+    requests with the same key; the batch root is signed once and every receipt gets
+    its inclusion proof (see docs/protocol.md, 4a).
+    form=compact replaces candidates with candidates_root, candidates_count and the
+    winner's inclusion proof (docs/protocol.md, 4b).
+    """
+    sig_scheme = _sign_scheme(scheme)
+    compact = _compact_form(form)
+    req = _validated(ReceiptSignRequest, await _body_object(request))
+    try:
+        if sig_scheme != MERKLE_SIGNATURE_SCHEME:
+            receipt = await sign_executor.run(_receipt_sign, req, key_id, sig_scheme, compact)
+        else:
+            receipt, msg_hash, key = await sign_executor.run(_receipt_prepare, req, key_id, compact)
+            receipt.update(await merkle_batcher.sign(key, msg_hash))
+    except SignerBusy as e:
+        raise ApiError(503, "signer_busy", f"signer_busy: {e}")
+    await _persist(receipt)
+    return _negotiated(request, receipt)
 
-# ---------- routes ----------
-@app.get("/health")
-def health():
-    return {"ok": True}
 
+def _receipt_sign(req: ReceiptSignRequest, key_id: Optional[str], scheme: str, compact: bool = False) -> dict:
+    cset, key = _receipt_checked(req, key_id, compact)
+    return sign_receipt(req, key, cset, sign_cache, scheme, compact)
 
-@app.post("/allocate", response_model=AllocateResponse)
-def allocate(req: AllocateRequest):
-    if not req.candidates or len(req.candidates) == 0:
-        raise HTTPException(status_code=400, detail="candidates must be non-empty")
 
-    cands = list(req.candidates)
-    if req.candidate_order == "lexicographic":
-        cands = sorted(cands)
+def _receipt_prepare(req: ReceiptSignRequest, key_id: Optional[str], compact: bool = False):
+    cset, key = _receipt_checked(req, key_id, compact)
+    receipt, msg_hash = prepare_receipt(req, cset, compact=compact)
+    return receipt, msg_hash, key
 
-    winner = _pick_winner(req.task_commit_sha256, cands)
 
-    return AllocateResponse(
-        ok=True,
-        task_id=req.task_id,
-        task_commit_sha256=req.task_commit_sha256,
-        candidate_order=req.candidate_order,
-        candidates=cands,
-        winner=winner,
-        note="deterministic mock allocation",
-    )
+def _receipt_checked(req: ReceiptSignRequest, key_id: Optional[str], compact: bool = False):
+    t0 = time.perf_counter()
+    try:
+        cset = resolve_candidate_set(req, candidate_sets)
+        check_receipt_request(req, cset, compact)
+    except ReceiptError as e:
+        raise ApiError(404 if e.reason == "unknown_candidate_set" else 400, e.reason, e.detail)
+    t0 = observe_stage("validation", t0)
+    observe_candidates("/receipt/sign", len(cset) if cset is not None else len(req.candidates))
+
+    try:
+        key = key_manager.get(key_id)
+    except KeyError:
+        raise ApiError(400, "unknown_key_id", f"unknown_key_id: {key_id}")
+    except Exception as e:
+        raise ApiError(500, "signing_key_error", f"signing_key_error: {e}")
+    observe_stage("key_load", t0)
+    return cset, key
 
 
-@app.post("/receipt/sign")
-def receipt_sign(req: ReceiptSignRequest):
-    if req.candidate_order == "lexicographic" and req.candidates != sorted(req.candidates):
-        raise HTTPException(status_code=400, detail="Candidates not lexicographically sorted")
-    if req.winner not in req.candidates:
-        raise HTTPException(status_code=400, detail="Winner is not in candidates list")
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse без слухача http.disconnect: він конкурує з request.stream()
+    за receive(), а нам треба читати NDJSON-тіло, поки віддаємо результати.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            return
+        if self.background is not None:
+            await self.background()
+
+
+async def _ndjson_lines(request: Request):
+    buf = b""
+    async for part in request.stream():
+        buf += part
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buf.strip():
+        yield buf
+
+
+async def _iter_items(items: list):
+    for item in items:
+        yield item
+
+
+async def _cbor_seq_items(request: Request):
+    buf = b""
+    pos = 0
+    async for part in request.stream():
+        buf = buf[pos:] + part
+        pos = 0
+        while pos < len(buf):
+            try:
+                item, pos = decode_item(buf, pos)
+            except CBORIncomplete:
+                break
+            except ValueError as e:
+                # далі в потоці немає меж елементів - решту тіла не розібрати
+                yield BadItem("bad_cbor", str(e))
+                return
+            yield item
+    if pos < len(buf):
+        yield BadItem("bad_cbor", "CBOR: unexpected end of data")
+
+
+async def _batch_items(request: Request):
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return _ndjson_lines(request)
+    if CBOR_SEQ_MEDIA_TYPE in content_type:
+        return _cbor_seq_items(request)
+    if _is_cbor(content_type):
+        body = await _body_object(request)
+        if not isinstance(body, list):
+            raise ApiError(400, "bad_cbor", "expected a CBOR array of receipts")
+        return _iter_items(body)
+    try:
+        body = await request.json()
+    except ValueError:
+        raise ApiError(400, "bad_json", "body must be a JSON array or NDJSON")
+    if not isinstance(body, list):
+        raise ApiError(400, "bad_json", "expected a JSON array of receipts")
+    return _iter_items(body)
 
-    receipt = req.model_dump()
-    if not receipt.get("timestamp"):
-        receipt["timestamp"] = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
-    # приберемо старий підпис, якщо прислали
-    receipt.pop("signature", None)
-    receipt.pop("signer_pubkey_hex", None)
-    receipt.pop("signature_scheme", None)
+async def _ndjson_out(results):
+    async for res in results:
+        yield json.dumps(res, ensure_ascii=False) + "\n"
 
+
+async def _cbor_seq_out(results):
+    async for res in results:
+        yield canonical_cbor(res)
+
+
+def _batch_response(request: Request, results) -> DuplexStreamingResponse:
+    """NDJSON by default; a CBOR sequence (RFC 8742) with Accept: application/cbor-seq."""
+    if _wants_cbor(request):
+        return DuplexStreamingResponse(_cbor_seq_out(results), media_type=CBOR_SEQ_MEDIA_TYPE)
+    return DuplexStreamingResponse(_ndjson_out(results), media_type="application/x-ndjson")
+
+
+@app.post("/receipt/sign/batch")
+async def receipt_sign_batch(request: Request, key_id: Optional[str] = None, scheme: Optional[str] = None,
+                             form: Optional[str] = None):
+    """
+    Body: JSON array of unsigned receipts, or NDJSON (Content-Type: application/x-ndjson).
+    Response: NDJSON, one line per input item in input order:
+      {"index": i, "ok": true, "receipt": {...}} | {"index": i, "ok": false, "reason": "...", "error": "..."}
+    scheme=merkle: one signature per worker chunk (RECEIPT_SIGN_CHUNK receipts).
+    form=compact: as for /receipt/sign.
+    """
+    sig_scheme = _sign_scheme(scheme)
+    compact = _compact_form(form)
+    if key_id is not None and key_id not in key_manager.key_ids():
+        raise ApiError(400, "unknown_key_id", f"unknown_key_id: {key_id}")
+    items = await _batch_items(request)
+    results = signer_pool.sign_stream(items, key_id, sig_scheme, compact)
+    if receipt_store is not None:
+        results = _persisted(results)
+    return _batch_response(request, results)
+
+
+async def _persisted(results):
+    # рядок віддаємо одразу після append; відповідь закінчується, коли fsync покрив увесь батч
+    seq = 0
+    async for res in results:
+        if res.get("ok"):
+            try:
+                seq = await run_in_threadpool(receipt_store.append, res["receipt"])
+            except StoreError as e:
+                res = {"index": res["index"], "ok": False, "reason": "store_error", "error": str(e)}
+        yield res
+    if seq:
+        # fsync не вдався: обриваємо відповідь, щоб клієнт не прийняв батч за збережений
+        await receipt_store.durable(seq)
+
+
+def _stored(request: Request, raw: Optional[bytes], what: str) -> Response:
+    if raw is None:
+        raise ApiError(404, "unknown_receipt", f"unknown_receipt: {what}")
+    headers = {"X-Receipt-Sha256": sha256(raw).hexdigest()}
+    if _wants_cbor(request):
+        return Response(canonical_cbor(json.loads(raw)), media_type=CBOR_MEDIA_TYPE, headers=headers)
+    return Response(raw, media_type="application/json", headers=headers)
+
+
+def _require_store() -> ReceiptStore:
+    if receipt_store is None:
+        raise ApiError(404, "store_disabled", "store_disabled: set RECEIPT_STORE_DIR to keep signed receipts")
+    return receipt_store
+
+
+@app.get("/receipt/by-hash/{receipt_sha256}")
+async def receipt_by_hash(request: Request, receipt_sha256: str):
+    """Stored receipt by sha256 of its canonical JSON (the X-Receipt-Sha256 header of GET /receipt/{task_id})."""
+    store = _require_store()
+    if not RECEIPT_SHA256_RE.fullmatch(receipt_sha256):
+        # не sha256 hex (напр. %C3%A9): такого receipt немає, у сховище не йдемо
+        raise ApiError(404, "unknown_receipt", "unknown_receipt: receipt_sha256 must be 64 hex chars")
     try:
-        sk = _load_signing_key()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"signing_key_error: {e}")
+        return _stored(request, store.get_by_hash(receipt_sha256), receipt_sha256)
+    except StoreError as e:
+        raise ApiError(500, "store_error", f"store_error: {e}")
 
-    unsigned = dict(receipt)
-    msg = canonical_bytes(unsigned)
-    msg_hash = sha256(msg).digest()
-    sig = sk.sign(msg_hash).hex()
-    pk_hex = _pubkey_hex_from_sk(sk)
 
-    receipt["signer_pubkey_hex"] = pk_hex
-    receipt["signature"] = sig
-    receipt["signature_scheme"] = "ed25519(sha256(canonical_json))"
+@app.get("/receipt/{task_id}")
+async def receipt_get(request: Request, task_id: str):
+    """Latest signed receipt for task_id, exactly as stored (canonical JSON)."""
+    store = _require_store()
+    try:
+        return _stored(request, store.get(task_id), task_id)
+    except StoreError as e:
+        raise ApiError(500, "store_error", f"store_error: {e}")
+
+
+@app.post("/receipt/verify", openapi_extra={"requestBody": {"required": True, "content": {
+    "application/json": {"schema": {"type": "object"}}, CBOR_MEDIA_TYPE: {"schema": {"type": "object"}}}}})
+async def receipt_verify(request: Request):
+    """
+    Same rules as verify/verify_receipt.py. Always 200 for a well-formed body:
+      {"valid": true, "task_id": ..., "winner": ...} | {"valid": false, "reason": "...", "error": "..."}
+    Body and response may be CBOR (Content-Type / Accept: application/cbor).
+    """
+    receipt = await _body_object(request)
+    if not isinstance(receipt, dict):
+        raise RequestValidationError([{"type": "dict_type", "loc": ("body",),
+                                       "msg": "Input should be a valid dictionary", "input": receipt}])
+    cands = receipt.get("candidates")
+    if isinstance(cands, list) and _is_large(cands):
+        res = await run_in_threadpool(verify_result, receipt)
+    else:
+        res = verify_result(receipt)
+    if not res["valid"]:
+        ERRORS.inc("/receipt/verify", res["reason"])
+    return _negotiated(request, res)
+
+
+@app.post("/receipt/verify/batch")
+async def receipt_verify_batch(request: Request):
+    """
+    Body: JSON array of signed receipts, or NDJSON. Response: NDJSON in input order,
+    {"index": i, **result} with the same result shape as POST /receipt/verify.
+    """
+    items = await _batch_items(request)
+    return _batch_response(request, signer_pool.verify_stream(items))
 
-    return receipt
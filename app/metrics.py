@@ -0,0 +1,224 @@
+"""
+Minimal in-process metrics with Prometheus text exposition (format 0.0.4).
+
+No prometheus_client dependency: a histogram observation is one bisect over fixed
+buckets plus a few increments under an uncontended lock, cheap enough to leave on.
+Only the server process is counted; batch signing in process mode
+(RECEIPT_SIGN_POOL=process) reports route-level and error metrics, not stage timings.
+Counters live in one process, so metrics are supported with one server worker only:
+python -m app --workers N (N > 1) turns /metrics off (APP_METRICS=0) rather than let each
+scrape show whichever worker answered it.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 3, 10, 30, 100, 300, 1000, 3000, 10_000, 30_000, 100_000, 300_000, 1_000_000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(x: float) -> str:
+    if x == float("inf"):
+        return "+Inf"
+    return repr(float(x)) if isinstance(x, float) else str(x)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Incremented explicitly, or read at scrape time from a callback returning {labels: value}."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        if self._callback is not None:
+            items = sorted(self._callback().items())
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Set explicitly, or computed at scrape time from a callback returning {labels: value}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def set(self, *labels: str, value: float) -> None:
+        self._values[labels] = value
+
+    def render(self) -> List[str]:
+        values = self._callback() if self._callback is not None else dict(self._values)
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}"
+                                for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [counts per bucket (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            s[0][i] += 1
+            s[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._series.items())
+        out = self.header()
+        for labels, (counts, total) in items:
+            acc = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                acc += c
+                le_label = 'le="' + _num(le) + '"'
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le_label)} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(total)}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, labels)} {acc}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "re4ctor_http_request_duration_seconds",
+    "HTTP request latency until the last response byte, by route template.",
+    ("method", "route", "status"),
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "re4ctor_stage_duration_seconds",
+    "Time spent in one processing stage (validation, canonicalization, hashing, signing, key_load, selection, "
+    "persist, candidates_root).",
+    ("stage",),
+))
+ERRORS = REGISTRY.register(Counter(
+    "re4ctor_errors_total",
+    "Rejected requests and batch items by route and reason code.",
+    ("route", "reason"),
+))
+CANDIDATES = REGISTRY.register(Histogram(
+    "re4ctor_candidates",
+    "Candidate-list size per allocation / receipt.",
+    ("route",),
+    buckets=SIZE_BUCKETS,
+))
+CANDIDATES_LAST = REGISTRY.register(Gauge(
+    "re4ctor_candidates_last",
+    "Candidate-list size of the most recent allocation / receipt.",
+    ("route",),
+))
+
+
+def observe_stage(stage: str, started: float) -> float:
+    """Records perf_counter() - started for a stage and returns the new perf_counter()."""
+    now = time.perf_counter()
+    STAGE_SECONDS.observe(now - started, stage)
+    return now
+
+
+def observe_candidates(route: str, n: int) -> None:
+    CANDIDATES.observe(n, route)
+    CANDIDATES_LAST.set(route, value=n)
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    # шаблон маршруту, а не сирий шлях: /candidate-sets/{set_id} - одна серія, не по серії на id
+    return path if path is not None else "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware): does not buffer streaming responses."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = ["500"]
+        done = [False]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                done[0] = True
+                REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], _route_label(scope), status[0])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not done[0]:
+                REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], _route_label(scope), status[0])
@@ -0,0 +1,90 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+
+# ---------- models ----------
+CandidateOrder = Literal["as-listed", "lexicographic"]
+AllocationMode = Literal["uniform", "weighted"]
+
+
+class AllocateRequest(BaseModel):
+    task_id: str
+    task_commit_sha256: str = Field(min_length=64, max_length=64)
+    candidate_order: CandidateOrder = "lexicographic"
+    candidates: Optional[List[str]] = None
+    # замість candidates: id набору, зареєстрованого через POST /candidate-sets
+    candidate_set_id: Optional[str] = None
+    allocation_mode: AllocationMode = "uniform"
+    # weighted: невід'ємні цілі ваги, по одній на кандидата (у порядку candidates)
+    weights: Optional[List[int]] = None
+    # k-of-n: k різних переможців без повторень (лише uniform)
+    winners: Optional[int] = Field(default=None, ge=1)
+
+
+class AllocateResponse(BaseModel):
+    ok: bool = True
+    task_id: str
+    task_commit_sha256: str
+    candidate_order: CandidateOrder
+    candidates: Optional[List[str]] = None
+    candidate_set_id: Optional[str] = None
+    allocation_mode: Optional[AllocationMode] = None
+    weights: Optional[List[int]] = None
+    weights_sha256: Optional[str] = None
+    winner: str
+    winners: Optional[List[str]] = None
+    # версія правила вибору (verify/selection.py): commit-v0 для /allocate
+    allocation_rule: Optional[str] = None
+    note: str
+
+
+class AllocateBatchTask(BaseModel):
+    task_id: str
+    task_commit_sha256: str = Field(min_length=64, max_length=64)
+
+
+class AllocateBatchOptions(BaseModel):
+    # NDJSON / CBOR-seq тіло /allocate/batch: перший елемент - ці опції, далі по задачі на елемент
+    candidate_order: CandidateOrder = "lexicographic"
+    candidates: Optional[List[str]] = None
+    candidate_set_id: Optional[str] = None
+    allocation_mode: AllocationMode = "uniform"
+    weights: Optional[List[int]] = None
+    winners: Optional[int] = Field(default=None, ge=1)
+
+
+class AllocateBatchRequest(AllocateBatchOptions):
+    tasks: List[AllocateBatchTask]
+
+
+class CandidateSetRequest(BaseModel):
+    candidates: List[str]
+    weights: Optional[List[int]] = None
+
+
+class ReceiptSignRequest(BaseModel):
+    task_id: str
+    task_commit_sha256: str
+    candidate_order: CandidateOrder
+    candidates: Optional[List[str]] = None
+    candidate_set_id: Optional[str] = None
+    allocation_mode: Optional[AllocationMode] = None
+    weights: Optional[List[int]] = None
+    weights_sha256: Optional[str] = None
+    winner: str
+    # k-of-n receipt: усі переможці в порядку вибору, winner == winners[0]
+    winners: Optional[List[str]] = None
+    # None: сервер ставить поточний час, тож повтор запиту - вже інший receipt (без попадання в кеш)
+    timestamp: Optional[str] = None
+    note: Optional[str] = None
+    # не блокуємо службові поля, якщо прийдуть
+    re4ctor_signature: Optional[dict] = None
+    # VRF output hash, який підписав re4ctor_signature (перевіряє verify_receipt при VRF_SIGNERS)
+    re4ctor_msg_hash: Optional[str] = None
+    # epoch beacon: переможець з H(seed(commit, epoch) | re4ctor_random), docs/protocol.md 2a
+    epoch: Optional[str] = None
+    re4ctor_random: Optional[str] = None
+    re4ctor_timestamp: Optional[str] = None
+    # commit-v0 | vrf-sha256-v0 | epoch-beacon-v0: за ним верифікатор перераховує переможця
+    allocation_rule: Optional[str] = None
+    re4ctor_error: Optional[str] = None
@@ -0,0 +1,166 @@
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from cryptography.exceptions import InvalidSignature
+
+try:
+    import fcntl
+except ImportError:  # optional (Windows): без блокування файлу
+    fcntl = None
+
+from app.keys import LoadedKey
+from verify.verify_receipt import load_public_key
+
+# msg_hash, raw pubkey, signature, len(key_id); далі key_id (utf-8)
+_RECORD = struct.Struct(">32s32s64sB")
+
+
+class SignatureCache:
+    """
+    Bounded LRU of issued Ed25519 signatures keyed by (key_id, sha256(canonical_json(unsigned))).
+
+    Ed25519 is deterministic: a retried /receipt/sign gets byte-for-byte the same
+    signature from here without signing again. Each entry also remembers the public
+    key, so a rotated key under the same key_id misses instead of returning a stale
+    signature.
+
+    The key covers the whole unsigned receipt, timestamp included: a retry hits only
+    when it repeats the client-supplied timestamp (a server-filled one differs per call).
+
+    With a path, entries are appended to a file and loaded on open(). Loaded
+    entries are verified once, on their first hit. One process writes the file
+    (flock on path + ".lock"); other server processes load it and keep their new
+    entries in memory only.
+    """
+
+    def __init__(self, max_entries: int = 100_000, path: str = ""):
+        self.max_entries = max_entries
+        self.path = path
+        # (key_id, msg_hash) -> (pubkey raw, signature, verified)
+        self._entries: "OrderedDict[Tuple[str, bytes], Tuple[bytes, bytes, bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._file = None
+        self._lock_fd = -1
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, persist: bool = True) -> Optional["SignatureCache"]:
+        max_entries = int(os.getenv("RECEIPT_SIGN_CACHE", "100000"))
+        if max_entries <= 0:
+            return None
+        return cls(max_entries, os.getenv("RECEIPT_SIGN_CACHE_PATH", "").strip() if persist else "")
+
+    # ---------- persistence ----------
+    def open(self) -> "SignatureCache":
+        if not self.path:
+            return self
+        writer = self._acquire()
+        records = 0
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                data = f.read()
+            pos = 0
+            while pos + _RECORD.size <= len(data):
+                msg_hash, pub, sig, n = _RECORD.unpack_from(data, pos)
+                end = pos + _RECORD.size + n
+                if end > len(data):
+                    break  # обірваний останній запис
+                key_id = data[pos + _RECORD.size:end].decode("utf-8", "replace")
+                self._insert((key_id, msg_hash), (pub, sig, False))
+                records += 1
+                pos = end
+        # лічильники рахують лише роботу цього процесу
+        self.evictions = 0
+        if not writer:
+            return self
+        if records > 2 * self.max_entries or records and pos != len(data):
+            self._compact()
+        self._file = open(self.path, "ab")
+        return self
+
+    def _acquire(self) -> bool:
+        """True if this process may append to the file (no other process holds its lock)."""
+        fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+        self._lock_fd = fd
+        return True
+
+    def _compact(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            for (key_id, msg_hash), (pub, sig, _) in self._entries.items():
+                f.write(_pack(key_id, msg_hash, pub, sig))
+        os.replace(tmp, self.path)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._lock_fd >= 0:
+                os.close(self._lock_fd)  # знімає flock
+                self._lock_fd = -1
+
+    # ---------- lookups ----------
+    def sign(self, key: LoadedKey, msg_hash: bytes) -> bytes:
+        """key.sign(msg_hash), served from the cache when this key already signed msg_hash."""
+        cache_key = (key.key_id, msg_hash)
+        pub = bytes.fromhex(key.pubkey_hex)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] != pub:
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+        if entry is not None and (entry[2] or self._check(cache_key, entry, msg_hash)):
+            with self._lock:
+                self.hits += 1
+            return entry[1]
+
+        signature = key.sign(msg_hash)
+        with self._lock:
+            self.misses += 1
+            self._insert(cache_key, (pub, signature, True))
+            if self._file is not None:
+                self._file.write(_pack(key.key_id, msg_hash, pub, signature))
+        return signature
+
+    def _check(self, cache_key: Tuple[str, bytes], entry: Tuple[bytes, bytes, bool], msg_hash: bytes) -> bool:
+        try:
+            load_public_key(entry[0].hex()).verify(entry[1], msg_hash)
+        except (InvalidSignature, ValueError):
+            return False
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries[cache_key] = (entry[0], entry[1], True)
+        return True
+
+    def _insert(self, cache_key: Tuple[str, bytes], value: Tuple[bytes, bytes, bool]) -> None:
+        self._entries[cache_key] = value
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def _pack(key_id: str, msg_hash: bytes, pub: bytes, sig: bytes) -> bytes:
+    raw_id = key_id.encode("utf-8")[:255]
+    return _RECORD.pack(msg_hash, pub, sig, len(raw_id)) + raw_id
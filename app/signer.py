@@ -0,0 +1,623 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from pydantic import ValidationError
+
+from app.candidates import CandidateSet, CandidateSetRegistry
+from app.keys import KeyManager, LoadedKey
+from app.metrics import ERRORS, STAGE_SECONDS, observe_candidates, observe_stage
+from app.models import ReceiptSignRequest
+from app.sign_cache import SignatureCache
+from verify.canonical import canonical_sha256_timed
+from verify.cbor import CBOR_SIGNATURE_SCHEME, canonical_cbor
+from verify.merkle import MERKLE_FIELDS, MERKLE_SIGNATURE_SCHEME, audit_path, candidate_levels, merkle_proofs
+from verify.selection import (
+    ALLOCATION_RULES, RULE_EPOCH, AliasTable, check_rule_shape, check_weights, epoch_draw_sha256, rule_uniform_index,
+    sample_k_indices, weights_sha256,
+)
+from verify.verify_receipt import VerifyError, verify_receipt
+
+
+SIGNATURE_SCHEME = "ed25519(sha256(canonical_json))"
+SIGNATURE_FIELDS = ("signature", "signer_pubkey_hex", "signature_scheme") + MERKLE_FIELDS
+# ?scheme= / RECEIPT_SIGN_SCHEME
+SIGNATURE_SCHEMES = {"ed25519": SIGNATURE_SCHEME, "cbor": CBOR_SIGNATURE_SCHEME, "merkle": MERKLE_SIGNATURE_SCHEME}
+# нові необов'язкові поля не потрапляють у receipt, якщо не задані (старі receipts не змінюються)
+OPTIONAL_RECEIPT_FIELDS = ("candidate_set_id", "allocation_mode", "weights", "weights_sha256", "winners",
+                           "re4ctor_msg_hash", "epoch", "re4ctor_random", "re4ctor_timestamp", "allocation_rule")
+
+
+class ReceiptError(ValueError):
+    def __init__(self, reason: str, detail: str):
+        super().__init__(detail)
+        self.reason = reason
+        self.detail = detail
+
+
+def utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def resolve_candidate_set(req: ReceiptSignRequest,
+                          registry: Optional[CandidateSetRegistry]) -> Optional[CandidateSet]:
+    if req.candidate_set_id is None:
+        if req.candidates is None:
+            raise ReceiptError("missing_field", "candidates or candidate_set_id is required")
+        return None
+    if req.candidates is not None:
+        raise ReceiptError("invalid_receipt", "Pass either candidates or candidate_set_id, not both")
+    if registry is None:
+        raise ReceiptError("unknown_candidate_set", "candidate_set_id is not supported by this signer")
+    cset = registry.get(req.candidate_set_id)
+    if cset is None:
+        raise ReceiptError("unknown_candidate_set", f"Unknown candidate_set_id: {req.candidate_set_id}")
+    return cset
+
+
+def check_receipt_request(req: ReceiptSignRequest, cset: Optional[CandidateSet] = None,
+                          compact: bool = False) -> None:
+    if cset is not None:
+        # зареєстровані набори вже відсортовані; членство - через хеш-індекс
+        if req.candidate_order != "lexicographic":
+            raise ReceiptError("invalid_receipt", "candidate_set_id requires candidate_order=lexicographic")
+        if req.winner not in cset:
+            raise ReceiptError("winner_not_member", "Winner is not in candidates list")
+    else:
+        if req.candidate_order == "lexicographic" and req.candidates != sorted(req.candidates):
+            raise ReceiptError("not_sorted", "Candidates not lexicographically sorted")
+        if req.winner not in req.candidates:
+            raise ReceiptError("winner_not_member", "Winner is not in candidates list")
+    uniform_single = req.winners is None and (req.allocation_mode or "uniform") == "uniform"
+    rule = req.allocation_rule
+    if rule is not None:
+        if rule not in ALLOCATION_RULES:
+            raise ReceiptError("unknown_rule", f"Unknown allocation_rule: {rule!r}")
+        try:
+            check_rule_shape(rule, req.epoch is not None, uniform_single)
+        except ValueError as e:
+            raise ReceiptError("invalid_receipt", str(e))
+    source = draw_source(req)
+    _check_weighted(req, cset, source)
+    _check_multi_winner(req, cset, source)
+    if uniform_single and (req.epoch is not None or rule is not None):
+        cands = cset.candidates if cset is not None else req.candidates
+        try:
+            idx = rule_uniform_index(rule or RULE_EPOCH, source, len(cands), req.re4ctor_random)
+        except ValueError as e:
+            raise ReceiptError("invalid_receipt", str(e))
+        if cands[idx] != req.winner:
+            raise ReceiptError("winner_mismatch", f"Winner does not match the {rule or RULE_EPOCH} draw")
+    if compact:
+        if req.candidate_order != "lexicographic":
+            raise ReceiptError("invalid_receipt", "compact receipts require candidate_order=lexicographic")
+        if (req.allocation_mode or "uniform") != "uniform":
+            raise ReceiptError("invalid_receipt", "compact receipts support only allocation_mode=uniform")
+
+
+def draw_source(req: ReceiptSignRequest) -> str:
+    """task_commit_sha256, or the epoch beacon draw when the request has an epoch (verify_receipt.draw_source)."""
+    if req.epoch is None:
+        return req.task_commit_sha256
+    if not req.epoch or not req.re4ctor_random:
+        raise ReceiptError("invalid_receipt", "an epoch receipt needs a non-empty epoch and re4ctor_random")
+    try:
+        return epoch_draw_sha256(req.task_commit_sha256, req.epoch, req.re4ctor_random)
+    except ValueError:
+        raise ReceiptError("invalid_receipt", "task_commit_sha256 must be hex")
+
+
+def _check_multi_winner(req: ReceiptSignRequest, cset: Optional[CandidateSet], source: str) -> None:
+    if req.winners is None:
+        return
+    if (req.allocation_mode or "uniform") != "uniform":
+        raise ReceiptError("invalid_receipt", "winners is supported only with allocation_mode=uniform")
+    cands = cset.candidates if cset is not None else req.candidates
+    if not req.winners or req.winners[0] != req.winner:
+        raise ReceiptError("invalid_receipt", "winner must equal winners[0]")
+    try:
+        expected = [cands[i] for i in sample_k_indices(source, len(cands), len(req.winners))]
+    except ValueError as e:
+        raise ReceiptError("invalid_receipt", str(e))
+    if expected != req.winners:
+        raise ReceiptError("winner_mismatch", "winners do not match the k-of-n draw")
+
+
+def _check_weighted(req: ReceiptSignRequest, cset: Optional[CandidateSet], source: str) -> None:
+    if (req.allocation_mode or "uniform") != "weighted":
+        if req.weights is not None or req.weights_sha256 is not None:
+            raise ReceiptError("invalid_receipt", "weights require allocation_mode=weighted")
+        return
+    if req.candidate_order != "lexicographic":
+        raise ReceiptError("invalid_receipt", "allocation_mode=weighted requires candidate_order=lexicographic")
+
+    if cset is not None:
+        if cset.weights is None:
+            raise ReceiptError("bad_weights", "candidate set has no weights")
+        if req.weights is not None:
+            raise ReceiptError("invalid_receipt", "Pass either weights or a weighted candidate_set_id, not both")
+        table, digest, cands = cset.alias_table(), cset.weights_sha256, cset.candidates
+    else:
+        try:
+            weights = check_weights(req.weights, len(req.candidates))
+        except ValueError as e:
+            raise ReceiptError("bad_weights", str(e))
+        table, digest, cands = AliasTable.build(weights), weights_sha256(weights), req.candidates
+
+    if req.weights_sha256 is not None and req.weights_sha256 != digest:
+        raise ReceiptError("weights_hash_mismatch", "weights_sha256 does not match weights")
+    try:
+        idx = table.pick_index(source)
+    except ValueError:
+        raise ReceiptError("invalid_receipt", "task_commit_sha256 must be hex")
+    if cands[idx] != req.winner:
+        raise ReceiptError("winner_mismatch", "Winner does not match the weighted draw")
+
+
+def prepare_receipt(req: ReceiptSignRequest, cset: Optional[CandidateSet] = None,
+                    scheme: str = SIGNATURE_SCHEME, compact: bool = False) -> Tuple[dict, bytes]:
+    """
+    Unsigned receipt and its message hash for scheme: sha256(canonical_json), or
+    sha256(canonical_cbor) for CBOR_SIGNATURE_SCHEME. compact replaces candidates with
+    candidates_root and inclusion proofs. The request must have passed
+    check_receipt_request (with the same compact).
+    """
+    receipt = req.model_dump()
+    for k in OPTIONAL_RECEIPT_FIELDS:
+        if receipt.get(k) is None:
+            receipt.pop(k, None)
+    if cset is not None:
+        # у підписаний receipt завжди йде повний список - верифікатору він потрібен
+        receipt["candidates"] = list(cset.candidates)
+        receipt["candidate_set_id"] = cset.set_id
+    if req.allocation_mode == "weighted":
+        if cset is not None:
+            receipt["weights"] = list(cset.weights)
+            receipt["weights_sha256"] = cset.weights_sha256
+        else:
+            receipt["weights_sha256"] = weights_sha256(receipt["weights"])
+    if not receipt.get("timestamp"):
+        receipt["timestamp"] = utc_now_iso()
+    if compact:
+        _compact_candidates(receipt, req, cset)
+
+    # приберемо старий підпис, якщо прислали
+    for k in SIGNATURE_FIELDS:
+        receipt.pop(k, None)
+
+    if scheme == CBOR_SIGNATURE_SCHEME:
+        t0 = time.perf_counter()
+        data = canonical_cbor(receipt)
+        t0 = observe_stage("canonicalization", t0)
+        msg_hash = hashlib.sha256(data).digest()
+        observe_stage("hashing", t0)
+        return receipt, msg_hash
+    msg_hash, encode_sec, hash_sec = canonical_sha256_timed(receipt)
+    STAGE_SECONDS.observe(encode_sec, "canonicalization")
+    STAGE_SECONDS.observe(hash_sec, "hashing")
+    return receipt, msg_hash
+
+
+def _compact_candidates(receipt: dict, req: ReceiptSignRequest, cset: Optional[CandidateSet]) -> None:
+    """candidates -> candidates_root, candidates_count, winner_index, winner_proof (+ winners_proof)."""
+    t0 = time.perf_counter()
+    cands = cset.candidates if cset is not None else req.candidates
+    levels = cset.merkle_levels() if cset is not None else candidate_levels(cands)
+    if req.winners is not None:
+        indices = sample_k_indices(draw_source(req), len(cands), len(req.winners))
+        winner_index = indices[0]
+    else:
+        winner_index = cset.index[req.winner] if cset is not None else cands.index(req.winner)
+    del receipt["candidates"]
+    receipt["candidates_root"] = levels[-1][0].hex()
+    receipt["candidates_count"] = len(cands)
+    receipt["winner_index"] = winner_index
+    receipt["winner_proof"] = [p.hex() for p in audit_path(levels, winner_index)]
+    if req.winners is not None:
+        receipt["winners_proof"] = [[p.hex() for p in audit_path(levels, i)] for i in indices]
+    observe_stage("candidates_root", t0)
+
+
+def sign_receipt(req: ReceiptSignRequest, key: LoadedKey, cset: Optional[CandidateSet] = None,
+                 cache: Optional[SignatureCache] = None, scheme: str = SIGNATURE_SCHEME,
+                 compact: bool = False) -> dict:
+    """Signs a request that already passed check_receipt_request (single-signature schemes)."""
+    receipt, msg_hash = prepare_receipt(req, cset, scheme, compact)
+    return _attach_signature(receipt, msg_hash, key, cache, scheme)
+
+
+def _attach_signature(receipt: dict, msg_hash: bytes, key: LoadedKey,
+                      cache: Optional[SignatureCache] = None, scheme: str = SIGNATURE_SCHEME) -> dict:
+    t0 = time.perf_counter()
+    signature = cache.sign(key, msg_hash) if cache is not None else key.sign(msg_hash)
+    observe_stage("signing", t0)
+    receipt["signer_pubkey_hex"] = key.pubkey_hex
+    receipt["signature"] = signature.hex()
+    receipt["signature_scheme"] = scheme
+    return receipt
+
+
+def merkle_signatures(msg_hashes: Sequence[bytes], key: LoadedKey) -> List[dict]:
+    """One Ed25519 signature over the Merkle root of msg_hashes; signature fields per receipt, in order."""
+    root, paths = merkle_proofs(msg_hashes)
+    t0 = time.perf_counter()
+    signature = key.sign(root).hex()
+    observe_stage("signing", t0)
+    root_hex = root.hex()
+    return [{
+        "signer_pubkey_hex": key.pubkey_hex,
+        "signature": signature,
+        "signature_scheme": MERKLE_SIGNATURE_SCHEME,
+        "merkle_root": root_hex,
+        "merkle_leaf_index": i,
+        "merkle_tree_size": len(msg_hashes),
+        "merkle_path": [p.hex() for p in path],
+    } for i, path in enumerate(paths)]
+
+
+class MerkleBatcher:
+    """
+    Collects msg_hashes of /receipt/sign?scheme=merkle requests per key for up to
+    window_sec (or max_batch receipts), then signs the batch root once. Lives on the
+    event loop; callers await sign() and get the receipt's signature fields.
+    """
+
+    def __init__(self, window_sec: float = 0.002, max_batch: int = 256):
+        self.window_sec = window_sec
+        self.max_batch = max(1, max_batch)
+        # key_id -> (key, [(msg_hash, future)], timer)
+        self._pending: Dict[str, list] = {}
+        self.batches = 0
+        self.receipts = 0
+
+    @classmethod
+    def from_env(cls) -> "MerkleBatcher":
+        return cls(
+            window_sec=float(os.getenv("RECEIPT_MERKLE_WINDOW_MS", "2")) / 1000.0,
+            max_batch=int(os.getenv("RECEIPT_MERKLE_MAX_BATCH", "256")),
+        )
+
+    async def sign(self, key: LoadedKey, msg_hash: bytes) -> dict:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        entry = self._pending.get(key.key_id)
+        if entry is None:
+            timer = loop.call_later(self.window_sec, self._flush, key.key_id)
+            entry = self._pending[key.key_id] = [key, [], timer]
+        entry[1].append((msg_hash, fut))
+        if len(entry[1]) >= self.max_batch:
+            self._flush(key.key_id)
+        return await fut
+
+    def _flush(self, key_id: str) -> None:
+        entry = self._pending.pop(key_id, None)
+        if entry is None:
+            return
+        key, items, timer = entry
+        timer.cancel()
+        try:
+            fields = merkle_signatures([h for h, _ in items], key)
+        except Exception as e:
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        self.batches += 1
+        self.receipts += len(items)
+        for (_, fut), f in zip(items, fields):
+            if not fut.done():
+                fut.set_result(f)
+
+
+# ---------- single-receipt sign executor ----------
+class SignerBusy(RuntimeError):
+    pass
+
+
+class SignExecutor:
+    """
+    Dedicated, bounded executor for the CPU-bound check-canonicalize-hash-sign step of
+    /receipt/sign, so signing does not compete with request parsing for Starlette's
+    shared threadpool. At most max_queue jobs may be queued or running; a request that
+    cannot get a slot within queue_timeout_sec fails fast with SignerBusy (HTTP 503).
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_queue: Optional[int] = None,
+                 queue_timeout_sec: float = 1.0):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.max_queue = max_queue or self.workers * 16
+        self.queue_timeout_sec = queue_timeout_sec
+        self._slots = asyncio.Semaphore(self.max_queue)
+        self._inflight = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls) -> "SignExecutor":
+        return cls(
+            workers=int(os.getenv("RECEIPT_SIGN_THREADS", "0")) or None,
+            max_queue=int(os.getenv("RECEIPT_SIGN_QUEUE", "0")) or None,
+            queue_timeout_sec=float(os.getenv("RECEIPT_SIGN_QUEUE_TIMEOUT_SEC", "1.0")),
+        )
+
+    def inflight(self) -> int:
+        return self._inflight
+
+    async def run(self, fn, *args):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout_sec)
+        except asyncio.TimeoutError:
+            raise SignerBusy("signer queue is full")
+        self._inflight += 1
+        try:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sign")
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._inflight -= 1
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# ---------- batch signing pool ----------
+class BadItem(NamedTuple):
+    """A batch item that could not be decoded upstream (e.g. broken CBOR sequence); becomes an error line."""
+
+    reason: str
+    error: str
+
+
+# Кожен воркер тримає власний KeyManager (ключі не передаються між процесами).
+_worker_keys: Optional[KeyManager] = None
+# кеш підписів воркера - лише в пам'яті: у файл пише тільки головний процес
+_worker_cache: Optional[SignatureCache] = None
+
+
+def _init_worker() -> None:
+    global _worker_keys, _worker_cache
+    _worker_keys = KeyManager.from_env()
+    _worker_keys.preload()
+    _worker_cache = SignatureCache.from_env(persist=False)
+
+
+def _prepare_item(item: Union[bytes, dict], registry: Optional[CandidateSetRegistry],
+                  scheme: str = SIGNATURE_SCHEME, compact: bool = False) -> dict:
+    """{"ok": True, "receipt": unsigned, "msg_hash": ...} or an error result."""
+    if isinstance(item, BadItem):
+        return {"ok": False, "reason": item.reason, "error": item.error}
+    try:
+        obj = json.loads(item) if isinstance(item, (bytes, str)) else item
+        t0 = time.perf_counter()
+        req = ReceiptSignRequest.model_validate(obj)
+        cset = resolve_candidate_set(req, registry)
+        check_receipt_request(req, cset, compact)
+        observe_stage("validation", t0)
+        observe_candidates("/receipt/sign/batch", len(cset) if cset is not None else len(req.candidates))
+        receipt, msg_hash = prepare_receipt(req, cset, scheme, compact)
+        return {"ok": True, "receipt": receipt, "msg_hash": msg_hash}
+    except ReceiptError as e:
+        return {"ok": False, "reason": e.reason, "error": _text(e.detail)}
+    except json.JSONDecodeError as e:
+        return {"ok": False, "reason": "bad_json", "error": str(e)}
+    except ValidationError as e:
+        return {"ok": False, "reason": "invalid_receipt", "error": str(e.errors(include_url=False))}
+    except Exception as e:
+        # один поганий елемент (напр. "\ud800" у рядку) не повинен обривати весь потік
+        return {"ok": False, "reason": "invalid_item", "error": _item_error(e)}
+
+
+def _item_error(e: Exception) -> str:
+    return _text(f"{type(e).__name__}: {e}")
+
+
+def _text(s: str) -> str:
+    # повідомлення можуть цитувати вхід; відповідь мусить лишитися валідним UTF-8
+    return s.encode("utf-8", "backslashreplace").decode("utf-8")
+
+
+def _sign_item(item: Union[bytes, dict], key: LoadedKey, registry: Optional[CandidateSetRegistry],
+               cache: Optional[SignatureCache] = None, scheme: str = SIGNATURE_SCHEME,
+               compact: bool = False) -> dict:
+    res = _prepare_item(item, registry, scheme, compact)
+    if res["ok"]:
+        try:
+            _attach_signature(res["receipt"], res.pop("msg_hash"), key, cache, scheme)
+        except Exception as e:
+            return {"ok": False, "reason": "signing_error", "error": _item_error(e)}
+    return res
+
+
+def _sign_chunk_merkle(items: List[Union[bytes, dict]], key: LoadedKey,
+                       registry: Optional[CandidateSetRegistry], compact: bool = False) -> List[dict]:
+    # дерево на чанк: один підпис на RECEIPT_SIGN_CHUNK receipts
+    out = [_prepare_item(item, registry, SIGNATURE_SCHEME, compact) for item in items]
+    ok = [i for i, res in enumerate(out) if res["ok"]]
+    if ok:
+        try:
+            signatures = merkle_signatures([out[i].pop("msg_hash") for i in ok], key)
+        except Exception as e:
+            err = {"ok": False, "reason": "signing_error", "error": _item_error(e)}
+            for i in ok:
+                out[i] = dict(err)
+            return out
+        for i, fields in zip(ok, signatures):
+            out[i]["receipt"].update(fields)
+    return out
+
+
+def _sign_chunk(items: List[Union[bytes, dict]], key_id: Optional[str],
+                key_manager: Optional[KeyManager] = None,
+                registry: Optional[CandidateSetRegistry] = None,
+                scheme: str = SIGNATURE_SCHEME,
+                cache: Optional[SignatureCache] = None,
+                compact: bool = False) -> List[dict]:
+    km = key_manager or _worker_keys
+    if key_manager is None:
+        cache = _worker_cache
+    try:
+        t0 = time.perf_counter()
+        key = km.get(key_id)
+        observe_stage("key_load", t0)
+    except Exception as e:
+        err = {"ok": False, "reason": "signing_key_error", "error": str(e)}
+        return [dict(err) for _ in items]
+    if scheme == MERKLE_SIGNATURE_SCHEME:
+        return _sign_chunk_merkle(items, key, registry, compact)
+    return [_sign_item(item, key, registry, cache, scheme, compact) for item in items]
+
+
+def verify_result(receipt) -> dict:
+    """verify_receipt as a result dict: {"valid": true, ...summary} | {"valid": false, "reason", "error"}."""
+    try:
+        summary = verify_receipt(receipt)
+    except VerifyError as e:
+        return {"valid": False, "reason": e.reason, "error": _text(str(e))}
+    except Exception as e:
+        # будь-яка інша вада receipt (рядок поза UTF-8, поле не того типу): 200 + invalid_receipt,
+        # як і в /receipt/verify/batch, а не 500
+        return {"valid": False, "reason": "invalid_receipt", "error": _item_error(e)}
+    return {"valid": True, **{k: v for k, v in summary.items() if v is not None}}
+
+
+def _verify_item(item: Union[bytes, dict]) -> dict:
+    if isinstance(item, BadItem):
+        return {"valid": False, "reason": item.reason, "error": item.error}
+    try:
+        receipt = json.loads(item) if isinstance(item, (bytes, str)) else item
+    except json.JSONDecodeError as e:
+        return {"valid": False, "reason": "bad_json", "error": str(e)}
+    except Exception as e:
+        return {"valid": False, "reason": "invalid_item", "error": _item_error(e)}
+    try:
+        return verify_result(receipt)
+    except Exception as e:
+        return {"valid": False, "reason": "invalid_item", "error": _item_error(e)}
+
+
+def _verify_chunk(items: List[Union[bytes, dict]]) -> List[dict]:
+    return [_verify_item(item) for item in items]
+
+
+class SignerPool:
+    """
+    Dedicated pool for batch canonicalize-hash-sign (and batch verification).
+
+    mode="process" (default) runs a ProcessPoolExecutor sized to the machine's cores;
+    mode="thread" shares the server's KeyManager and candidate-set registry (so
+    candidate_set_id works only in thread mode). Items are dispatched in chunks and at
+    most max_inflight chunks are queued at a time, so a large NDJSON upload is read
+    only as fast as it is signed. Results come back in input order.
+    """
+
+    def __init__(self, key_manager: KeyManager, workers: Optional[int] = None, mode: str = "process",
+                 chunk_size: int = 64, max_inflight: Optional[int] = None,
+                 registry: Optional[CandidateSetRegistry] = None, cache: Optional[SignatureCache] = None):
+        if mode not in ("process", "thread"):
+            raise ValueError(f"Unsupported signer pool mode: {mode!r}")
+        self.key_manager = key_manager
+        self.registry = registry
+        # thread mode: спільний кеш сервера; process mode: кожен воркер має свій (див. _init_worker)
+        self.cache = cache
+        self.workers = workers or os.cpu_count() or 1
+        self.mode = mode
+        self.chunk_size = max(1, chunk_size)
+        self.max_inflight = max_inflight or self.workers * 4
+        self._executor: Optional[Executor] = None
+
+    @classmethod
+    def from_env(cls, key_manager: KeyManager, registry: Optional[CandidateSetRegistry] = None,
+                 cache: Optional[SignatureCache] = None) -> "SignerPool":
+        return cls(
+            key_manager,
+            registry=registry,
+            cache=cache,
+            workers=int(os.getenv("RECEIPT_SIGN_WORKERS", "0")) or None,
+            mode=os.getenv("RECEIPT_SIGN_POOL", "process"),
+            chunk_size=int(os.getenv("RECEIPT_SIGN_CHUNK", "64")),
+            max_inflight=int(os.getenv("RECEIPT_SIGN_MAX_INFLIGHT", "0")) or None,
+        )
+
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="signer")
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _submit(self, chunk: List[Union[bytes, dict]], key_id: Optional[str], scheme: str,
+                compact: bool = False) -> asyncio.Future:
+        ex = self.executor()
+        if self.mode == "process":
+            fut = ex.submit(_sign_chunk, chunk, key_id, None, None, scheme, None, compact)
+        else:
+            fut = ex.submit(_sign_chunk, chunk, key_id, self.key_manager, self.registry, scheme, self.cache, compact)
+        return asyncio.wrap_future(fut)
+
+    def _submit_verify(self, chunk: List[Union[bytes, dict]]) -> asyncio.Future:
+        return asyncio.wrap_future(self.executor().submit(_verify_chunk, chunk))
+
+    async def sign_stream(self, items: AsyncIterator[Union[bytes, dict]], key_id: Optional[str] = None,
+                          scheme: str = SIGNATURE_SCHEME, compact: bool = False) -> AsyncIterator[dict]:
+        async for res in self._stream(items, lambda chunk: self._submit(chunk, key_id, scheme, compact),
+                                      "/receipt/sign/batch"):
+            yield res
+
+    async def verify_stream(self, items: AsyncIterator[Union[bytes, dict]]) -> AsyncIterator[dict]:
+        async for res in self._stream(items, self._submit_verify, "/receipt/verify/batch", "valid"):
+            yield res
+
+    async def _stream(self, items: AsyncIterator[Union[bytes, dict]],
+                      submit: Callable[[List[Union[bytes, dict]]], asyncio.Future],
+                      route: str, ok_key: str = "ok") -> AsyncIterator[dict]:
+        pending = deque()
+        chunk = []
+        index = 0
+
+        async def drain_one():
+            nonlocal index
+            fut, n = pending.popleft()
+            try:
+                results = await fut
+            except Exception as e:
+                # впав увесь чанк (напр. BrokenProcessPool): по рядку помилки на кожен елемент
+                results = [{ok_key: False, "reason": "worker_error", "error": _item_error(e)}] * n
+            for res in results:
+                if "reason" in res:
+                    # рахуємо тут, а не у воркері: у process-режимі лічильники воркерів не видно
+                    ERRORS.inc(route, res["reason"])
+                yield {"index": index, **res}
+                index += 1
+
+        async for item in items:
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                pending.append((submit(chunk), len(chunk)))
+                chunk = []
+                while len(pending) >= self.max_inflight:
+                    async for res in drain_one():
+                        yield res
+        if chunk:
+            pending.append((submit(chunk), len(chunk)))
+        while pending:
+            async for res in drain_one():
+                yield res
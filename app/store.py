@@ -0,0 +1,495 @@
+"""
+Append-only receipt store: every signed receipt, immutable, for dispute resolution.
+
+Layout of RECEIPT_STORE_DIR:
+  receipts-00000001.seg, ...  records: u32 length | u32 crc32 | canonical JSON (big-endian)
+  index.bin                   open-addressing hash table, memory-mapped:
+                              sha256("t:" task_id)[:16] and sha256("h:" receipt_sha256)[:16]
+                              -> (segment, offset, length)
+
+Writes go to the active segment with one os.write per record; a segment rolls over
+once it reaches RECEIPT_STORE_SEGMENT_MB. A flusher thread fsyncs the active segment
+at most every RECEIPT_STORE_FSYNC_MS (group commit), and callers await durable(seq).
+
+A receipt whose sha256 is already indexed (a retried /receipt/sign) is not appended again.
+
+The index is only trusted after a clean close(). After a crash it is rebuilt from
+the segments; a torn record at the tail of the last segment is cut off.
+
+One process per directory: open() takes an exclusive flock on LOCK and fails with
+StoreError while another process holds it (e.g. a second uvicorn worker).
+"""
+import asyncio
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from hashlib import sha256
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from verify.canonical import canonical_bytes
+
+try:
+    import fcntl
+except ImportError:  # optional (Windows): без блокування каталогу
+    fcntl = None
+
+_RECORD = struct.Struct(">II")            # length, crc32(payload)
+_HEADER = struct.Struct(">8sQQIQB")       # magic, capacity, count, end segment, end offset, clean
+_SLOT = struct.Struct(">16sIQI")          # key, segment, offset, length
+HEADER_SIZE = 64
+INDEX_MAGIC = b"R4RIDX01"
+INDEX_NAME = "index.bin"
+LOCK_NAME = "LOCK"
+INITIAL_SLOTS = 1 << 16
+MAX_LOAD = 0.6
+_SEGMENT_RE = re.compile(r"^receipts-(\d{8})\.seg$")
+RECEIPT_SHA256_RE = re.compile(r"[0-9a-fA-F]{64}")
+_EMPTY = bytes(16)
+
+
+class StoreError(RuntimeError):
+    pass
+
+
+def _segment_name(n: int) -> str:
+    return f"receipts-{n:08d}.seg"
+
+
+def _task_key(task_id: str) -> bytes:
+    return sha256(b"t:" + task_id.encode("utf-8")).digest()[:16]
+
+
+def _hash_key(receipt_sha256: str) -> bytes:
+    return sha256(b"h:" + receipt_sha256.lower().encode("ascii")).digest()[:16]
+
+
+class _Index:
+    """Fixed-size slots in an mmap; linear probing; doubles (rewrite + rename) above MAX_LOAD."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = -1
+        self.mm: Optional[mmap.mmap] = None
+        self.capacity = 0
+        self.count = 0
+
+    # ---------- file ----------
+    def open(self) -> bool:
+        """Maps an existing index; False if it is missing, damaged or was not closed cleanly."""
+        try:
+            fd = os.open(self.path, os.O_RDWR)
+        except FileNotFoundError:
+            return False
+        size = os.fstat(fd).st_size
+        if size < HEADER_SIZE:
+            os.close(fd)
+            return False
+        self.fd = fd
+        self.mm = mmap.mmap(fd, size)
+        magic, capacity, count, _, _, clean = _HEADER.unpack_from(self.mm, 0)
+        if magic != INDEX_MAGIC or size != HEADER_SIZE + capacity * _SLOT.size or not clean:
+            self.close()
+            return False
+        self.capacity, self.count = capacity, count
+        return True
+
+    def create(self, capacity: int = INITIAL_SLOTS) -> None:
+        self.close()
+        tmp = self.path + ".tmp"
+        self._write_empty(tmp, capacity)
+        os.replace(tmp, self.path)
+        self._map(capacity, 0)
+
+    def _write_empty(self, path: str, capacity: int) -> None:
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(INDEX_MAGIC, capacity, 0, 0, 0, 0).ljust(HEADER_SIZE, b"\0"))
+            f.truncate(HEADER_SIZE + capacity * _SLOT.size)
+
+    def _map(self, capacity: int, count: int) -> None:
+        self.fd = os.open(self.path, os.O_RDWR)
+        self.mm = mmap.mmap(self.fd, HEADER_SIZE + capacity * _SLOT.size)
+        self.capacity, self.count = capacity, count
+
+    def mark(self, clean: bool, end: Tuple[int, int] = (0, 0)) -> None:
+        _HEADER.pack_into(self.mm, 0, INDEX_MAGIC, self.capacity, self.count, end[0], end[1], int(clean))
+        self.mm.flush()
+
+    def end(self) -> Tuple[int, int]:
+        _, _, _, seg, off, _ = _HEADER.unpack_from(self.mm, 0)
+        return seg, off
+
+    def close(self) -> None:
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    # ---------- slots ----------
+    def _probe(self, key: bytes) -> Tuple[int, bool]:
+        mask = self.capacity - 1
+        i = int.from_bytes(key[:8], "big") & mask
+        while True:
+            at = HEADER_SIZE + i * _SLOT.size
+            k = self.mm[at:at + 16]
+            if k == key:
+                return at, True
+            if k == _EMPTY:
+                return at, False
+            i = (i + 1) & mask
+
+    def get(self, key: bytes) -> Optional[Tuple[int, int, int]]:
+        at, found = self._probe(key)
+        if not found:
+            return None
+        _, seg, off, length = _SLOT.unpack_from(self.mm, at)
+        return seg, off, length
+
+    def put(self, key: bytes, seg: int, off: int, length: int) -> None:
+        if (self.count + 1) > self.capacity * MAX_LOAD:
+            self._grow()
+        at, found = self._probe(key)
+        _SLOT.pack_into(self.mm, at, key, seg, off, length)
+        if not found:
+            self.count += 1
+
+    def _grow(self) -> None:
+        old_mm, old_capacity = self.mm, self.capacity
+        tmp = self.path + ".tmp"
+        capacity = old_capacity * 2
+        self._write_empty(tmp, capacity)
+        new = _Index(tmp)
+        new._map(capacity, 0)
+        for i in range(old_capacity):
+            at = HEADER_SIZE + i * _SLOT.size
+            key, seg, off, length = _SLOT.unpack_from(old_mm, at)
+            if key != _EMPTY:
+                new.put(key, seg, off, length)
+        count = new.count
+        new.mark(clean=False)
+        new.close()
+        self.close()
+        os.replace(tmp, self.path)
+        self._map(capacity, count)
+
+
+class ReceiptStore:
+    def __init__(self, directory: str, segment_bytes: int = 64 << 20, fsync_interval: float = 0.005):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._index = _Index(os.path.join(directory, INDEX_NAME))
+        self._lock_fd = -1
+        self._segment = 0
+        self._offset = 0
+        self._fd = -1
+        self._retired: List[int] = []          # fds of rolled-over segments, fsync + close in the flusher
+        self._readers: Dict[int, int] = {}
+        self._written = 0                      # seq: bytes appended since open
+        self._synced = 0
+        self._waiters: List[Tuple[int, asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._flusher: Optional[threading.Thread] = None
+        self._failure: Optional[str] = None      # помилка fsync: далі store лише відмовляє
+        self._closed = True
+        self.appended = 0
+        self.fsyncs = 0
+        self.rebuilt = False
+
+    @classmethod
+    def from_env(cls) -> Optional["ReceiptStore"]:
+        directory = os.getenv("RECEIPT_STORE_DIR", "").strip()
+        if not directory:
+            return None
+        return cls(
+            directory,
+            segment_bytes=int(float(os.getenv("RECEIPT_STORE_SEGMENT_MB", "64")) * (1 << 20)),
+            fsync_interval=float(os.getenv("RECEIPT_STORE_FSYNC_MS", "5")) / 1000.0,
+        )
+
+    # ---------- open / recovery ----------
+    def segments(self) -> List[int]:
+        out = []
+        for name in os.listdir(self.directory):
+            m = _SEGMENT_RE.match(name)
+            if m:
+                out.append(int(m.group(1)))
+        return sorted(out)
+
+    def _path(self, seg: int) -> str:
+        return os.path.join(self.directory, _segment_name(seg))
+
+    def _acquire(self) -> None:
+        fd = os.open(os.path.join(self.directory, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                holder = os.pread(fd, 32, 0).decode("ascii", "replace").strip() or "?"
+                os.close(fd)
+                raise StoreError(f"{self.directory} is in use by another process (pid {holder}); "
+                                 "every server process needs its own RECEIPT_STORE_DIR (run with --workers 1)")
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, f"{os.getpid()}\n".encode("ascii"), 0)
+        self._lock_fd = fd
+
+    def _release(self) -> None:
+        if self._lock_fd >= 0:
+            os.close(self._lock_fd)  # знімає flock
+            self._lock_fd = -1
+
+    def open(self) -> "ReceiptStore":
+        os.makedirs(self.directory, exist_ok=True)
+        self._acquire()
+        try:
+            self._open()
+        except BaseException:
+            self._index.close()
+            self._release()
+            raise
+        return self
+
+    def _open(self) -> None:
+        segs = self.segments()
+        last = segs[-1] if segs else 1
+        size = os.path.getsize(self._path(last)) if segs else 0
+
+        if not (self._index.open() and self._index.end() == (last if segs else 0, size)):
+            self.rebuild()
+            segs = self.segments()
+            last = segs[-1] if segs else 1
+            size = os.path.getsize(self._path(last)) if segs else 0
+
+        self._segment, self._offset = last, size
+        self._fd = os.open(self._path(last), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        # до чистого close() індекс вважається брудним: після аварії його перебудують
+        self._index.mark(clean=False)
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="receipt-store-fsync", daemon=True)
+        self._flusher.start()
+
+    def rebuild(self) -> int:
+        """Recreates the index from the segments; returns the number of records indexed."""
+        self.rebuilt = True
+        self._index.create()
+        segs = self.segments()
+        n = 0
+        seg, good = 0, 0
+        for seg in segs:
+            good = 0
+            for off, payload in self._scan(seg):
+                self._index_record(payload, seg, off)
+                good = off + _RECORD.size + len(payload)
+                n += 1
+            size = os.path.getsize(self._path(seg))
+            if good != size:
+                if seg != segs[-1]:
+                    raise StoreError(f"{_segment_name(seg)}: damaged record at offset {good}")
+                # обірваний запис у хвості останнього сегмента: його не підтверджено fsync
+                with open(self._path(seg), "r+b") as f:
+                    f.truncate(good)
+                    os.fsync(f.fileno())
+        self._index.mark(clean=False, end=(seg, good))
+        return n
+
+    def _scan(self, seg: int) -> Iterator[Tuple[int, bytes]]:
+        with open(self._path(seg), "rb") as f:
+            off = 0
+            while True:
+                head = f.read(_RECORD.size)
+                if len(head) < _RECORD.size:
+                    return
+                length, crc = _RECORD.unpack(head)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    return
+                yield off, payload
+                off += _RECORD.size + length
+
+    def _index_record(self, payload: bytes, seg: int, off: int) -> None:
+        task_id = json.loads(payload).get("task_id")
+        if isinstance(task_id, str):
+            self._index.put(_task_key(task_id), seg, off, len(payload))
+        self._index.put(_hash_key(sha256(payload).hexdigest()), seg, off, len(payload))
+
+    # ---------- writes ----------
+    def append(self, receipt: dict) -> int:
+        """
+        Appends a signed receipt; returns a seq for durable(). Blocking (the index
+        occasionally doubles in O(capacity)): call it off the event loop.
+        """
+        payload = canonical_bytes(receipt)
+        record = _RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+        task_key = _task_key(receipt["task_id"]) if isinstance(receipt.get("task_id"), str) else None
+        hash_key = _hash_key(sha256(payload).hexdigest())
+        with self._lock:
+            if self._closed:
+                raise StoreError("receipt store is closed")
+            self._check_failure()
+            if self._index.get(hash_key) is not None:
+                # той самий receipt уже є (повтор /receipt/sign): лише чекаємо його fsync
+                return self._written
+            if self._offset and self._offset + len(record) > self.segment_bytes:
+                self._roll()
+            off = self._offset
+            os.write(self._fd, record)
+            self._offset += len(record)
+            if task_key is not None:
+                self._index.put(task_key, self._segment, off, len(payload))
+            self._index.put(hash_key, self._segment, off, len(payload))
+            self.appended += 1
+            self._written += len(record)
+            self._cond.notify()
+            return self._written
+
+    def _roll(self) -> None:
+        self._retired.append(self._fd)
+        self._segment += 1
+        self._offset = 0
+        self._fd = os.open(self._path(self._segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    async def durable(self, seq: int) -> None:
+        """Returns once everything up to seq is fsynced."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if seq <= self._synced:
+                return
+            self._check_failure()
+            fut = loop.create_future()
+            self._waiters.append((seq, loop, fut))
+        await fut
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._lock:
+                while self._written == self._synced and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            # вікно групового коміту: один fsync на всі записи, що встигли прийти
+            if self.fsync_interval > 0:
+                time.sleep(self.fsync_interval)
+            with self._lock:
+                if self._closed:
+                    return
+                target, fd, retired = self._written, self._fd, self._retired
+                self._retired = []
+            try:
+                self._sync(retired, fd)
+            except OSError as e:
+                self._fail(e)
+                return
+            with self._lock:
+                self._synced = target
+                ready = [w for w in self._waiters if w[0] <= target]
+                self._waiters = [w for w in self._waiters if w[0] > target]
+            for _, loop, fut in ready:
+                loop.call_soon_threadsafe(_resolve, fut)
+
+    def _check_failure(self) -> None:
+        if self._failure is not None:
+            raise StoreError(self._failure)
+
+    def _fail(self, e: OSError) -> None:
+        # після невдалого fsync (EIO, ENOSPC) не відомо, що з даних дійшло до диска; повторний
+        # fsync може «успішно» загубити сторінки, тож store лише відмовляє до перезапуску
+        with self._lock:
+            self._failure = f"fsync failed, the store refuses writes until restart: {e}"
+            waiters, self._waiters = self._waiters, []
+        for _, loop, fut in waiters:
+            loop.call_soon_threadsafe(_reject, fut, StoreError(self._failure))
+
+    def _sync(self, retired: List[int], fd: int) -> None:
+        try:
+            for old in retired:
+                os.fsync(old)
+            os.fsync(fd)
+        finally:
+            for old in retired:
+                os.close(old)
+        self.fsyncs += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+        if self._failure is None:
+            try:
+                self._sync(self._retired, self._fd)
+            except OSError as e:
+                self._fail(e)
+        else:
+            for old in self._retired:
+                os.close(old)
+        self._retired = []
+        os.close(self._fd)
+        self._fd = -1
+        for fd in self._readers.values():
+            os.close(fd)
+        self._readers.clear()
+        for _, loop, fut in self._waiters:
+            loop.call_soon_threadsafe(_resolve, fut)
+        self._waiters = []
+        # без підтвердженого fsync індекс лишається брудним: наступний open() його перебудує
+        self._index.mark(clean=self._failure is None, end=(self._segment, self._offset))
+        self._index.close()
+        self._release()
+
+    # ---------- reads ----------
+    def get(self, task_id: str) -> Optional[bytes]:
+        """Canonical JSON of the latest receipt stored for task_id."""
+        return self._read(_task_key(task_id))
+
+    def get_by_hash(self, receipt_sha256: str) -> Optional[bytes]:
+        """Canonical JSON of the receipt whose sha256(canonical_json(signed receipt)) is receipt_sha256."""
+        if not isinstance(receipt_sha256, str) or not RECEIPT_SHA256_RE.fullmatch(receipt_sha256):
+            return None
+        return self._read(_hash_key(receipt_sha256))
+
+    def _read(self, key: bytes) -> Optional[bytes]:
+        with self._lock:
+            if self._closed:
+                raise StoreError("receipt store is closed")
+            loc = self._index.get(key)
+            if loc is None:
+                return None
+            seg, off, length = loc
+            fd = self._readers.get(seg)
+            if fd is None:
+                fd = self._readers[seg] = os.open(self._path(seg), os.O_RDONLY)
+        data = os.pread(fd, _RECORD.size + length, off)
+        rec_len, crc = _RECORD.unpack_from(data, 0)
+        payload = data[_RECORD.size:]
+        if rec_len != length or len(payload) != length or zlib.crc32(payload) != crc:
+            raise StoreError(f"{_segment_name(seg)}: damaged record at offset {off}")
+        return payload
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "appended": self.appended,
+            "index_entries": self._index.count,
+            "segment": self._segment,
+            "segment_bytes": self._offset,
+            "fsyncs": self.fsyncs,
+        }
+
+
+def _resolve(fut: asyncio.Future) -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+def _reject(fut: asyncio.Future, exc: Exception) -> None:
+    if not fut.done():
+        fut.set_exception(exc)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+In-process benchmark for the API: drives app.main:app through httpx.ASGITransport
+(no sockets, no server) and the verifier/canonicalizer as plain functions.
+
+Ops per candidate-set size:
+  allocate          POST /allocate with an inline candidates list
+  allocate_by_set   POST /allocate with candidate_set_id (set registered once)
+  receipt_sign      POST /receipt/sign with an inline candidates list
+  canonical_bytes   verify.canonical.canonical_bytes on a signed receipt
+  canonical_cbor    verify.cbor.canonical_cbor on the same receipt
+  verify            verify.verify_receipt.verify_receipt on a signed receipt
+
+Usage:
+  python3 bench/bench_api.py [--sizes 3,100,10000,100000,1000000] [--ops allocate,verify]
+                             [--seconds 2] [--concurrency 1] [--out results.json]
+  # regression gate: exit 1 if ops/sec dropped more than 20% vs the baseline
+  python3 bench/bench_api.py --baseline bench/baseline.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from hashlib import sha256
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey  # noqa: E402
+
+# ключ генеруємо до імпорту app.main: KeyManager читає env при імпорті
+os.environ.setdefault("RECEIPT_SIGNER_SK_HEX", Ed25519PrivateKey.generate().private_bytes_raw().hex())
+# receipt_sign шле те саме тіло щоразу: з кешем підписів міряли б лише влучання в кеш
+os.environ.setdefault("RECEIPT_SIGN_CACHE", "0")
+
+import httpx  # noqa: E402
+
+from app.main import app, key_manager  # noqa: E402
+from app.models import ReceiptSignRequest  # noqa: E402
+from app.signer import sign_receipt  # noqa: E402
+from verify.canonical import BACKEND, canonical_bytes  # noqa: E402
+from verify.cbor import canonical_cbor  # noqa: E402
+from verify.verify_receipt import verify_receipt  # noqa: E402
+
+DEFAULT_SIZES = "3,100,10000,100000,1000000"
+ALL_OPS = ("allocate", "allocate_by_set", "receipt_sign", "canonical_bytes", "canonical_cbor", "verify")
+TIMESTAMP = "2026-02-06T02:05:00Z"
+
+
+def make_candidates(n: int) -> list:
+    return [f"agent_{i:07d}" for i in range(n)]
+
+
+def task_commit(i: int) -> str:
+    return sha256(f"bench-task-{i}".encode()).hexdigest()
+
+
+def percentile(sorted_vals: list, p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, int(round(p / 100.0 * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+
+def summarize(op: str, n: int, lat: list, wall: float) -> dict:
+    lat = sorted(lat)
+    return {
+        "op": op,
+        "candidates": n,
+        "iterations": len(lat),
+        "ops_per_sec": round(len(lat) / wall, 2) if wall > 0 else None,
+        "p50_ms": round(percentile(lat, 50) * 1000, 3),
+        "p95_ms": round(percentile(lat, 95) * 1000, 3),
+        "p99_ms": round(percentile(lat, 99) * 1000, 3),
+        "max_ms": round(lat[-1] * 1000, 3) if lat else None,
+    }
+
+
+async def run_async(op: str, n: int, make_call, seconds: float, min_iters: int, concurrency: int) -> dict:
+    lat = []
+    deadline = time.perf_counter() + seconds
+    counter = 0
+
+    async def worker():
+        nonlocal counter
+        while counter < min_iters or time.perf_counter() < deadline:
+            i = counter
+            counter += 1
+            t0 = time.perf_counter()
+            await make_call(i)
+            lat.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(op, n, lat, time.perf_counter() - t0)
+
+
+def run_sync(op: str, n: int, fn, seconds: float, min_iters: int) -> dict:
+    lat = []
+    deadline = time.perf_counter() + seconds
+    t_start = time.perf_counter()
+    while len(lat) < min_iters or time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        fn()
+        lat.append(time.perf_counter() - t0)
+    return summarize(op, n, lat, time.perf_counter() - t_start)
+
+
+async def bench_size(client: httpx.AsyncClient, n: int, ops: list, seconds: float, min_iters: int,
+                     concurrency: int) -> list:
+    cands = make_candidates(n)
+    winner = cands[n // 2]
+    results = []
+
+    async def post(path: str, body: bytes):
+        r = await client.post(path, content=body, headers={"content-type": "application/json"})
+        if r.status_code != 200:
+            raise RuntimeError(f"{path} -> HTTP {r.status_code}: {r.text[:200]}")
+        return r
+
+    # тіла кодуємо один раз: міряємо сервер, а не json.dumps клієнта
+    prefix = json.dumps({"task_id": "bench", "candidate_order": "lexicographic", "candidates": cands})[:-1]
+
+    if "allocate" in ops:
+        bodies = [(prefix + f',"task_commit_sha256":"{task_commit(i)}"}}').encode() for i in range(16)]
+        results.append(await run_async("allocate", n, lambda i: post("/allocate", bodies[i % 16]),
+                                       seconds, min_iters, concurrency))
+
+    if "allocate_by_set" in ops:
+        reg = await post("/candidate-sets", json.dumps({"candidates": cands}).encode())
+        set_id = reg.json()["candidate_set_id"]
+        bodies = [json.dumps({"task_id": "bench", "task_commit_sha256": task_commit(i),
+                              "candidate_set_id": set_id}).encode() for i in range(16)]
+        results.append(await run_async("allocate_by_set", n, lambda i: post("/allocate", bodies[i % 16]),
+                                       seconds, min_iters, concurrency))
+
+    if "receipt_sign" in ops:
+        body = (prefix + f',"task_commit_sha256":"{task_commit(0)}","winner":"{winner}",'
+                f'"timestamp":"{TIMESTAMP}"}}').encode()
+        results.append(await run_async("receipt_sign", n, lambda i: post("/receipt/sign", body),
+                                       seconds, min_iters, concurrency))
+
+    if "canonical_bytes" in ops or "canonical_cbor" in ops or "verify" in ops:
+        signed = sign_receipt(ReceiptSignRequest(
+            task_id="bench", task_commit_sha256=task_commit(0), candidate_order="lexicographic",
+            candidates=cands, winner=winner, timestamp=TIMESTAMP,
+        ), key_manager.get())
+        if "canonical_bytes" in ops:
+            results.append(run_sync("canonical_bytes", n, lambda: canonical_bytes(signed), seconds, min_iters))
+        if "canonical_cbor" in ops:
+            results.append(run_sync("canonical_cbor", n, lambda: canonical_cbor(signed), seconds, min_iters))
+        if "verify" in ops:
+            results.append(run_sync("verify", n, lambda: verify_receipt(signed), seconds, min_iters))
+
+    return results
+
+
+async def run_all(sizes: list, ops: list, seconds: float, min_iters: int, concurrency: int) -> list:
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for n in sizes:
+                for res in await bench_size(client, n, ops, seconds, min_iters, concurrency):
+                    print(json.dumps(res), file=sys.stderr)
+                    results.append(res)
+    return results
+
+
+def compare(results: list, baseline: dict, max_regression: float) -> list:
+    base = {(r["op"], r["candidates"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        b = base.get((r["op"], r["candidates"]))
+        if not b or not b.get("ops_per_sec") or not r.get("ops_per_sec"):
+            continue
+        ratio = r["ops_per_sec"] / b["ops_per_sec"]
+        r["baseline_ops_per_sec"] = b["ops_per_sec"]
+        r["ratio_vs_baseline"] = round(ratio, 3)
+        if ratio < 1.0 - max_regression:
+            regressions.append(r)
+    return regressions
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated candidate counts")
+    ap.add_argument("--ops", default=",".join(ALL_OPS), help=f"comma-separated subset of {','.join(ALL_OPS)}")
+    ap.add_argument("--seconds", type=float, default=2.0, help="time budget per (op, size)")
+    ap.add_argument("--min-iters", type=int, default=3)
+    ap.add_argument("--concurrency", type=int, default=1, help="concurrent in-flight HTTP requests")
+    ap.add_argument("--out", help="write results JSON here (default: stdout)")
+    ap.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    ap.add_argument("--max-regression", type=float, default=0.2,
+                    help="fail when ops/sec < baseline * (1 - this) for any (op, size)")
+    args = ap.parse_args()
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    ops = [x.strip() for x in args.ops.split(",") if x.strip()]
+    unknown = set(ops) - set(ALL_OPS)
+    if unknown:
+        raise SystemExit(f"Unknown ops: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(run_all(sizes, ops, args.seconds, args.min_iters, args.concurrency))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "canonical_backend": BACKEND,
+            "seconds_per_case": args.seconds,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+
+    rc = 0
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.max_regression)
+        report["regressions"] = [{"op": r["op"], "candidates": r["candidates"], "ratio": r["ratio_vs_baseline"]}
+                                 for r in regressions]
+        if regressions:
+            rc = 1
+            for r in regressions:
+                print(f"REGRESSION {r['op']} n={r['candidates']}: {r['ops_per_sec']} ops/s "
+                      f"vs baseline {r['baseline_ops_per_sec']} ({r['ratio_vs_baseline']:.2f}x)", file=sys.stderr)
+
+    out = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(out + "\n", encoding="utf-8")
+    else:
+        print(out)
+    return rc
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
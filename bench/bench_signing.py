@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Signatures/sec on the /receipt/sign hot path: per-request key load (old) vs resident KeyManager.
+
+Usage:
+  python3 bench/bench_signing.py [--n 20000] [--source file|hex]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from hashlib import sha256
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey  # noqa: E402
+
+from app.keys import KeyManager, load_private_key, private_key_from_raw  # noqa: E402
+
+
+def _msg_hash(i: int) -> bytes:
+    receipt = {
+        "task_id": f"task_{i:06d}",
+        "task_commit_sha256": sha256(str(i).encode()).hexdigest(),
+        "candidate_order": "lexicographic",
+        "candidates": ["agent_alpha", "agent_beta", "agent_gamma"],
+        "winner": "agent_beta",
+        "timestamp": "2026-02-06T02:05:00Z",
+    }
+    msg = json.dumps(receipt, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return sha256(msg).digest()
+
+
+def sign_per_request(source: str, sk_path: str, sk_hex: str, msg_hash: bytes) -> str:
+    # те, що робив receipt_sign до KeyManager: env/диск + парсинг + pubkey на кожен запит
+    if source == "hex":
+        sk = private_key_from_raw(bytes.fromhex(sk_hex), "RECEIPT_SIGNER_SK_HEX")
+    else:
+        sk = load_private_key(sk_path)
+    sig = sk.sign(msg_hash).hex()
+    sk.public_key().public_bytes_raw().hex()
+    return sig
+
+
+def run(label: str, fn, hashes) -> dict:
+    t0 = time.perf_counter()
+    for h in hashes:
+        fn(h)
+    elapsed = time.perf_counter() - t0
+    return {"mode": label, "n": len(hashes), "elapsed_sec": round(elapsed, 4),
+            "sigs_per_sec": round(len(hashes) / elapsed, 1)}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--source", choices=("file", "hex"), default="file")
+    args = ap.parse_args()
+
+    raw = Ed25519PrivateKey.generate().private_bytes_raw()
+    with tempfile.TemporaryDirectory() as td:
+        sk_path = os.path.join(td, "ed25519_sk.bin")
+        Path(sk_path).write_bytes(raw)
+        sk_hex = raw.hex()
+
+        if args.source == "hex":
+            km = KeyManager(sk_hex=sk_hex)
+        else:
+            km = KeyManager(key_paths={"default": sk_path})
+        km.preload()
+
+        hashes = [_msg_hash(i) for i in range(args.n)]
+
+        before = run("per_request_load", lambda h: sign_per_request(args.source, sk_path, sk_hex, h), hashes)
+        after = run("key_manager", lambda h: km.get().sign(h).hex(), hashes)
+
+    print(json.dumps({
+        "source": args.source,
+        "results": [before, after],
+        "speedup": round(after["sigs_per_sec"] / before["sigs_per_sec"], 2),
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
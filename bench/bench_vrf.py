@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+VRF signer checks/sec at audit scale: recover every signature (naive) vs SignerCache,
+single process and across a process pool (what verify/bulk_verify.py --vrf-signers does).
+
+n receipts share --distinct VRF outputs signed by --signers keys. The naive rate is
+measured on --naive-sample receipts and extrapolated to n.
+
+Usage:
+  python3 bench/bench_vrf.py [--n 1000000] [--distinct 20000] [--signers 3] [--workers 0]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from verify.vrf_ecdsa import (  # noqa: E402
+    SignerCache, address_of, check_vrf_signature, public_address, recover_pubkey, sign_recoverable,
+)
+
+_VRF = None          # (signed VRF outputs, trusted) у воркері
+_TRUSTED = frozenset()
+
+
+def make_vrf_outputs(distinct: int, signers: int):
+    privs = [int.from_bytes(sha256(b"bench-vrf-signer:%d" % j).digest(), "big") for j in range(signers)]
+    trusted = frozenset(public_address(p) for p in privs)
+    outputs = []
+    for i in range(distinct):
+        priv = privs[i % signers]
+        rnd, ts = sha256(b"bench-vrf-output:%d" % i).hexdigest(), "2026-01-01T00:00:00Z"
+        # розмітка demo/mock_vrf_server.py: msg_hash зв'язує random (VRF_MSG_BINDING за замовчуванням)
+        h = sha256(f"{rnd}|{ts}".encode()).digest()
+        r, s, v = sign_recoverable(priv, h)
+        outputs.append({
+            "re4ctor_random": rnd,
+            "re4ctor_timestamp": ts,
+            "re4ctor_msg_hash": h.hex(),
+            "re4ctor_signature": {"type": "ecdsa_secp256k1", "v": v, "r": hex(r), "s": hex(s),
+                                  "signer_addr": public_address(priv)},
+        })
+    return outputs, trusted
+
+
+def receipt(outputs, i: int) -> dict:
+    return {"task_id": f"task_{i:07d}", **outputs[(i * 7919) % len(outputs)]}
+
+
+def check_naive(r: dict) -> str:
+    sig = r["re4ctor_signature"]
+    v = sig["v"]
+    pub = recover_pubkey(bytes.fromhex(r["re4ctor_msg_hash"]), int(sig["r"], 16), int(sig["s"], 16),
+                         v - 27 if v >= 27 else v)
+    addr = address_of(pub)
+    if addr not in _TRUSTED:
+        raise ValueError("untrusted")
+    return addr
+
+
+def _init_worker(outputs, trusted) -> None:
+    global _VRF
+    _VRF = (outputs, trusted)
+
+
+def _check_range(bounds) -> int:
+    outputs, trusted = _VRF
+    for i in range(*bounds):
+        check_vrf_signature(receipt(outputs, i), trusted)
+    return bounds[1] - bounds[0]
+
+
+def run(label: str, fn, n: int, extrapolate_to: int = 0) -> dict:
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    out = {"mode": label, "n": n, "elapsed_sec": round(elapsed, 4), "checks_per_sec": round(n / elapsed, 1)}
+    if extrapolate_to:
+        out["est_sec_for_n"] = round(elapsed / n * extrapolate_to, 1)
+    return out
+
+
+def main() -> int:
+    global _TRUSTED
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1_000_000)
+    ap.add_argument("--distinct", type=int, default=20_000, help="distinct VRF outputs (signatures)")
+    ap.add_argument("--signers", type=int, default=3)
+    ap.add_argument("--workers", type=int, default=0, help="process pool size (0 = os.cpu_count())")
+    ap.add_argument("--naive-sample", type=int, default=500)
+    args = ap.parse_args()
+    workers = args.workers or os.cpu_count() or 1
+
+    t0 = time.perf_counter()
+    outputs, trusted = make_vrf_outputs(args.distinct, args.signers)
+    setup = round(time.perf_counter() - t0, 2)
+    _TRUSTED = trusted
+
+    sample = min(args.naive_sample, args.n)
+    naive = run("naive_recover", lambda: [check_naive(receipt(outputs, i)) for i in range(sample)],
+                sample, extrapolate_to=args.n)
+
+    cache = SignerCache()
+    cached = run("signer_cache", lambda: [check_vrf_signature(receipt(outputs, i), trusted, cache)
+                                          for i in range(args.n)], args.n)
+    cached["cache"] = dict(cache.stats)
+
+    step = max(1, args.n // (workers * 8))
+    chunks = [(lo, min(lo + step, args.n)) for lo in range(0, args.n, step)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(outputs, trusted)) as ex:
+        pooled = run(f"signer_cache_pool_{workers}", lambda: sum(ex.map(_check_range, chunks)), args.n)
+
+    print(json.dumps({
+        "n": args.n,
+        "distinct_vrf_outputs": args.distinct,
+        "signers": args.signers,
+        "setup_sec": setup,
+        "results": [naive, cached, pooled],
+        "speedup": round(naive["est_sec_for_n"] / max(pooled["elapsed_sec"], 1e-9), 1),
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Latency of getting VRF randomness for one allocation, against the local mock VRF server:
+a bare requests.get per call (what run_lottery.py did) vs VrfClient keep-alive, and
+VrfClient with a prefetch buffer.
+
+--handshake-ms stands in for the TCP/TLS setup of a new connection and --latency-ms for
+the VRF round trip. --think-ms is the allocation work between two calls (time the
+prefetch buffer has to refill).
+
+Usage:
+  python3 bench/bench_vrf_client.py [--n 300] [--latency-ms 20] [--handshake-ms 40] [--fail-rate 0.02]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from demo.mock_vrf_server import MockVrf, serve_in_thread  # noqa: E402
+from demo.vrf_client import VRF_PATH, VrfClient, VrfError  # noqa: E402
+
+
+def percentile(sorted_vals: list, p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, int(round(p / 100.0 * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+
+def run(label: str, fn, n: int, think: float) -> dict:
+    lat, errors = [], 0
+    for _ in range(n):
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except (VrfError, RuntimeError):
+            errors += 1
+        lat.append(time.perf_counter() - t0)
+        if think:
+            time.sleep(think)
+    lat.sort()
+    return {
+        "mode": label,
+        "n": n,
+        "errors": errors,
+        "p50_ms": round(percentile(lat, 50) * 1000, 3),
+        "p95_ms": round(percentile(lat, 95) * 1000, 3),
+        "p99_ms": round(percentile(lat, 99) * 1000, 3),
+        "max_ms": round(lat[-1] * 1000, 3),
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=300)
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--jitter-ms", type=float, default=5.0)
+    ap.add_argument("--handshake-ms", type=float, default=40.0)
+    ap.add_argument("--fail-rate", type=float, default=0.02)
+    ap.add_argument("--think-ms", type=float, default=30.0)
+    ap.add_argument("--prefetch", type=int, default=4)
+    args = ap.parse_args()
+
+    vrf = MockVrf(api_key="bench", latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                  fail_rate=args.fail_rate, handshake_ms=args.handshake_ms)
+    server, base = serve_in_thread(vrf)
+    think = args.think_ms / 1000.0
+
+    def bare():
+        # як run_lottery.py до VrfClient: нове з'єднання на кожен виклик, без ретраїв
+        r = requests.get(f"{base}{VRF_PATH}?sig=ecdsa", headers={"X-API-Key": "bench"}, timeout=20)
+        if r.status_code != 200:
+            raise RuntimeError(f"VRF HTTP {r.status_code}")
+        return r.json()
+
+    results = [run("bare_requests_get", bare, args.n, think)]
+    with VrfClient(base, "bench") as client:
+        client.get()  # прогрів: перше з'єднання
+        results.append(run("vrf_client_keepalive", client.get, args.n, think))
+        results[-1]["client"] = dict(client.stats)
+    with VrfClient(base, "bench", prefetch=args.prefetch) as client:
+        time.sleep((args.latency_ms + args.jitter_ms + args.handshake_ms) * 2 / 1000.0)
+        results.append(run(f"vrf_client_prefetch_{args.prefetch}", client.get, args.n, think))
+        results[-1]["client"] = dict(client.stats)
+    server.shutdown()
+
+    print(json.dumps({
+        "latency_ms": args.latency_ms,
+        "handshake_ms": args.handshake_ms,
+        "fail_rate": args.fail_rate,
+        "think_ms": args.think_ms,
+        "server": dict(vrf.stats),
+        "results": results,
+        "p99_speedup": round(results[0]["p99_ms"] / max(results[-1]["p99_ms"], 1e-9), 1),
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
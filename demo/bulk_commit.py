@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Bulk task commits: the streaming version of demo/make_task_commit.py.
+
+Reads tasks as JSONL (file or stdin), draws a fresh 32-byte nonce per task and computes
+task_commit_sha256 with the usual layout (verify/task_commit.py):
+
+  sha256(task_id || "||" || description || "||" || reward || "||" || nonce_hex)
+
+Two outputs, one line per task, in input order:
+
+  --commits  public: the task without description / reward / nonce_hex, plus
+             task_commit_sha256 and commit_timestamp (ready for /allocate or
+             demo/epoch_lottery.py)
+  --reveals  secret: task_id, description, reward, nonce_hex, task_commit_sha256; created
+             with mode 0600. Publish it only after allocation; verify/verify_reveals.py
+             checks it against the commits.
+
+Lines go out in batches of --batch tasks: the reveals are written and fsynced before the
+commits of the same batch, so a crash never leaves a commit on disk without its nonce.
+
+A task that already has task_commit_sha256 is refused (already_committed) unless
+--recommit: committing one task twice lets the platform pick the commit it likes.
+
+Usage:
+  python3 demo/bulk_commit.py tasks.jsonl --commits commits.jsonl --reveals reveals.jsonl [--append]
+  producer | python3 demo/bulk_commit.py - --commits commits.jsonl --reveals reveals.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from verify.task_commit import NONCE_BYTES, SECRET_FIELDS, commit_of  # noqa: E402
+
+NONCE_BATCH = 4096
+
+
+def _nonces():
+    # один urandom на пачку: дешевше за виклик на кожну задачу
+    while True:
+        block = os.urandom(NONCE_BYTES * NONCE_BATCH)
+        for i in range(0, len(block), NONCE_BYTES):
+            yield block[i:i + NONCE_BYTES].hex()
+
+
+def _open_out(path: str, append: bool, mode: int):
+    flags = os.O_WRONLY | os.O_CREAT | (os.O_APPEND if append else os.O_TRUNC)
+    return os.fdopen(os.open(path, flags, mode), "w", encoding="utf-8")
+
+
+def commit_lines(lines, recommit: bool = False):
+    """(commit, reveal, None) or (None, None, (reason, error)) per non-empty input line."""
+    nonces = _nonces()
+    for lineno, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            task = json.loads(line)
+        except ValueError as e:
+            yield None, None, ("bad_json", f"line {lineno}: {e}")
+            continue
+        if not isinstance(task, dict) or not isinstance(task.get("task_id"), str) or not task["task_id"]:
+            yield None, None, ("invalid_task", f"line {lineno}: a task needs a non-empty string task_id")
+            continue
+        if "task_commit_sha256" in task and not recommit:
+            yield None, None, ("already_committed", f"line {lineno}: task {task['task_id']!r} already has a commit")
+            continue
+
+        nonce = next(nonces)
+        try:
+            commit = commit_of(task, nonce)
+        except UnicodeEncodeError as e:
+            yield None, None, ("invalid_task", f"line {lineno}: the task is not valid UTF-8: {e}")
+            continue
+        ts = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        public = {k: v for k, v in task.items() if k not in SECRET_FIELDS}
+        public["task_commit_sha256"] = commit
+        public["commit_timestamp"] = ts
+        reveal = {
+            "task_id": task["task_id"],
+            "description": task.get("description", ""),
+            "reward": task.get("reward", ""),
+            "nonce_hex": nonce,
+            "task_commit_sha256": commit,
+        }
+        yield public, reveal, None
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Commit many tasks: public commits + secret reveals.")
+    ap.add_argument("tasks", help="tasks JSONL file, or - for stdin")
+    ap.add_argument("--commits", required=True, help="public commits JSONL")
+    ap.add_argument("--reveals", required=True, help="secret reveals JSONL (mode 0600)")
+    ap.add_argument("--append", action="store_true", help="append to the outputs instead of overwriting")
+    ap.add_argument("--batch", type=int, default=1024, help="tasks per write (reveals are fsynced per batch)")
+    ap.add_argument("--recommit", action="store_true", help="draw a new commit for tasks that already have one")
+    args = ap.parse_args()
+
+    reasons = Counter()
+    t0 = time.perf_counter()
+    fp = sys.stdin if args.tasks == "-" else open(args.tasks, "r", encoding="utf-8")
+    reveals_f = _open_out(args.reveals, args.append, 0o600)
+    commits_f = _open_out(args.commits, args.append, 0o644)
+    commits, reveals = [], []
+
+    def flush():
+        # reveals першими і на диск: commit без nonce вже не відкрити
+        reveals_f.write("".join(reveals))
+        reveals_f.flush()
+        os.fsync(reveals_f.fileno())
+        commits_f.write("".join(commits))
+        commits_f.flush()
+        commits.clear()
+        reveals.clear()
+
+    try:
+        for public, reveal, err in commit_lines(fp, args.recommit):
+            if err is not None:
+                reasons[err[0]] += 1
+                print(f"{err[0]}: {err[1]}", file=sys.stderr)
+                continue
+            reveal_line = json.dumps(reveal, ensure_ascii=False) + "\n"
+            commit_line = json.dumps(public, ensure_ascii=False) + "\n"
+            try:
+                # сурогат у полі, що не входить у commit, зламав би запис усієї пачки
+                reveal_line.encode("utf-8")
+                commit_line.encode("utf-8")
+            except UnicodeEncodeError as e:
+                reasons["invalid_task"] += 1
+                print(f"invalid_task: task {public['task_id']!r} is not valid UTF-8: {e}", file=sys.stderr)
+                continue
+            reveals.append(reveal_line)
+            commits.append(commit_line)
+            reasons["ok"] += 1
+            if len(commits) >= args.batch:
+                flush()
+        flush()
+    finally:
+        reveals_f.close()
+        commits_f.close()
+        if fp is not sys.stdin:
+            fp.close()
+    seconds = time.perf_counter() - t0
+
+    ok = reasons.pop("ok", 0)
+    print(json.dumps({
+        "committed": ok,
+        "failed": sum(reasons.values()),
+        "reasons": dict(reasons),
+        "seconds": round(seconds, 3),
+        "tasks_per_sec": round(ok / seconds, 1) if seconds > 0 else None,
+    }, indent=2), file=sys.stderr)
+    return 1 if reasons else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Epoch beacon lottery: one VRF call per epoch, every task of the epoch allocated locally.
+
+The epoch beacon is one VRF response. It is fetched once (demo/vrf_client.py, the same
+R4_* env as run_lottery.py) and cached in --beacon-dir/<epoch>.json, so reruns and later
+batches of the same epoch reuse it. The cached beacon is never replaced: an operator who
+could fetch again could pick the randomness. With VRF_SIGNERS set its signature is checked
+first. verify/winner_audit.py flags an epoch whose receipts carry more than one beacon.
+
+Each input line is a task in the /allocate shape:
+
+  {"task_id", "task_commit_sha256", "candidates", ["candidate_order"], ["allocation_mode", "weights"],
+   ["winners": k], ["commit_timestamp"]}
+
+and is drawn from the documented domain-separated seed (docs/protocol.md, 2a):
+
+  seed = sha256("re4ctor:alloc:v0" || "|" || task_commit || "|" || epoch)
+  draw = sha256(seed || "|" || beacon random)
+
+with the usual uniform / weighted / k-of-n rules applied to draw instead of the commit.
+A task committed after the beacon was produced (commit_timestamp later than the beacon
+timestamp) is refused: its author could have seen the randomness. The check is advisory:
+commit_timestamp is optional and supplied by the same operator, so a task without one is
+allocated unchecked (counted as commit_time_unchecked in the summary) and a back-dated one
+is not detected. Publishing the commits before the beacon is what makes the order provable.
+
+Receipts carry epoch and the beacon's re4ctor_* fields and are checked, canonicalized and
+signed by app.signer.SignerPool across a process pool (signing key from the same env as
+the server: RECEIPT_SIGNER_SK_HEX | RECEIPT_SIGNER_KEYS | RECEIPT_SIGNER_SK_PATH).
+verify/bulk_verify.py verifies the output as is.
+
+Usage:
+  python3 demo/epoch_lottery.py --epoch 2026-W42 tasks.jsonl [-o receipts.jsonl]
+         [--scheme ed25519|cbor|merkle] [--form full|compact] [--workers N] [--beacon-dir DIR]
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from app.keys import KeyManager  # noqa: E402
+from app.models import AllocateRequest  # noqa: E402
+from app.signer import SIGNATURE_SCHEMES, BadItem, SignerPool, utc_now_iso  # noqa: E402
+from demo.vrf_client import VrfClient, vrf_receipt_fields  # noqa: E402
+from verify.selection import (  # noqa: E402
+    RULE_EPOCH, AliasTable, check_weights, epoch_draw_sha256, pick_uniform_index, sample_k_indices,
+)
+from verify.vrf_ecdsa import VrfSignatureError, check_vrf_signature, trusted_signers_from_env  # noqa: E402
+
+BEACON_DIR = ROOT / "demo" / "beacons"
+EPOCH_RE = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+load_dotenv(dotenv_path=ROOT / ".env")
+
+
+class BeaconError(RuntimeError):
+    pass
+
+
+def _parse_ts(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def load_beacon(epoch: str, beacon_dir: Path) -> tuple:
+    """(VRF response, cached?) for epoch: from beacon_dir/<epoch>.json, else one VRF call."""
+    path = beacon_dir / f"{epoch}.json"
+    if path.exists():
+        return _checked(epoch, json.loads(path.read_text(encoding="utf-8"))), True
+    with VrfClient.from_env() as client:
+        beacon = _checked(epoch, client.get())
+    beacon, cached = save_beacon(path, beacon)
+    # інший запуск міг зберегти свій beacon раніше: тоді беремо його
+    return (_checked(epoch, beacon) if cached else beacon), cached
+
+
+def _checked(epoch: str, beacon) -> dict:
+    if not isinstance(beacon, dict) or not isinstance(beacon.get("random"), str) or not beacon["random"]:
+        raise BeaconError(f"beacon for epoch {epoch!r} has no random")
+    trusted = trusted_signers_from_env()
+    if trusted:
+        try:
+            check_vrf_signature(vrf_receipt_fields(beacon), trusted)
+        except VrfSignatureError as e:
+            raise BeaconError(f"beacon for epoch {epoch!r}: {e.reason}: {e}")
+    return beacon
+
+
+def save_beacon(path: Path, beacon: dict) -> tuple:
+    """
+    Writes beacon to path unless a beacon for the epoch is already there; the first one
+    wins and is returned as (beacon, True), so a concurrent run cannot re-roll the epoch.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(beacon, ensure_ascii=False, indent=2), encoding="utf-8")
+    try:
+        # link, а не replace: не перезаписує вже збережений beacon
+        os.link(tmp, path)
+    except FileExistsError:
+        return json.loads(path.read_text(encoding="utf-8")), True
+    finally:
+        tmp.unlink()
+    return beacon, False
+
+
+def allocate(task: AllocateRequest, epoch: str, beacon: dict, beacon_fields: dict,
+             commit_ts: str = "") -> dict:
+    """A /receipt/sign request for task, with the winner(s) drawn from the epoch beacon."""
+    if task.candidate_set_id is not None or not task.candidates:
+        raise ValueError("tasks need inline candidates (candidate_set_id is not supported here)")
+    if commit_ts and beacon.get("timestamp") and _parse_ts(commit_ts) > _parse_ts(beacon["timestamp"]):
+        raise LookupError(f"task committed at {commit_ts}, after the epoch beacon ({beacon['timestamp']})")
+
+    cands = sorted(task.candidates) if task.candidate_order == "lexicographic" else list(task.candidates)
+    draw = epoch_draw_sha256(task.task_commit_sha256, epoch, beacon["random"])
+    req = {
+        "task_id": task.task_id,
+        "task_commit_sha256": task.task_commit_sha256,
+        "candidate_order": task.candidate_order,
+        "candidates": cands,
+        "epoch": epoch,
+        "allocation_rule": RULE_EPOCH,
+        "timestamp": utc_now_iso(),
+        "note": "Re4ctoR epoch beacon allocation (commit + epoch + beacon random).",
+        **beacon_fields,
+    }
+    if task.allocation_mode == "weighted":
+        weights = check_weights(task.weights, len(task.candidates))
+        if task.candidate_order == "lexicographic":
+            weights = [w for _, w in sorted(zip(task.candidates, weights))]
+        req.update(allocation_mode="weighted", weights=weights)
+        req["winner"] = cands[AliasTable.build(weights).pick_index(draw)]
+    elif task.winners is not None:
+        req["winners"] = [cands[i] for i in sample_k_indices(draw, len(cands), task.winners)]
+        req["winner"] = req["winners"][0]
+    else:
+        req["winner"] = cands[pick_uniform_index(draw, len(cands))]
+    return req
+
+
+async def _requests(fp, epoch: str, beacon: dict, stats: Counter):
+    beacon_fields = vrf_receipt_fields(beacon)
+    for lineno, line in enumerate(fp, 1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+            task = AllocateRequest.model_validate(obj)
+            commit_ts = obj.get("commit_timestamp") or ""
+            if not commit_ts or not beacon.get("timestamp"):
+                stats["commit_time_unchecked"] += 1
+            yield allocate(task, epoch, beacon, beacon_fields, commit_ts)
+        except json.JSONDecodeError as e:
+            yield BadItem("bad_json", f"line {lineno}: {e}")
+        except ValidationError as e:
+            yield BadItem("invalid_task", f"line {lineno}: {e.errors(include_url=False)}")
+        except LookupError as e:
+            yield BadItem("commit_after_beacon", f"line {lineno}: {e}")
+        except ValueError as e:
+            yield BadItem("invalid_task", f"line {lineno}: {e}")
+
+
+async def run(args, beacon: dict, out, stats: Counter) -> Counter:
+    reasons = Counter()
+    pool = SignerPool(KeyManager.from_env(), workers=args.workers or None, mode="process", chunk_size=args.chunk)
+    fp = sys.stdin if args.tasks == "-" else open(args.tasks, "r", encoding="utf-8")
+    try:
+        items = _requests(fp, args.epoch, beacon, stats)
+        async for res in pool.sign_stream(items, scheme=SIGNATURE_SCHEMES[args.scheme],
+                                          compact=args.form == "compact"):
+            if res["ok"]:
+                out.write(json.dumps(res["receipt"], ensure_ascii=False) + "\n")
+                reasons["ok"] += 1
+            else:
+                reasons[res["reason"]] += 1
+                print(f"[{res['index']}] {res['reason']}: {res['error']}", file=sys.stderr)
+    finally:
+        if fp is not sys.stdin:
+            fp.close()
+        pool.shutdown()
+    return reasons
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Allocate every task of an epoch from one VRF beacon.")
+    ap.add_argument("tasks", help="tasks JSONL file, or - for stdin")
+    ap.add_argument("--epoch", required=True, help="epoch id, e.g. 2026-W42 (letters, digits, . _ : -)")
+    ap.add_argument("-o", "--out", help="signed receipts JSONL (default: stdout)")
+    ap.add_argument("--scheme", choices=sorted(SIGNATURE_SCHEMES), default="ed25519")
+    ap.add_argument("--form", choices=("full", "compact"), default="full")
+    ap.add_argument("--workers", type=int, default=0, help="signing processes (default: os.cpu_count())")
+    ap.add_argument("--chunk", type=int, default=256, help="tasks per worker job")
+    ap.add_argument("--beacon-dir", default=str(BEACON_DIR), help="epoch beacon cache (default: demo/beacons)")
+    args = ap.parse_args()
+
+    if not EPOCH_RE.match(args.epoch):
+        print(f"Invalid epoch id: {args.epoch!r}", file=sys.stderr)
+        return 2
+    try:
+        beacon, cached = load_beacon(args.epoch, Path(args.beacon_dir))
+    except (BeaconError, RuntimeError, ValueError) as e:
+        print(f"Cannot get the epoch beacon: {e}", file=sys.stderr)
+        return 2
+
+    t0 = time.perf_counter()
+    stats = Counter()
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        reasons = asyncio.run(run(args, beacon, out, stats))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - t0
+
+    ok = reasons.pop("ok", 0)
+    failed = sum(reasons.values())
+    print(json.dumps({
+        "epoch": args.epoch,
+        "beacon": {"timestamp": beacon.get("timestamp"), "signer_addr": beacon.get("signer_addr"),
+                   "cached": cached, "vrf_calls": 0 if cached else 1},
+        "tasks": ok + failed,
+        "ok": ok,
+        "failed": failed,
+        "reasons": dict(reasons),
+        "commit_time_unchecked": stats["commit_time_unchecked"],
+        "seconds": round(elapsed, 3),
+        "receipts_per_sec": round(ok / elapsed, 1) if elapsed > 0 else None,
+    }, indent=2), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,16 +1,17 @@
-import os
+import sys
 import json
-import hashlib
 from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from verify.task_commit import commit_of, new_nonce  # noqa: E402
 
 TASK_PATH = "demo/task.json"
 
 task = json.load(open(TASK_PATH, "r", encoding="utf-8"))
 
-nonce = os.urandom(32).hex()
-
-payload = f'{task.get("task_id","")}||{task.get("description","")}||{task.get("reward","")}'
-task_commit = hashlib.sha256((payload + "||" + nonce).encode("utf-8")).hexdigest()
+nonce = new_nonce()
+task_commit = commit_of(task, nonce)
 
 task["nonce_hex"] = nonce
 task["task_commit_sha256"] = task_commit
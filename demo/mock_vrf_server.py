@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Re4ctoR VRF endpoint (GET /api/v1/vrf?sig=ecdsa), for tests and
+bench/bench_vrf_client.py. Not a VRF: random comes from os.urandom.
+
+The response has the fields demo/run_lottery.py copies into a receipt. msg_hash is
+sha256(random || "|" || timestamp), signed with a recoverable secp256k1 key
+(verify/vrf_ecdsa.py), so receipts built from it pass verify_receipt with
+VRF_SIGNERS=<signer_addr> (printed at startup).
+
+Fault injection: --latency-ms (plus uniform --jitter-ms) before each response,
+--handshake-ms once per new connection (stands in for the TCP/TLS setup a keep-alive
+client avoids), --fail-rate of 503s with Retry-After: 0. HTTP/1.1 keep-alive.
+
+Usage:
+  python3 demo/mock_vrf_server.py [--port 8099] [--api-key KEY] [--latency-ms 0] [--fail-rate 0]
+  R4_BASE_URL=http://127.0.0.1:8099 R4_API_KEY=KEY python3 demo/run_lottery.py
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from hashlib import sha256
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from verify.vrf_ecdsa import N, public_address, sign_recoverable  # noqa: E402
+
+VRF_PATH = "/api/v1/vrf"
+# фіксований dev-ключ: адреса стабільна між запусками (MOCK_VRF_SK_HEX - свій)
+DEFAULT_SK = int.from_bytes(sha256(b"re4ctor-mock-vrf-signer").digest(), "big") % N
+
+
+class MockVrf:
+    def __init__(self, sk: int = DEFAULT_SK, api_key: str = "", latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, fail_rate: float = 0.0, handshake_ms: float = 0.0):
+        self.sk = sk
+        self.signer_addr = public_address(sk)
+        self.api_key = api_key
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fail_rate = fail_rate
+        self.handshake_ms = handshake_ms
+        self.lock = threading.Lock()
+        self.stats = {"served": 0, "failed": 0, "connections": 0}
+
+    def output(self) -> dict:
+        rnd = os.urandom(32).hex()
+        ts = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        msg_hash = sha256(f"{rnd}|{ts}".encode()).digest()
+        r, s, v = sign_recoverable(self.sk, msg_hash)
+        return {
+            "random": rnd,
+            "timestamp": ts,
+            "msg_hash": msg_hash.hex(),
+            "signature_type": "ecdsa_secp256k1",
+            "v": v,
+            "r": "0x%064x" % r,
+            "s": "0x%064x" % s,
+            "signer_addr": self.signer_addr,
+            "pq_scheme": None,
+            "mode": "mock",
+            "version": "mock-0",
+        }
+
+    def handler(self):
+        vrf = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # заголовки і тіло йдуть окремими write: без TCP_NODELAY keep-alive ловить 40 ms delayed ACK
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with vrf.lock:
+                    vrf.stats["connections"] += 1
+                if vrf.handshake_ms > 0:
+                    time.sleep(vrf.handshake_ms / 1000.0)
+
+            def _send(self, status: int, body: dict, headers=()):
+                raw = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for k, v in headers:
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def do_GET(self):
+                if urlsplit(self.path).path != VRF_PATH:
+                    return self._send(404, {"error": "not_found"})
+                if vrf.api_key and self.headers.get("X-API-Key") != vrf.api_key:
+                    return self._send(401, {"error": "bad_api_key"})
+                delay = vrf.latency_ms + random.uniform(0, vrf.jitter_ms)
+                if delay > 0:
+                    time.sleep(delay / 1000.0)
+                if vrf.fail_rate and random.random() < vrf.fail_rate:
+                    with vrf.lock:
+                        vrf.stats["failed"] += 1
+                    return self._send(503, {"error": "unavailable"}, [("Retry-After", "0")])
+                out = vrf.output()
+                with vrf.lock:
+                    vrf.stats["served"] += 1
+                self._send(200, out)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return Handler
+
+
+def serve_in_thread(vrf: MockVrf, host: str = "127.0.0.1", port: int = 0):
+    """(server, base_url) with the server running on a daemon thread; server.shutdown() stops it."""
+    server = ThreadingHTTPServer((host, port), vrf.handler())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-vrf", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Local mock of the Re4ctoR VRF endpoint.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--api-key", default="", help="require this X-API-Key (default: accept any)")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--handshake-ms", type=float, default=0.0, help="extra delay per new connection")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = ap.parse_args()
+
+    sk_hex = os.getenv("MOCK_VRF_SK_HEX", "").strip()
+    sk = int(sk_hex, 16) if sk_hex else DEFAULT_SK
+    vrf = MockVrf(sk, args.api_key, args.latency_ms, args.jitter_ms, args.fail_rate, args.handshake_ms)
+    server = ThreadingHTTPServer((args.host, args.port), vrf.handler())
+    print(f"mock VRF on http://{args.host}:{args.port}{VRF_PATH}  signer_addr={vrf.signer_addr}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,10 +1,14 @@
-import json, os, requests
+import json, os, sys
 from pathlib import Path
 from datetime import datetime, timezone
-from hashlib import sha256
 from dotenv import load_dotenv
 
 ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from demo.vrf_client import VrfClient, vrf_receipt_fields  # noqa: E402
+from verify.merkle import audit_path, candidate_levels  # noqa: E402
+from verify.selection import RULE_VRF_SHA256, vrf_sha256_index  # noqa: E402
+
 TASK_MAIN = ROOT / "demo" / "task.json"
 TASK_LOCAL = ROOT / "demo" / "task.local.json"
 OUT_PATH = ROOT / "demo" / "sample_receipt.json"
@@ -31,49 +35,34 @@ if not isinstance(cands, list) or not cands or not all(isinstance(x, str) for x
 
 cands = sorted(cands)
 
-base = os.getenv("R4_BASE_URL", "https://re4ctor.com").rstrip("/")
-api_key = (
-    os.getenv("R4_API_KEY")
-    or os.getenv("RE4CTOR_API_KEY")
-    or os.getenv("PLANKEY")
-    or os.getenv("X_API_KEY")
-    or ""
-).strip()
-
-if not api_key:
-    raise RuntimeError("Missing API key env (R4_API_KEY | RE4CTOR_API_KEY | PLANKEY | X_API_KEY)")
-
-url = f"{base}/api/v1/vrf?sig=ecdsa"
-r = requests.get(url, headers={"X-API-Key": api_key}, timeout=20)
-if r.status_code != 200:
-    raise RuntimeError(f"VRF HTTP {r.status_code}: {r.text[:300]}")
-
-vrf = r.json()
-seed = f"{task_commit}|{vrf['random']}"
-idx = int.from_bytes(sha256(seed.encode()).digest()[:8], "big") % len(cands)
+# keep-alive, ретраї з jitter, таймаути: R4_VRF_* (див. demo/vrf_client.py)
+with VrfClient.from_env() as client:
+    vrf = client.get()
+idx = vrf_sha256_index(task_commit, vrf["random"], len(cands))
 winner = cands[idx]
 
+# R4_RECEIPT_FORM=compact: candidates_root + доказ переможця замість повного списку (docs/protocol.md, 4b)
+if os.getenv("R4_RECEIPT_FORM", "full") == "compact":
+    levels = candidate_levels(cands)
+    cands_fields = {
+        "candidates_root": levels[-1][0].hex(),
+        "candidates_count": len(cands),
+        "winner_index": idx,
+        "winner_proof": [p.hex() for p in audit_path(levels, idx)],
+    }
+else:
+    cands_fields = {"candidates": cands}
+
 receipt = {
     "task_id": task_id,
     "task_commit_sha256": task_commit,
     "candidate_order": "lexicographic",
-    "candidates": cands,
+    **cands_fields,
     "winner": winner,
     "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+    "allocation_rule": RULE_VRF_SHA256,
     "note": "Re4ctoR VRF-backed allocation (commit + vrf_random).",
-    "re4ctor_random": vrf.get("random"),
-    "re4ctor_timestamp": vrf.get("timestamp"),
-    "re4ctor_msg_hash": vrf.get("msg_hash"),
-    "re4ctor_signature": {
-        "type": vrf.get("signature_type"),
-        "v": vrf.get("v"),
-        "r": vrf.get("r"),
-        "s": vrf.get("s"),
-        "signer_addr": vrf.get("signer_addr"),
-        "pq_scheme": vrf.get("pq_scheme"),
-        "mode": vrf.get("mode"),
-        "version": vrf.get("version"),
-    }
+    **vrf_receipt_fields(vrf),
 }
 
 OUT_PATH.write_text(json.dumps(receipt, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -1,11 +1,10 @@
 import json
 import sys
-from hashlib import sha256
 from pathlib import Path
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 
-def canonical_bytes(obj) -> bytes:
-    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from verify.canonical import canonical_sha256  # noqa: E402
 
 if len(sys.argv) != 2:
     raise SystemExit("Usage: python3 demo/sign_receipt.py <path_to_receipt.json>")
@@ -19,8 +18,7 @@ unsigned.pop("signature", None)
 unsigned.pop("signer_pubkey_hex", None)
 unsigned.pop("signature_scheme", None)
 
-msg = canonical_bytes(unsigned)
-msg_hash = sha256(msg).digest()
+msg_hash = canonical_sha256(unsigned)
 
 sk_bytes = Path("keys/ed25519_sk.bin").read_bytes()
 sk = Ed25519PrivateKey.from_private_bytes(sk_bytes)
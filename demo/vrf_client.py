@@ -0,0 +1,208 @@
+"""
+Re4ctoR VRF client: keep-alive session pool, jittered retries, optional prefetch.
+
+    with VrfClient.from_env() as vrf:
+        out = vrf.get()          # {"random", "timestamp", "msg_hash", "v", "r", "s", "signer_addr", ...}
+
+- One requests.Session whose adapter keeps up to pool_size connections alive, so only the
+  first call (per connection) pays the TCP/TLS handshake.
+- Connection errors, timeouts, 429 and 5xx are retried up to `retries` times with full
+  jitter (sleep uniform(0, backoff * 2^attempt), capped at max_backoff; a Retry-After header
+  is honoured up to max_backoff too).
+  Other HTTP errors are not retried.
+- prefetch=N keeps up to N fresh VRF outputs buffered by background threads, so get()
+  does not wait for a round trip. Each output is handed out once, in the order fetched,
+  and outputs older than max_age seconds are dropped: a receipt's re4ctor_timestamp stays
+  close to the allocation, and the holder cannot pick among many outputs. With an empty
+  buffer get() fetches directly.
+
+Settings from the environment (from_env): R4_BASE_URL, the API key (R4_API_KEY |
+RE4CTOR_API_KEY | PLANKEY | X_API_KEY), R4_VRF_POOL, R4_VRF_RETRIES, R4_VRF_TIMEOUT (read
+timeout, seconds), R4_VRF_PREFETCH, R4_VRF_MAX_AGE.
+
+demo/mock_vrf_server.py is a local stand-in for tests and bench/bench_vrf_client.py.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+VRF_PATH = "/api/v1/vrf"
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+API_KEY_ENVS = ("R4_API_KEY", "RE4CTOR_API_KEY", "PLANKEY", "X_API_KEY")
+
+
+class VrfError(RuntimeError):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class VrfClient:
+    def __init__(self, base_url: str, api_key: str, sig: str = "ecdsa", pool_size: int = 4,
+                 retries: int = 3, backoff: float = 0.05, max_backoff: float = 2.0,
+                 connect_timeout: float = 3.0, read_timeout: float = 5.0,
+                 prefetch: int = 0, max_age: float = 30.0):
+        self.url = base_url.rstrip("/") + VRF_PATH
+        self.params = {"sig": sig}
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_age = max_age
+        self.session = requests.Session()
+        self.session.headers["X-API-Key"] = api_key
+        # ретраї робимо самі (з jitter), адаптер лише тримає з'єднання
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.stats = {"requests": 0, "retries": 0, "prefetch_hits": 0, "prefetch_misses": 0, "stale_dropped": 0}
+        self._stats_lock = threading.Lock()
+
+        self.prefetch = prefetch
+        self._buffer = deque()         # (fetched_at, output), найстаріший зліва
+        self._inflight = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+        # кілька потоків, щоб буфер наповнювався паралельно, але не більше за пул з'єднань
+        for i in range(min(prefetch, pool_size)):
+            t = threading.Thread(target=self._prefetch_loop, name=f"vrf-prefetch-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    @classmethod
+    def from_env(cls, **overrides) -> "VrfClient":
+        api_key = next((os.getenv(k) for k in API_KEY_ENVS if os.getenv(k)), "").strip()
+        if not api_key:
+            raise RuntimeError(f"Missing API key env ({' | '.join(API_KEY_ENVS)})")
+        kwargs = {
+            "base_url": os.getenv("R4_BASE_URL", "https://re4ctor.com"),
+            "api_key": api_key,
+            "pool_size": int(os.getenv("R4_VRF_POOL", "4")),
+            "retries": int(os.getenv("R4_VRF_RETRIES", "3")),
+            "read_timeout": float(os.getenv("R4_VRF_TIMEOUT", "5")),
+            "prefetch": int(os.getenv("R4_VRF_PREFETCH", "0")),
+            "max_age": float(os.getenv("R4_VRF_MAX_AGE", "30")),
+        }
+        kwargs.update(overrides)
+        return cls(**kwargs)
+
+    # ---------- requests ----------
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def fetch(self) -> dict:
+        """One VRF output straight from the server (with retries)."""
+        attempt = 0
+        while True:
+            self._count("requests")
+            delay = None
+            try:
+                r = self.session.get(self.url, params=self.params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retries:
+                    raise VrfError(f"VRF request failed: {e}")
+            else:
+                if r.status_code == 200:
+                    return r.json()
+                if r.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    raise VrfError(f"VRF HTTP {r.status_code}: {r.text[:300]}", r.status_code)
+                delay = _retry_after(r, self.max_backoff)
+            if delay is None:
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+            attempt += 1
+            self._count("retries")
+            time.sleep(delay)
+
+    def get(self) -> dict:
+        """A fresh VRF output: from the prefetch buffer when one is ready, else fetched now."""
+        if self.prefetch > 0:
+            with self._cond:
+                self._drop_stale()
+                if self._buffer:
+                    _, out = self._buffer.popleft()
+                    self._cond.notify()
+                    self.stats["prefetch_hits"] += 1
+                    return out
+            self._count("prefetch_misses")
+        return self.fetch()
+
+    def _drop_stale(self) -> None:
+        # викликати під self._cond
+        limit = time.monotonic() - self.max_age
+        while self._buffer and self._buffer[0][0] < limit:
+            self._buffer.popleft()
+            self.stats["stale_dropped"] += 1
+
+    def _prefetch_loop(self) -> None:
+        while True:
+            with self._cond:
+                self._drop_stale()
+                while len(self._buffer) + self._inflight >= self.prefetch and not self._stop.is_set():
+                    # чекаємо на get() або доки найстаріший вихід не застаріє
+                    wait = self._buffer[0][0] + self.max_age - time.monotonic() if self._buffer else 1.0
+                    self._cond.wait(max(0.05, wait))
+                    self._drop_stale()
+                if self._stop.is_set():
+                    return
+                self._inflight += 1
+            try:
+                out = self.fetch()
+            except VrfError:
+                out = None
+            with self._cond:
+                self._inflight -= 1
+                if out is not None:
+                    self._buffer.append((time.monotonic(), out))
+            if out is None:
+                # сервер недоступний: get() отримає помилку сам, тут лише не крутимось у циклі
+                self._stop.wait(self.max_backoff)
+
+    # ---------- lifecycle ----------
+    def close(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=self.timeout[0] + self.timeout[1])
+        self.session.close()
+
+    def __enter__(self) -> "VrfClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def vrf_receipt_fields(vrf: dict) -> dict:
+    """The re4ctor_* receipt fields for a VRF response (as demo/run_lottery.py records them)."""
+    return {
+        "re4ctor_random": vrf.get("random"),
+        "re4ctor_timestamp": vrf.get("timestamp"),
+        "re4ctor_msg_hash": vrf.get("msg_hash"),
+        "re4ctor_signature": {
+            "type": vrf.get("signature_type"),
+            "v": vrf.get("v"),
+            "r": vrf.get("r"),
+            "s": vrf.get("s"),
+            "signer_addr": vrf.get("signer_addr"),
+            "pq_scheme": vrf.get("pq_scheme"),
+            "mode": vrf.get("mode"),
+            "version": vrf.get("version"),
+        },
+    }
+
+
+def _retry_after(r: requests.Response, cap: float) -> Optional[float]:
+    value = r.headers.get("Retry-After")
+    try:
+        return min(cap, max(0.0, float(value))) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,7 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+# тестовий ключ підписувача (не використовувати поза тестами)
+os.environ.setdefault("RECEIPT_SIGNER_SK_HEX", "11" * 32)
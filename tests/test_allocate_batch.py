@@ -0,0 +1,64 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from verify.cbor import CBOR_SEQ_MEDIA_TYPE, canonical_cbor
+from verify.selection import pick_uniform_index
+
+CANDS = ["agent_gamma", "agent_alpha", "agent_beta"]
+COMMITS = ["d33a9db4f45f9d2e2fc6b4341242da29b7f13e8bcc1cc928252563c2439ca84f",
+           "7b4bce91552b4a0f38bf48bdd00c08f96e2df904ae80f038534295b64f7de577"]
+TASKS = [{"task_id": f"task_{i}", "task_commit_sha256": c} for i, c in enumerate(COMMITS)]
+NDJSON = {"Content-Type": "application/x-ndjson"}
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+def _winner(commit: str) -> str:
+    return sorted(CANDS)[pick_uniform_index(commit, len(CANDS))]
+
+
+def _lines(r) -> list:
+    assert r.status_code == 200, r.text
+    return [json.loads(line) for line in r.text.splitlines()]
+
+
+def test_json_body(client):
+    out = _lines(client.post("/allocate/batch", json={"candidates": CANDS, "tasks": TASKS}))
+    assert [(x["task_id"], x["winner"]) for x in out] == [(t["task_id"], _winner(t["task_commit_sha256"]))
+                                                          for t in TASKS]
+
+
+def test_ndjson_body_streams_tasks(client):
+    body = [json.dumps({"candidates": CANDS}), json.dumps(TASKS[0]), "{not json",
+            json.dumps({"task_id": "short", "task_commit_sha256": "ab"}),
+            json.dumps({"task_id": "hex", "task_commit_sha256": "zz" * 32}), json.dumps(TASKS[1])]
+    out = _lines(client.post("/allocate/batch", content="\n".join(body), headers=NDJSON))
+    assert [x["ok"] for x in out] == [True, False, False, False, True]
+    assert [x.get("reason") for x in out[1:4]] == ["bad_json", "invalid_task", "bad_commit"]
+    assert out[2]["task_id"] == "short"
+    assert out[4]["winner"] == _winner(COMMITS[1])
+
+
+def test_cbor_seq_body(client):
+    body = canonical_cbor({"candidates": CANDS, "winners": 2}) + b"".join(canonical_cbor(t) for t in TASKS)
+    out = _lines(client.post("/allocate/batch", content=body, headers={"Content-Type": CBOR_SEQ_MEDIA_TYPE}))
+    assert [len(x["winners"]) for x in out] == [2, 2]
+
+
+def test_streamed_options_are_validated(client):
+    r = client.post("/allocate/batch", content=json.dumps({"candidates": CANDS, "winners": 0}), headers=NDJSON)
+    assert r.status_code == 422
+    r = client.post("/allocate/batch", content="", headers=NDJSON)
+    assert r.status_code == 400
+
+
+def test_allocate_non_hex_commit_is_400(client):
+    r = client.post("/allocate", json={"task_id": "t", "task_commit_sha256": "zz" * 32, "candidates": CANDS})
+    assert r.status_code == 400
+    assert r.json()["detail"].startswith("bad_commit")
@@ -0,0 +1,72 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from app.keys import KeyManager
+from app.signer import SignerPool
+from verify.verify_receipt import verify_receipt
+
+ROOT = Path(__file__).resolve().parents[1]
+GOOD = json.loads((ROOT / "demo" / "sample_receipt.json").read_text(encoding="utf-8"))
+# json.loads пропускає самотній сурогат; впасти він має лише на канонічному UTF-8
+POISON = json.dumps({**GOOD, "task_id": "\ud800"}).encode()
+
+
+def _lines(*items) -> list:
+    return [json.dumps(it).encode() if isinstance(it, dict) else it for it in items]
+
+
+async def _collect(stream) -> list:
+    return [res async for res in stream]
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+@pytest.fixture(params=["thread", "process"])
+def pool(request):
+    p = SignerPool(KeyManager.from_env(), workers=1, mode=request.param, chunk_size=2)
+    yield p
+    p.shutdown()
+
+
+@pytest.mark.parametrize("scheme", ["ed25519(sha256(canonical_json))",
+                                    "ed25519(merkle_root(sha256(canonical_json)))"])
+def test_poison_item_mid_batch(pool, scheme):
+    items = _lines(GOOD, POISON, {**GOOD, "task_id": "task_002"}, b"{not json", GOOD)
+    out = asyncio.run(_collect(pool.sign_stream(_aiter(items), scheme=scheme)))
+
+    assert [r["index"] for r in out] == [0, 1, 2, 3, 4]
+    assert [r["ok"] for r in out] == [True, False, True, False, True]
+    assert out[1]["reason"] == "invalid_item"
+    assert "UnicodeEncodeError" in out[1]["error"]
+    assert out[3]["reason"] == "bad_json"
+    for r in (out[0], out[2], out[4]):
+        verify_receipt(r["receipt"])
+
+
+def test_verify_stream_poison(pool):
+    signed = asyncio.run(_collect(pool.sign_stream(_aiter(_lines(GOOD)))))[0]["receipt"]
+    items = _lines(signed, {**signed, "task_id": "\ud800"}, signed)
+    out = asyncio.run(_collect(pool.verify_stream(_aiter(items))))
+
+    assert [r["valid"] for r in out] == [True, False, True]
+    assert out[1]["reason"] == "invalid_receipt"
+
+
+def test_http_batch_keeps_streaming():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    body = b"\n".join(_lines(GOOD, POISON, GOOD))
+    with TestClient(app) as client:
+        r = client.post("/receipt/sign/batch", content=body,
+                        headers={"Content-Type": "application/x-ndjson"})
+    assert r.status_code == 200
+    out = [json.loads(line) for line in r.text.splitlines()]
+    assert [(x["index"], x["ok"]) for x in out] == [(0, True), (1, False), (2, True)]
+    assert out[1]["reason"] == "invalid_item"
@@ -0,0 +1,56 @@
+import importlib
+import json
+
+import pytest
+
+
+@pytest.fixture
+def bench(monkeypatch):
+    # bench_api ставить RECEIPT_SIGN_CACHE=0 при імпорті; monkeypatch прибере це після тесту
+    monkeypatch.setenv("RECEIPT_SIGN_CACHE", "0")
+    return importlib.import_module("bench.bench_api")
+
+
+def test_summarize(bench):
+    res = bench.summarize("verify", 3, [0.004, 0.001, 0.002, 0.003], wall=2.0)
+    assert res == {"op": "verify", "candidates": 3, "iterations": 4, "ops_per_sec": 2.0,
+                   "p50_ms": 3.0, "p95_ms": 4.0, "p99_ms": 4.0, "max_ms": 4.0}
+    assert bench.percentile([], 50) == 0.0
+
+
+def test_compare_flags_only_real_regressions(bench):
+    baseline = {"results": [{"op": "verify", "candidates": 3, "ops_per_sec": 100.0},
+                            {"op": "allocate", "candidates": 3, "ops_per_sec": 100.0},
+                            {"op": "receipt_sign", "candidates": 3, "ops_per_sec": None}]}
+    results = [{"op": "verify", "candidates": 3, "ops_per_sec": 79.0},
+               {"op": "allocate", "candidates": 3, "ops_per_sec": 81.0},
+               {"op": "receipt_sign", "candidates": 3, "ops_per_sec": 1.0},
+               {"op": "verify", "candidates": 100, "ops_per_sec": 1.0}]
+    assert bench.compare(results, baseline, 0.2) == [results[0]]
+    assert results[1]["ratio_vs_baseline"] == 0.81
+    assert "ratio_vs_baseline" not in results[2] and "ratio_vs_baseline" not in results[3]
+
+
+def test_small_run_and_baseline_gate(bench, tmp_path, monkeypatch, capsys):
+    out, baseline = tmp_path / "results.json", tmp_path / "baseline.json"
+
+    def main(*argv):
+        monkeypatch.setattr(bench.sys, "argv", ["bench_api.py", "--sizes", "3,50", "--seconds", "0",
+                                                "--min-iters", "2", *argv])
+        return bench.main()
+
+    assert main("--out", str(out)) == 0
+    report = json.loads(out.read_text(encoding="utf-8"))
+    assert [(r["op"], r["candidates"]) for r in report["results"]] == [
+        (op, n) for n in (3, 50) for op in bench.ALL_OPS]
+    assert all(r["iterations"] >= 2 for r in report["results"])
+
+    for r in report["results"]:
+        r["ops_per_sec"] *= 100
+    baseline.write_text(json.dumps(report), encoding="utf-8")
+    assert main("--ops", "verify", "--baseline", str(baseline), "--out", str(out)) == 1
+    assert [r["op"] for r in json.loads(out.read_text(encoding="utf-8"))["regressions"]] == ["verify", "verify"]
+    assert "REGRESSION verify n=3" in capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        main("--ops", "fly")
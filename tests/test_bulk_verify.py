@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import verify.bulk_verify as bulk
+from app.main import key_manager
+from app.models import ReceiptSignRequest
+from app.signer import sign_receipt
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture(scope="module")
+def signed() -> dict:
+    req = ReceiptSignRequest.model_validate(
+        json.loads((ROOT / "demo" / "sample_receipt.json").read_text(encoding="utf-8")))
+    return sign_receipt(req, key_manager.get(None))
+
+
+@pytest.fixture
+def receipts(tmp_path, signed):
+    (tmp_path / "one.json").write_text(json.dumps(signed), encoding="utf-8")
+    (tmp_path / "pair.json").write_text(json.dumps([signed, {**signed, "task_id": "forged"}]), encoding="utf-8")
+    lines = [json.dumps(signed), "", "{not json", json.dumps({**signed, "winner": "nobody"})]
+    (tmp_path / "log.jsonl").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    (tmp_path / "skip.txt").write_text("not a receipt", encoding="utf-8")
+    return tmp_path
+
+
+def _main(monkeypatch, capsys, *argv):
+    monkeypatch.setattr(bulk.sys, "argv", ["bulk_verify.py", *argv])
+    code = bulk.main()
+    return code, json.loads(capsys.readouterr().out)
+
+
+def test_summary_is_reason_coded(receipts, monkeypatch, capsys):
+    failures = receipts / "failures.out"
+    code, summary = _main(monkeypatch, capsys, str(receipts), "--workers", "1", "--failures", str(failures))
+    assert code == 1
+    assert (summary["total"], summary["ok"], summary["failed"]) == (6, 3, 3)
+    assert summary["reasons"] == {"bad_sig": 1, "bad_json": 1, "winner_not_member": 1}
+    rows = [json.loads(line) for line in failures.read_text(encoding="utf-8").splitlines()]
+    assert {r["source"] for r in rows} == {f"{receipts / 'log.jsonl'}:3", f"{receipts / 'log.jsonl'}:4",
+                                           f"{receipts / 'pair.json'}[1]"}
+    assert all("ok" not in r for r in rows)
+    assert next(r for r in rows if r["reason"] == "bad_sig")["task_id"] == "forged"
+
+
+def test_max_failure_rate(receipts, monkeypatch, capsys):
+    assert _main(monkeypatch, capsys, str(receipts), "--workers", "1", "--max-failure-rate", "0.5")[0] == 0
+    assert _main(monkeypatch, capsys, str(receipts), "--workers", "1", "--max-failure-rate", "0.4")[0] == 1
+
+
+def test_pool_keeps_input_order(receipts):
+    inputs = [str(receipts / "log.jsonl"), str(receipts / "pair.json")]
+    serial = list(bulk.run(inputs, 1, 1))
+    assert list(bulk.run(inputs, 2, 1)) == serial
+    assert [r["ok"] for r in serial] == [True, False, False, True, False]
+
+
+def test_large_receipt_file_is_streamed(receipts, signed):
+    path = str(receipts / "one.json")
+    assert bulk.check_chunk([("file", path, 0)]) == [{"source": path, "ok": True}]
+    assert bulk._is_large_object(path, 0) and not bulk._is_large_object(str(receipts / "pair.json"), 0)
+
+
+def test_no_receipts_exits_2(tmp_path, monkeypatch, capsys):
+    code, summary = _main(monkeypatch, capsys, str(tmp_path), "--workers", "1")
+    assert code == 2 and summary["total"] == 0
@@ -0,0 +1,77 @@
+import hashlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.candidates import CandidateSetRegistry, candidate_set_id
+
+
+def _commit(i: int) -> str:
+    return hashlib.sha256(f"task_{i}".encode()).hexdigest()
+
+
+def test_inline_weighted_does_not_evict_registered(monkeypatch):
+    monkeypatch.setattr(main, "candidate_sets", CandidateSetRegistry(max_sets=2))
+    client = TestClient(main.app)
+    r = client.post("/candidate-sets", json={"candidates": ["b", "a", "c"], "weights": [1, 2, 3]})
+    set_id = r.json()["candidate_set_id"]
+
+    for i in range(10):
+        r = client.post("/allocate", json={
+            "task_id": f"t{i}", "task_commit_sha256": _commit(i), "allocation_mode": "weighted",
+            "candidates": [f"agent_{i}_{j}" for j in range(3)], "weights": [1, 1, i + 1],
+        })
+        assert r.status_code == 200, r.text
+        assert "candidate_set_id" not in r.json()
+
+    r = client.post("/allocate", json={"task_id": "t", "task_commit_sha256": _commit(0),
+                                       "allocation_mode": "weighted", "candidate_set_id": set_id})
+    assert r.status_code == 200, r.text
+    assert main.candidate_sets.stats()["sets"] == 1
+    assert client.get(f"/candidate-sets/{set_id}").status_code == 200
+
+
+def test_set_id_is_content_addressed():
+    reg = CandidateSetRegistry()
+    a = reg.register(["b", "a", "c"])
+    assert reg.register(["c", "b", "a"]) is a
+    assert a.candidates == ("a", "b", "c") and a.index == {"a": 0, "b": 1, "c": 2}
+    assert a.set_id == candidate_set_id(["a", "b", "c"])
+    weighted = reg.register(["b", "a"], [5, 1])
+    assert weighted.candidates == ("a", "b") and weighted.weights == (1, 5)
+    assert weighted.set_id != reg.register(["b", "a"]).set_id
+
+
+def test_lru_eviction_by_sets_and_items():
+    reg = CandidateSetRegistry(max_sets=2, max_items=5)
+    a = reg.register(["a1", "a2"])
+    b = reg.register(["b1", "b2"])
+    assert reg.get(a.set_id) is a  # a - свіжіший за b
+    c = reg.register(["c1"])
+    assert reg.get(b.set_id) is None
+    assert reg.get(a.set_id) is a and reg.get(c.set_id) is c
+    d = reg.register(["d1", "d2", "d3", "d4"])  # 2 + 1 + 4 > 5: витісняємо найстаріший (a)
+    assert [reg.get(x.set_id) for x in (a, c, d)] == [None, c, d]
+    stats = reg.stats()
+    assert stats["sets"] == 2 and stats["items"] == 5 and stats["evictions"] == 2
+
+
+def test_register_rejects_bad_input():
+    reg = CandidateSetRegistry(max_items=2)
+    for candidates, weights in ([], None), (["a", "b", "c"], None), (["a", "b"], [1]), (["a"], [0]):
+        with pytest.raises(ValueError):
+            reg.register(candidates, weights)
+
+
+def test_api_round_trip_and_unknown_id(monkeypatch):
+    monkeypatch.setattr(main, "candidate_sets", CandidateSetRegistry())
+    client = TestClient(main.app)
+    r = client.post("/candidate-sets", json={"candidates": ["agent_b", "agent_a"]})
+    set_id = r.json()["candidate_set_id"]
+    assert client.get(f"/candidate-sets/{set_id}").json()["candidates"] == ["agent_a", "agent_b"]
+    r = client.post("/allocate", json={"task_id": "t", "task_commit_sha256": _commit(1), "candidate_set_id": set_id})
+    assert r.status_code == 200 and r.json()["winner"] in ("agent_a", "agent_b")
+    assert "candidates" not in r.json()
+    r = client.post("/allocate", json={"task_id": "t", "task_commit_sha256": _commit(1), "candidate_set_id": "0" * 64})
+    assert r.status_code == 404
@@ -0,0 +1,35 @@
+from hashlib import sha256
+
+import pytest
+
+from verify import canonical_conformance
+from verify.canonical import available_backends, canonical_bytes, canonical_sha256, iter_canonical_chunks
+from verify.canonical_conformance import corpus_cases, generated_cases, reference_bytes
+
+
+def _cases():
+    yield from ((name, value) for name, value, _ in corpus_cases())
+    yield from generated_cases(5000)
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_backends_are_byte_identical(backend):
+    for name, value in _cases():
+        ref = reference_bytes(value)
+        assert canonical_bytes(value, backend=backend) == ref, name
+        assert canonical_sha256(value, backend=backend) == sha256(ref).digest(), name
+
+
+def test_streamed_chunks_join_to_the_reference():
+    for name, value in _cases():
+        assert b"".join(iter_canonical_chunks(value)) == reference_bytes(value), name
+
+
+def test_conformance_script_passes(capsys):
+    assert canonical_conformance.run(1000) == 0
+    assert '"failures": 0' in capsys.readouterr().out
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        canonical_bytes({}, backend="simdjson")
@@ -0,0 +1,120 @@
+import json
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from verify import receipt_convert
+from verify.canonical import canonical_bytes
+from verify.cbor import (CBOR_MEDIA_TYPE, CBOR_SIGNATURE_SCHEME, CBORIncomplete, canonical_cbor, cbor_loads,
+                         iter_cbor_seq)
+from verify.verify_receipt import VerifyError, load_receipt_bytes, verify_receipt
+
+ROOT = Path(__file__).resolve().parents[1]
+GOOD = json.loads((ROOT / "demo" / "sample_receipt.json").read_text(encoding="utf-8"))
+
+
+# RFC 8949, appendix A
+@pytest.mark.parametrize("value, hex_", [
+    (0, "00"), (23, "17"), (24, "1818"), (1000, "1903e8"), (1000000, "1a000f4240"),
+    (18446744073709551615, "1bffffffffffffffff"), (18446744073709551616, "c249010000000000000000"),
+    (-1, "20"), (-1000, "3903e7"), (-18446744073709551617, "c349010000000000000000"),
+    (0.0, "f90000"), (-0.0, "f98000"), (1.5, "f93e00"), (65504.0, "f97bff"), (100000.0, "fa47c35000"),
+    (1.1, "fb3ff199999999999a"), (float("inf"), "f97c00"), (float("nan"), "f97e00"),
+    (False, "f4"), (True, "f5"), (None, "f6"),
+    ("", "60"), ("IETF", "6449455446"), ("ü", "62c3bc"), ("\U00010151", "64f0908591"),
+    ([], "80"), ([1, [2, 3], [4, 5]], "8301820203820405"),
+    ({"a": 1, "b": [2, 3]}, "a26161016162820203"),
+])
+def test_rfc_vectors(value, hex_):
+    assert canonical_cbor(value).hex() == hex_
+    back = cbor_loads(bytes.fromhex(hex_))
+    assert back == value or value != value
+
+
+def test_map_keys_sort_by_encoded_bytes():
+    # коротший ключ іде першим незалежно від алфавіту
+    data = canonical_cbor({"bb": 1, "a": 2, "c": 3, "aaa": 4})
+    assert list(cbor_loads(data)) == ["a", "c", "bb", "aaa"]
+    assert canonical_cbor(cbor_loads(data)) == data
+
+
+@pytest.mark.parametrize("hex_", [
+    "5f",          # indefinite byte string
+    "9f01ff",      # indefinite array
+    "4101",        # byte string
+    "a2616101616102",  # duplicate key
+    "a10101",      # non-text key
+    "d82001",      # unsupported tag
+    "6180",        # invalid UTF-8
+    "0000",        # extra data
+])
+def test_decoder_rejects(hex_):
+    with pytest.raises(ValueError):
+        cbor_loads(bytes.fromhex(hex_))
+
+
+def test_incomplete_and_sequences():
+    data = canonical_cbor(GOOD)
+    for cut in (1, len(data) // 2, len(data) - 1):
+        with pytest.raises(CBORIncomplete):
+            cbor_loads(data[:cut])
+    assert list(iter_cbor_seq(data + canonical_cbor([1]))) == [GOOD, [1]]
+    with pytest.raises(TypeError):
+        canonical_cbor({"raw": b"\x00"})
+
+
+def test_cbor_scheme_round_trip():
+    with TestClient(app) as client:
+        r = client.post("/receipt/sign?scheme=cbor", content=canonical_cbor(GOOD),
+                        headers={"Content-Type": CBOR_MEDIA_TYPE, "Accept": CBOR_MEDIA_TYPE})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith(CBOR_MEDIA_TYPE)
+    receipt = load_receipt_bytes(r.content)
+    assert canonical_cbor(receipt) == r.content
+    assert receipt["signature_scheme"] == CBOR_SIGNATURE_SCHEME
+    verify_receipt(receipt)
+    # JSON-копія того ж receipt теж перевіряється: підпис над канонічним CBOR, не над байтами файлу
+    verify_receipt(load_receipt_bytes(json.dumps(receipt).encode()))
+    with pytest.raises(VerifyError) as e:
+        verify_receipt({**receipt, "note": receipt["note"] + "."})
+    assert e.value.reason == "bad_sig"
+
+
+@pytest.fixture(scope="module")
+def signed_both():
+    with TestClient(app) as client:
+        return [client.post(f"/receipt/sign?scheme={scheme}", json={**GOOD, "task_id": f"task_{scheme}"}).json()
+                for scheme in ("ed25519", "cbor")]
+
+
+def test_convert_is_lossless(signed_both):
+    data = canonical_bytes(signed_both)
+    as_cbor, items = receipt_convert.convert(data)
+    assert items == signed_both
+    back, items = receipt_convert.convert(as_cbor)
+    assert back == data and items == signed_both
+    for receipt in items:
+        verify_receipt(receipt)
+
+    jsonl = b"".join(canonical_bytes(x) + b"\n" for x in signed_both)
+    seq, _ = receipt_convert.convert(jsonl, seq=True)
+    assert list(iter_cbor_seq(seq)) == signed_both
+    assert receipt_convert.convert(seq, seq=True)[0] == jsonl
+
+
+def test_convert_cli(signed_both, tmp_path, monkeypatch):
+    src, out = tmp_path / "in.json", tmp_path / "out.cbor"
+
+    def main(*argv):
+        monkeypatch.setattr(receipt_convert.sys, "argv", ["receipt_convert.py", str(src), *argv])
+        return receipt_convert.main()
+
+    src.write_bytes(canonical_bytes(signed_both[1]))
+    assert main("-o", str(out), "--verify") == 0
+    assert cbor_loads(out.read_bytes()) == signed_both[1]
+    src.write_bytes(canonical_bytes({**signed_both[1], "winner": "agent_beta"}))
+    assert main("-o", str(out), "--verify") == 1
+    src.write_bytes(b"{not json")
+    assert main("--to", "cbor") == 2
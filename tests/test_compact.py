@@ -0,0 +1,85 @@
+import hashlib
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from verify.canonical import canonical_bytes
+from verify.merkle import candidate_levels
+from verify.stream_verify import verify_receipt_stream
+from verify.verify_receipt import VerifyError, verify_receipt
+
+COMMIT = hashlib.sha256(b"compact").hexdigest()
+CANDS = sorted(f"agent_{i:05d}" for i in range(5000))
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+def _sign(client, form="compact", **body) -> dict:
+    body = {"task_id": "compact", "task_commit_sha256": COMMIT, "candidates": CANDS, **body}
+    alloc = client.post("/allocate", json=body).json()
+    alloc.pop("ok")
+    r = client.post(f"/receipt/sign?form={form}", json=alloc)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_compact_receipt_is_log_size(client):
+    full, compact = _sign(client, form="full"), _sign(client)
+    assert "candidates" not in compact
+    assert compact["candidates_root"] == candidate_levels(CANDS)[-1][0].hex()
+    assert compact["candidates_count"] == len(CANDS)
+    assert CANDS[compact["winner_index"]] == compact["winner"] == full["winner"]
+    assert len(compact["winner_proof"]) == 13  # ceil(log2(5000))
+    assert len(canonical_bytes(compact)) * 40 < len(canonical_bytes(full))
+    assert verify_receipt(compact) == verify_receipt(full)
+    verify_receipt_stream(io.BytesIO(json.dumps(compact).encode()))
+
+
+def test_registered_set_has_the_same_root(client):
+    set_id = client.post("/candidate-sets", json={"candidates": CANDS[::-1]}).json()["candidate_set_id"]
+    receipt = _sign(client, candidates=None, candidate_set_id=set_id)
+    assert receipt["candidates_root"] == candidate_levels(CANDS)[-1][0].hex()
+    verify_receipt(receipt)
+
+
+def test_k_of_n_carries_a_proof_per_winner(client):
+    receipt = _sign(client, winners=4)
+    assert len(receipt["winners_proof"]) == 4
+    verify_receipt(receipt)
+    for patch in ({"winners_proof": receipt["winners_proof"][:3]},
+                  {"winners_proof": receipt["winners_proof"][::-1]},
+                  {"winner_index": receipt["winner_index"] ^ 1}):
+        with pytest.raises(VerifyError) as e:
+            verify_receipt({**receipt, **patch})
+        assert e.value.reason == "bad_candidates_proof"
+
+
+def test_tampered_proofs(client):
+    receipt = _sign(client)
+    i = receipt["winner_index"]
+    other = CANDS[i + 1] if i + 1 < len(CANDS) else CANDS[i - 1]
+    proof = receipt["winner_proof"]
+    for patch in ({"winner": other}, {"winner_proof": proof[:-1]}, {"winner_proof": ["00" * 32] + proof[1:]},
+                  {"winner_proof": ["zz"] + proof[1:]}):
+        with pytest.raises(VerifyError) as e:
+            verify_receipt({**receipt, **patch})
+        assert e.value.reason == "bad_candidates_proof"
+    with pytest.raises(VerifyError) as e:
+        verify_receipt({**receipt, "candidates_root": "ab"})
+    assert e.value.reason == "invalid_receipt"
+
+
+def test_compact_needs_uniform_lexicographic(client):
+    r = client.post("/receipt/sign?form=compact", json={
+        "task_id": "t", "task_commit_sha256": COMMIT, "candidate_order": "as-listed",
+        "candidates": ["b", "a"], "winner": "a"})
+    assert r.status_code == 400
+    r = client.post("/receipt/sign?form=tiny", json={})
+    assert r.status_code == 400
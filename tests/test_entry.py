@@ -0,0 +1,37 @@
+import pytest
+
+import app.__main__ as entry
+
+
+@pytest.fixture
+def run(monkeypatch):
+    calls = []
+    monkeypatch.setattr(entry.uvicorn, "run", lambda *a, **kw: calls.append(kw))
+    for name in ("APP_WORKERS", "APP_METRICS", "RECEIPT_STORE_DIR", "RECEIPT_SIGN_WORKERS"):
+        monkeypatch.delenv(name, raising=False)
+
+    def start(*argv):
+        monkeypatch.setattr(entry.sys, "argv", ["python -m app", *argv])
+        assert entry.main() == 0
+        return calls[-1]
+    return start
+
+
+def test_one_worker_by_default(run, capsys):
+    assert run()["workers"] == 1
+    assert "warning" not in capsys.readouterr().err
+    assert "APP_METRICS" not in entry.os.environ
+
+
+def test_several_workers_warn_about_per_worker_state(run, capsys):
+    assert run("--workers", "2")["workers"] == 2
+    err = capsys.readouterr().err
+    assert "candidate_set_id" in err and "/metrics is off" in err
+    assert entry.os.environ["APP_METRICS"] == "0"
+
+
+def test_store_needs_one_worker(run, monkeypatch):
+    monkeypatch.setenv("RECEIPT_STORE_DIR", "/tmp/store")
+    with pytest.raises(SystemExit):
+        run("--workers", "2")
+    assert run()["workers"] == 1
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from app.models import AllocateRequest
+from demo import epoch_lottery
+from demo.epoch_lottery import allocate, load_beacon, save_beacon
+from verify import winner_audit
+from verify.selection import RULE_EPOCH, epoch_draw_sha256, epoch_seed, sample_k_indices
+from verify.verify_receipt import VerifyError, draw_source
+
+COMMIT = "7b4bce91552b4a0f38bf48bdd00c08f96e2df904ae80f038534295b64f7de577"
+BEACON = {"random": "ab" * 32, "timestamp": "2026-10-12T00:00:00Z"}
+CANDS = ["agent_gamma", "agent_alpha", "agent_beta", "agent_delta"]
+
+
+def _task(**extra) -> AllocateRequest:
+    return AllocateRequest.model_validate({"task_id": "t1", "task_commit_sha256": COMMIT, "candidates": CANDS,
+                                           **extra})
+
+
+def test_uniform_draw_follows_protocol():
+    req = allocate(_task(), "2026-W42", BEACON, {"re4ctor_random": BEACON["random"]})
+    draw = epoch_draw_sha256(COMMIT, "2026-W42", BEACON["random"])
+    assert req["candidates"] == sorted(CANDS)
+    assert req["winner"] == sorted(CANDS)[int(draw, 16) % len(CANDS)]
+    assert req["allocation_rule"] == RULE_EPOCH and req["epoch"] == "2026-W42"
+    winner_audit.rederive(req, RULE_EPOCH)
+
+
+def test_draw_depends_on_epoch_and_beacon():
+    draws = {epoch_draw_sha256(COMMIT, e, r) for e in ("2026-W42", "2026-W43") for r in ("ab", "cd")}
+    assert len(draws) == 4
+
+
+@pytest.mark.parametrize("extra", [{"winners": 2}, {"allocation_mode": "weighted", "weights": [1, 2, 3, 4]}])
+def test_k_of_n_and_weighted_rederive(extra):
+    req = allocate(_task(**extra), "2026-W42", BEACON, {"re4ctor_random": BEACON["random"]})
+    winner_audit.rederive(req, RULE_EPOCH)
+
+
+def test_commit_after_beacon_is_refused():
+    with pytest.raises(LookupError):
+        allocate(_task(), "2026-W42", BEACON, {}, commit_ts="2026-10-12T00:00:01Z")
+    allocate(_task(), "2026-W42", BEACON, {}, commit_ts="2026-10-11T23:59:59Z")
+
+
+def test_first_saved_beacon_wins(tmp_path):
+    path = tmp_path / "2026-W42.json"
+    assert save_beacon(path, BEACON) == (BEACON, False)
+    other = {**BEACON, "random": "cd" * 32}
+    assert save_beacon(path, other) == (BEACON, True)
+    assert json.loads(path.read_text()) == BEACON
+    assert [p.name for p in tmp_path.iterdir()] == ["2026-W42.json"]
+
+
+def test_cached_beacon_needs_no_vrf_call(tmp_path, monkeypatch):
+    save_beacon(tmp_path / "2026-W42.json", BEACON)
+    monkeypatch.setattr(epoch_lottery, "VrfClient", None)  # виклик VRF тут упав би
+    assert load_beacon("2026-W42", tmp_path) == (BEACON, True)
+
+
+def test_audit_flags_epoch_with_two_beacons(tmp_path, capsys):
+    lines = []
+    for i, rnd in enumerate(["ab" * 32, "ab" * 32, "cd" * 32]):
+        beacon = {**BEACON, "random": rnd}
+        req = allocate(_task(), "2026-W42", beacon, {"re4ctor_random": rnd})
+        lines.append(json.dumps({**req, "task_id": f"t{i}"}))
+    req = allocate(_task(), "2026-W43", BEACON, {"re4ctor_random": BEACON["random"]})
+    lines.append(json.dumps(req))
+    receipts = tmp_path / "receipts.jsonl"
+    receipts.write_text("\n".join(lines) + "\n")
+    failures = tmp_path / "failures.jsonl"
+
+    assert winner_audit.main([str(receipts), "--workers", "1", "--failures", str(failures)]) == 1
+    summary = json.loads(capsys.readouterr().out)
+    assert summary["failed"] == 0 and summary["epochs"] == 2
+    assert summary["epoch_beacon_conflicts"] == {"2026-W42": 2}
+    assert json.loads(failures.read_text())["reason"] == "epoch_beacon_conflict"
+
+
+@pytest.mark.parametrize("commit", [5, None, "zz"])
+def test_epoch_receipt_with_bad_commit_is_invalid(commit):
+    receipt = {"task_commit_sha256": commit, "epoch": "2026-W42", "re4ctor_random": BEACON["random"]}
+    with pytest.raises(VerifyError) as e:
+        draw_source(receipt)
+    assert e.value.reason == "invalid_receipt"
+    with pytest.raises(ValueError):
+        epoch_seed(commit, "2026-W42")
+    with pytest.raises(ValueError):
+        sample_k_indices(commit, 4, 2)
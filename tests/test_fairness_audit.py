@@ -0,0 +1,56 @@
+import json
+
+import numpy as np
+
+from verify.fairness_audit import WinStats, audit, reduce_chunk
+
+
+def _item(receipt: dict) -> tuple:
+    return ("line", "test", json.dumps(receipt))
+
+
+def _stats(receipts: list, chunk: int = 7) -> WinStats:
+    stats = WinStats()
+    items = [_item(r) for r in receipts]
+    for i in range(0, len(items), chunk):
+        stats.add(reduce_chunk(items[i:i + chunk]))
+    return stats
+
+
+def _receipts() -> list:
+    # дві епохи з різними пулами; "b" виграє завжди, коли бере участь
+    out = []
+    for i in range(40):
+        out.append({"candidates": ["a", "b", "c"], "winner": "b", "epoch": "2026-W01"})
+        out.append({"candidates": ["c", "d"], "winner": ["c", "d"][i % 2], "epoch": "2026-W02"})
+    return out
+
+
+def test_sparse_pairs_only():
+    stats = _stats(_receipts())
+    v = stats.view()
+    assert v["epochs"] == ["2026-W01", "2026-W02"]
+    # 3 + 2 пари, а не 2 x 4
+    assert len(stats.keys) == 5
+    assert list(v["bounds"]) == [0, 3, 5]
+    assert [stats.candidates[c] for c in v["cand"]] == ["a", "b", "c", "c", "d"]
+    assert list(v["draws"]) == [40, 40, 40, 40, 40]
+    assert list(v["observed"]) == [0, 40, 0, 20, 20]
+
+
+def test_merge_is_order_independent(monkeypatch):
+    receipts = _receipts()
+    merged_once = _stats(receipts, chunk=len(receipts)).view()
+    monkeypatch.setattr(WinStats, "MIN_MERGE", 1)
+    merged_often = _stats(receipts, chunk=3).view()
+    for f in WinStats.FIELDS + ("cand", "bounds"):
+        assert np.allclose(merged_once[f], merged_often[f])
+
+
+def test_audit_flags_biased_candidate_and_epoch():
+    result = audit(_stats(_receipts()), alpha=0.01, top=5)
+    assert result["receipts"] == 80 and result["candidates"] == 4 and result["epochs"] == 2
+    assert result["flagged"][0]["candidate"] == "b"
+    w1, w2 = result["per_epoch"]
+    assert w1["flagged"] and w1["max_abs_z_candidate"] == "b"
+    assert not w2["flagged"] and w2["tv_distance"] == 0.0
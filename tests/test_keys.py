@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from app.keys import DEFAULT_KEY_ID, KeyManager
+
+SEED_A = bytes(range(32))
+SEED_B = bytes(range(32, 64))
+
+
+def test_hex_key_is_parsed_once():
+    km = KeyManager(sk_hex=SEED_A.hex())
+    key = km.get(None)
+    assert key.key_id == DEFAULT_KEY_ID
+    assert km.get(DEFAULT_KEY_ID) is key
+    assert km.key_ids() == [DEFAULT_KEY_ID]
+
+
+def test_file_key_reloads_on_change_only(tmp_path):
+    path = tmp_path / "sk.bin"
+    path.write_bytes(SEED_A)
+    km = KeyManager(key_paths={"prod": str(path)}, default_key_id="prod", reload_check_sec=0)
+    first = km.get(None)
+    assert km.get("prod") is first  # той самий mtime/size - без повторного читання
+
+    path.write_bytes(SEED_B + SEED_B)  # 64 байти: seed || pk
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, first.mtime_ns + 1_000_000))
+    second = km.get("prod")
+    assert second is not first and second.pubkey_hex != first.pubkey_hex
+
+
+def test_reload_check_is_throttled(tmp_path):
+    path = tmp_path / "sk.bin"
+    path.write_bytes(SEED_A)
+    km = KeyManager(key_paths={"prod": str(path)}, default_key_id="prod", reload_check_sec=3600)
+    first = km.get(None)
+    path.write_bytes(SEED_B)
+    assert km.get(None) is first
+
+
+def test_errors(tmp_path):
+    km = KeyManager(key_paths={"gone": str(tmp_path / "missing.bin")}, default_key_id="gone")
+    with pytest.raises(KeyError):
+        km.get("other")
+    with pytest.raises(FileNotFoundError):
+        km.get(None)
+    assert set(km.preload()) == {"gone"}
+    with pytest.raises(ValueError):
+        KeyManager(sk_hex="ab" * 16 + "cd").get(None)
+
+
+def test_from_env(monkeypatch, tmp_path):
+    path = tmp_path / "stage.bin"
+    path.write_bytes(SEED_B)
+    monkeypatch.delenv("RECEIPT_SIGNER_SK_HEX")
+    monkeypatch.setenv("RECEIPT_SIGNER_KEYS", f"stage={path}")
+    monkeypatch.delenv("RECEIPT_SIGNER_SK_PATH", raising=False)
+    monkeypatch.delenv("RECEIPT_SIGNER_DEFAULT_KEY_ID", raising=False)
+    km = KeyManager.from_env()
+    assert km.key_ids() == ["stage"] and km.default_key_id == "stage"
+    assert km.preload() == {}
@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+import json
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.keys import KeyManager
+from app.main import app
+from app.signer import MerkleBatcher, merkle_signatures
+from verify.merkle import MERKLE_SIGNATURE_SCHEME, leaf_hash, merkle_proofs, node_hash, root_from_path
+from verify.verify_receipt import VerifyError, verify_receipt
+
+ROOT = Path(__file__).resolve().parents[1]
+GOOD = json.loads((ROOT / "demo" / "sample_receipt.json").read_text(encoding="utf-8"))
+
+
+def _mth(data: list) -> bytes:
+    """RFC 6962, 2.1: MTH over the largest power of two smaller than n."""
+    if len(data) == 1:
+        return leaf_hash(data[0])
+    k = 1
+    while k * 2 < len(data):
+        k *= 2
+    return node_hash(_mth(data[:k]), _mth(data[k:]))
+
+
+def _hashes(n: int) -> list:
+    return [hashlib.sha256(str(i).encode()).digest() for i in range(n)]
+
+
+@pytest.mark.parametrize("n", list(range(1, 18)) + [100])
+def test_root_and_every_proof(n):
+    hashes = _hashes(n)
+    root, paths = merkle_proofs(hashes)
+    assert root == _mth(hashes)
+    for i, (h, path) in enumerate(zip(hashes, paths)):
+        assert root_from_path(h, i, n, path) == root
+
+
+def test_bad_proofs():
+    hashes = _hashes(7)
+    root, paths = merkle_proofs(hashes)
+    assert root_from_path(hashes[3], 2, 7, paths[3]) != root
+    assert root_from_path(hashes[3], 3, 7, paths[3][::-1]) != root
+    for index, path in ((7, paths[3]), (3, paths[3][:-1]), (3, paths[3] + [root])):
+        with pytest.raises(ValueError):
+            root_from_path(hashes[3], index, 7, path)
+
+
+def test_batcher_signs_one_root():
+    key = KeyManager.from_env().get(None)
+    hashes = _hashes(5)
+
+    async def sign_all():
+        batcher = MerkleBatcher(window_sec=60, max_batch=5)
+        fields = await asyncio.gather(*(batcher.sign(key, h) for h in hashes))
+        return batcher, fields
+
+    batcher, fields = asyncio.run(sign_all())
+    assert (batcher.batches, batcher.receipts) == (1, 5)
+    assert len({f["signature"] for f in fields}) == 1
+    assert fields == merkle_signatures(hashes, key)
+    assert [f["merkle_leaf_index"] for f in fields] == list(range(5))
+
+
+def test_signed_receipts_verify():
+    with TestClient(app) as client:
+        r = client.post("/receipt/sign/batch?scheme=merkle",
+                        content="\n".join(json.dumps({**GOOD, "task_id": f"t{i}"}) for i in range(5)),
+                        headers={"Content-Type": "application/x-ndjson"})
+        assert r.status_code == 200
+        receipts = [json.loads(line)["receipt"] for line in r.text.splitlines()]
+        single = client.post("/receipt/sign?scheme=merkle", json=GOOD).json()
+    for receipt in receipts + [single]:
+        assert receipt["signature_scheme"] == MERKLE_SIGNATURE_SCHEME
+        verify_receipt(receipt)
+    assert single["merkle_tree_size"] == 1 and single["merkle_path"] == []
+
+    receipt = receipts[1]
+    for patch in ({"task_id": "forged"}, {"merkle_leaf_index": 0}, {"merkle_path": ["zz"]},
+                  {"merkle_root": receipt["merkle_root"][::-1]}):
+        with pytest.raises(VerifyError) as e:
+            verify_receipt({**receipt, **patch})
+        assert e.value.reason == "bad_merkle_proof"
+    sig = receipt["signature"]
+    with pytest.raises(VerifyError) as e:
+        verify_receipt({**receipt, "signature": sig[:-2] + ("00" if sig[-2:] != "00" else "01")})
+    assert e.value.reason == "bad_sig"
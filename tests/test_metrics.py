@@ -0,0 +1,26 @@
+from fastapi.testclient import TestClient
+
+import app.main
+from app.metrics import Counter, Histogram, Registry
+
+
+def test_render_text_format():
+    reg = Registry()
+    c = reg.register(Counter("t_total", "test", ("reason",)))
+    h = reg.register(Histogram("t_seconds", "test", buckets=(0.1,)))
+    c.inc("bad_json")
+    h.observe(0.05)
+    text = reg.render()
+    assert 't_total{reason="bad_json"} 1' in text
+    assert 't_seconds_bucket{le="0.1"} 1' in text
+    assert "t_seconds_count 1" in text
+    assert "pid=" not in text
+
+
+def test_metrics_off_with_several_workers(monkeypatch):
+    client = TestClient(app.main.app)
+    assert client.get("/metrics").status_code == 200
+    monkeypatch.setattr(app.main, "METRICS_ENABLED", False)
+    r = client.get("/metrics")
+    assert r.status_code == 404
+    assert r.json()["detail"].startswith("metrics_disabled")
@@ -0,0 +1,103 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import verify.bulk_verify as bulk
+from app.main import key_manager
+from app.models import ReceiptSignRequest
+from app.signer import sign_receipt
+from verify.replay_index import BloomFilter, ReplayIndex, receipt_key
+
+ROOT = Path(__file__).resolve().parents[1]
+GOOD = json.loads((ROOT / "demo" / "sample_receipt.json").read_text(encoding="utf-8"))
+
+
+def _keys(n: int, tag: str = "k") -> list:
+    return [receipt_key(f"{tag}{i}", "c", "s") for i in range(n)]
+
+
+def test_bloom_has_no_false_negatives(tmp_path):
+    bloom = BloomFilter.for_capacity(5000)
+    keys = _keys(5000)
+    for k in keys:
+        bloom.add(k)
+    assert all(k in bloom for k in keys)
+    false_positives = sum(k in bloom for k in _keys(20000, "other"))
+    assert false_positives < 20000 * 0.02
+
+    path = str(tmp_path / "f.bloom")
+    bloom.save(path)
+    loaded = BloomFilter.load(path)
+    assert loaded.data == bloom.data and (loaded.bits, loaded.hashes) == (bloom.bits, bloom.hashes)
+    with open(path, "r+b") as f:
+        f.truncate(100)
+    assert BloomFilter.load(path) is None
+
+
+@pytest.fixture
+def index(tmp_path):
+    idx = ReplayIndex(str(tmp_path / "r.idx"), capacity=8).open()
+    yield idx
+    idx.close()
+
+
+def test_replays_conflicts_and_duplicates(index, tmp_path):
+    a, b = str(tmp_path / "a.jsonl:1"), str(tmp_path / "b.jsonl:1")
+    assert index.check(a, "t1", "c1", "sig1", "w1") is None
+    assert index.check(a, "t1", "c1", "sig1", "w1") is None  # той самий рядок ще раз - не replay
+    assert index.check(b, "t1", "c1", "sig1", "w1")[0] == "replay"
+    assert index.check(b, "t1", "c1", "sig2", "w1")[0] == "duplicate_receipt"
+    assert index.check(b, "t1", "c1", "sig3", "w2")[0] == "conflicting_receipt"
+    assert index.check(b, "t1", "c2", "sig4", "w1")[0] == "conflicting_receipt"
+    assert index.check("<stdin>:1", "t2", "c", "s", "w") is None
+    assert index.check("<stdin>:1", "t2", "c", "s", "w")[0] == "replay"
+    s = index.summary()
+    assert (s["replay"], s["duplicate_receipt"], s["conflicting_receipt"], s["already_indexed"]) == (2, 1, 2, 1)
+
+
+def test_growth_and_reopen_keep_every_key(tmp_path):
+    path = str(tmp_path / "r.idx")
+    idx = ReplayIndex(path, capacity=8).open()
+    for i in range(200):
+        assert idx.check(f"x:{i}", f"t{i}", "c", f"s{i}", "w") is None
+    assert idx.summary()["bloom_rebuilds"] > 1 and idx.bloom.capacity >= 400
+    idx.close()
+
+    idx = ReplayIndex(path, capacity=8).open()
+    assert idx.summary()["bloom_rebuilds"] == 0  # фільтр з чистого close()
+    assert all(idx.check(f"y:{i}", f"t{i}", "c", f"s{i}", "w")[0] == "replay" for i in range(200))
+    idx.close()
+
+    Path(path + ".bloom").unlink()
+    idx = ReplayIndex(path, capacity=8).open()
+    assert idx.summary()["bloom_rebuilds"] == 1
+    assert idx.check("z:0", "t0", "c", "s0", "w")[0] == "replay"
+    idx.close()
+
+
+def test_bulk_runs_are_incremental(tmp_path, monkeypatch, capsys):
+    key = key_manager.get(None)
+    signed = [sign_receipt(ReceiptSignRequest.model_validate({**GOOD, "task_id": f"t{i}"}), key) for i in range(3)]
+    log = tmp_path / "log.jsonl"
+    log.write_text(json.dumps(signed[0]) + "\n" + json.dumps(signed[1]) + "\n", encoding="utf-8")
+    (tmp_path / "copy.json").write_text(json.dumps(signed[0]), encoding="utf-8")
+
+    def main():
+        monkeypatch.setattr(bulk.sys, "argv", ["bulk_verify.py", str(tmp_path), "--workers", "1",
+                                               "--replay-index", str(tmp_path / "idx.sqlite")])
+        code = bulk.main()
+        return code, json.loads(capsys.readouterr().out)
+
+    code, summary = main()
+    assert code == 1 and summary["reasons"] == {"replay": 1} and summary["total"] == 3
+
+    code, summary = main()
+    assert code == 0 and summary["total"] == 0 and summary["skipped_sources"] == 2
+
+    with open(log, "a", encoding="utf-8") as f:
+        f.write(json.dumps(signed[2]) + "\n" + json.dumps({**signed[1], "signature": signed[0]["signature"]}))
+    code, summary = main()
+    # дописаний рядок без \n ще вважається незавершеним, але перевіряється
+    assert summary["total"] == 2 and summary["skipped_sources"] == 1
+    assert summary["reasons"] == {"bad_sig": 1}
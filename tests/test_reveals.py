@@ -0,0 +1,78 @@
+import json
+
+from demo.bulk_commit import commit_lines
+from verify import verify_reveals
+from verify.task_commit import task_commit_sha256
+from verify.verify_reveals import RevealChecker, check_reveals, parse_commits
+
+NONCE = "00" * 32
+
+
+def _reveal(task_id: str, **extra) -> dict:
+    rev = {"task_id": task_id, "description": "d", "reward": "1", "nonce_hex": NONCE}
+    rev.update(extra)
+    return rev
+
+
+def _commit(task_id: str, description: str = "d") -> dict:
+    return {"task_id": task_id, "task_commit_sha256": task_commit_sha256(task_id, description, "1", NONCE)}
+
+
+def _join(commits, reveals) -> list:
+    checker = RevealChecker()
+    parsed, _ = parse_commits([("c", json.dumps(c)) for c in commits])
+    checker.add_commits(parsed)
+    lines = [(f"r:{i}", r if isinstance(r, str) else json.dumps(r)) for i, r in enumerate(reveals, 1)]
+    return [(res["ok"], res.get("reason")) for res in checker.join(check_reveals(lines))]
+
+
+def test_join_reasons():
+    commits = [_commit("ok"), _commit("dup"), _commit("wrong"), _commit("twice"), _commit("twice", "other")]
+    reveals = [
+        _reveal("ok"),
+        _reveal("dup"), _reveal("dup"),
+        _reveal("wrong", description="changed"),
+        _reveal("twice"),
+        _reveal("nobody"),
+        "{not json",
+        {"task_id": "no_nonce"},
+    ]
+    assert _join(commits, reveals) == [
+        (True, None),
+        (True, None), (False, "duplicate_reveal"),
+        (False, "commit_mismatch"),
+        (False, "conflicting_commit"),
+        (False, "no_commit"),
+        (False, "bad_json"),
+        (False, "bad_reveal"),
+    ]
+
+
+def test_claimed_commit_is_case_insensitive():
+    commit = _commit("t")["task_commit_sha256"]
+    assert _join([_commit("t")], [_reveal("t", task_commit_sha256=commit.upper())]) == [(True, None)]
+    assert _join([_commit("t")], [_reveal("t", task_commit_sha256="00" * 32)]) == [(False, "commit_mismatch")]
+
+
+def test_lone_surrogate_is_bad_reveal(tmp_path, capsys):
+    poison = json.dumps(_reveal("\ud800"))
+    assert _join([_commit("ok")], [_reveal("ok"), poison, _reveal("ok")]) == [
+        (True, None), (False, "bad_reveal"), (False, "duplicate_reveal")]
+
+    commits, reveals, failures = tmp_path / "c.jsonl", tmp_path / "r.jsonl", tmp_path / "f.jsonl"
+    commits.write_text(json.dumps(_commit("ok")) + "\n")
+    reveals.write_text(json.dumps(_reveal("ok")) + "\n" + poison + "\n")
+    assert verify_reveals.main([str(reveals), "--commits", str(commits), "--workers", "1",
+                                "--failures", str(failures)]) == 1
+    assert json.loads(capsys.readouterr().out)["reasons"] == {"bad_reveal": 1}
+    assert json.loads(failures.read_text())["reason"] == "bad_reveal"
+
+
+def test_bulk_commit_skips_bad_tasks():
+    lines = [json.dumps({"task_id": "a", "description": "x"}), json.dumps({"task_id": "\ud800"}),
+             json.dumps({"task_id": "b", "description": "\udfff"}), json.dumps({"task_id": "c"})]
+    out = list(commit_lines(lines))
+    assert [err[0] if err else "ok" for _, _, err in out] == ["ok", "invalid_task", "invalid_task", "ok"]
+    public, reveal, _ = out[0]
+    assert public["task_commit_sha256"] == reveal["task_commit_sha256"] == task_commit_sha256(
+        "a", "x", "", reveal["nonce_hex"])
@@ -0,0 +1,81 @@
+import hashlib
+from collections import Counter
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from verify.selection import AliasTable, sample_k_indices
+
+
+def _commit(i: int) -> str:
+    return hashlib.sha256(f"task_{i}".encode()).hexdigest()
+
+
+def _reference_k(commit: str, n: int, k: int) -> list:
+    """docs/protocol.md, 3b, over a full position list."""
+    words = []
+    counter = 0
+
+    def word() -> int:
+        nonlocal counter
+        if not words:
+            block = hashlib.sha256(b"re4ctor:alloc:multi:v0|" + commit.encode() + b"|"
+                                   + counter.to_bytes(4, "big")).digest()
+            words.extend(int.from_bytes(block[i:i + 8], "big") for i in range(24, -8, -8))
+            counter += 1
+        return words.pop()
+
+    def below(m: int) -> int:
+        while True:
+            x = word()
+            if x < (1 << 64) - ((1 << 64) % m):
+                return x % m
+
+    pos = list(range(n))
+    out = []
+    for i in range(k):
+        j = i + below(n - i)
+        pos[i], pos[j] = pos[j], pos[i]
+        out.append(pos[i])
+    return out
+
+
+@pytest.mark.parametrize("n, k", [(1, 1), (5, 5), (10, 3), (1000, 7), (2 ** 40, 4)])
+def test_k_of_n_matches_reference(n, k):
+    for i in range(20):
+        got = sample_k_indices(_commit(i), n, k)
+        assert len(set(got)) == k and all(0 <= x < n for x in got)
+        if n <= 1000:
+            assert got == _reference_k(_commit(i), n, k)
+        assert sample_k_indices(_commit(i).upper(), n, k) == got
+
+
+def test_k_of_n_rejects_bad_k():
+    for k in (0, 4):
+        with pytest.raises(ValueError):
+            sample_k_indices(_commit(0), 3, k)
+
+
+def test_k_of_n_first_pick_is_uniform():
+    firsts = Counter(sample_k_indices(_commit(i), 4, 2)[0] for i in range(4000))
+    assert set(firsts) == {0, 1, 2, 3} and min(firsts.values()) > 850
+
+
+def test_alias_table_is_exact():
+    # r по n * W сусідніх значеннях дає кожну пару (col, u) рівно раз: частоти точно w_i * n
+    weights = [3, 0, 1, 7, 5]
+    table = AliasTable.build(weights)
+    n, total = len(weights), sum(weights)
+    counts = Counter(table.pick_index(f"{r:064x}") for r in range(10 ** 6, 10 ** 6 + n * total))
+    assert [counts[i] for i in range(n)] == [w * n for w in weights]
+
+
+def test_allocate_winners_follow_the_draw():
+    cands = [f"agent_{i}" for i in range(12)]
+    r = TestClient(app).post("/allocate", json={"task_id": "t", "task_commit_sha256": _commit(1),
+                                                "candidates": cands, "winners": 3})
+    assert r.status_code == 200, r.text
+    ordered = sorted(cands)
+    assert r.json()["winners"] == [ordered[i] for i in _reference_k(_commit(1), 12, 3)]
+    assert r.json()["winner"] == r.json()["winners"][0]
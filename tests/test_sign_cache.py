@@ -0,0 +1,69 @@
+import json
+from pathlib import Path
+
+from app.keys import KeyManager
+from app.models import ReceiptSignRequest
+from app.sign_cache import SignatureCache
+from app.signer import sign_receipt
+
+ROOT = Path(__file__).resolve().parents[1]
+SAMPLE = json.loads((ROOT / "demo" / "sample_receipt.json").read_text(encoding="utf-8"))
+
+
+def _key():
+    return KeyManager.from_env().get(None)
+
+
+def test_hit_returns_same_signature():
+    cache, key = SignatureCache(8), _key()
+    first = cache.sign(key, b"\x01" * 32)
+    assert cache.sign(key, b"\x01" * 32) == first
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_retry_hits_only_with_client_timestamp(monkeypatch):
+    cache, key = SignatureCache(8), _key()
+    req = ReceiptSignRequest.model_validate(SAMPLE)
+    assert sign_receipt(req, key, cache=cache) == sign_receipt(req, key, cache=cache)
+    assert cache.hits == 1
+
+    clock = iter(["2026-01-01T00:00:00.000001Z", "2026-01-01T00:00:00.000002Z"])
+    monkeypatch.setattr("app.signer.utc_now_iso", lambda: next(clock))
+    no_ts = ReceiptSignRequest.model_validate({**SAMPLE, "timestamp": None})
+    a, b = sign_receipt(no_ts, key, cache=cache), sign_receipt(no_ts, key, cache=cache)
+    assert a["signature"] != b["signature"]
+    assert cache.hits == 1
+
+
+def test_persisted_across_restart(tmp_path):
+    path, key = str(tmp_path / "sigs.bin"), _key()
+    cache = SignatureCache(8, path).open()
+    sig = cache.sign(key, b"\x02" * 32)
+    cache.close()
+
+    again = SignatureCache(8, path).open()
+    try:
+        assert again.sign(key, b"\x02" * 32) == sig
+        assert again.hits == 1 and again.misses == 0
+    finally:
+        again.close()
+
+
+def test_one_writer_per_file(tmp_path):
+    path, key = str(tmp_path / "sigs.bin"), _key()
+    writer = SignatureCache(8, path).open()
+    other = SignatureCache(8, path).open()
+    try:
+        other.sign(key, b"\x03" * 32)
+        writer.sign(key, b"\x04" * 32)
+    finally:
+        other.close()
+        writer.close()
+
+    reloaded = SignatureCache(8, path).open()
+    try:
+        assert reloaded.sign(key, b"\x04" * 32) and reloaded.hits == 1
+        reloaded.sign(key, b"\x03" * 32)
+        assert reloaded.misses == 1  # запис іншого процесу лишився тільки в його пам'яті
+    finally:
+        reloaded.close()
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from hashlib import sha256
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main
+from app.store import ReceiptStore, StoreError, _segment_name
+from verify.canonical import canonical_bytes
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _receipt(i: int, **extra) -> dict:
+    return {"task_id": f"task_{i}", "winner": "agent_alpha", "signature": f"{i:0128x}", **extra}
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = ReceiptStore(str(tmp_path), fsync_interval=0).open()
+    yield s
+    s.close()
+
+
+def test_round_trip_and_reopen(tmp_path, store):
+    receipts = [_receipt(i) for i in range(100)]
+    for r in receipts:
+        store.append(r)
+    store.append(receipts[0])  # той самий receipt удруге не пишеться
+    assert store.appended == 100
+    assert store.get("task_7") == canonical_bytes(receipts[7])
+    assert store.get("missing") is None
+    store.close()
+
+    again = ReceiptStore(str(tmp_path)).open()
+    try:
+        assert not again.rebuilt
+        assert json.loads(again.get("task_99")) == receipts[99]
+        latest = _receipt(5, winner="agent_beta")
+        again.append(latest)
+        assert json.loads(again.get("task_5"))["winner"] == "agent_beta"
+        assert again.get_by_hash(sha256(canonical_bytes(receipts[5])).hexdigest()) == canonical_bytes(receipts[5])
+    finally:
+        again.close()
+
+
+def test_index_grows(tmp_path):
+    s = ReceiptStore(str(tmp_path), fsync_interval=0).open()
+    s._index.create(16)  # порожній store: замість 65536 слотів - 16, щоб подвоїти кілька разів
+    try:
+        for i in range(200):
+            s.append(_receipt(i))
+        assert s._index.capacity >= 512
+        assert all(s.get(f"task_{i}") is not None for i in range(200))
+    finally:
+        s.close()
+
+
+def test_second_process_is_refused(tmp_path, store):
+    other = ReceiptStore(str(tmp_path))
+    with pytest.raises(StoreError, match=f"pid {os.getpid()}"):
+        other.open()
+    # отримавши відмову, store нічого не тримає відкритим
+    assert other._lock_fd == -1 and other._index.fd == -1
+
+
+def test_recovery_after_crash(tmp_path):
+    # процес пише й помирає без close(): індекс брудний, у хвості - обірваний запис
+    code = (
+        "import os, sys; sys.path.insert(0, sys.argv[2]);"
+        "from app.store import ReceiptStore;"
+        "s = ReceiptStore(sys.argv[1], fsync_interval=0).open();"
+        "[s.append({'task_id': f'task_{i}', 'n': i}) for i in range(50)];"
+        "os.write(s._fd, b'\\x00\\x00\\x01\\x00garbage');"
+        "os._exit(0)"
+    )
+    subprocess.run([sys.executable, "-c", code, str(tmp_path), str(ROOT)], check=True)
+    seg = tmp_path / _segment_name(1)
+    torn = seg.stat().st_size
+
+    s = ReceiptStore(str(tmp_path), fsync_interval=0).open()
+    try:
+        assert s.rebuilt
+        assert seg.stat().st_size < torn
+        assert [json.loads(s.get(f"task_{i}"))["n"] for i in range(50)] == list(range(50))
+        s.append({"task_id": "task_50", "n": 50})
+        assert json.loads(s.get("task_50"))["n"] == 50
+    finally:
+        s.close()
+
+
+@pytest.mark.parametrize("path", ["%C3%A9", "ab" * 32 + "%0A", "zz" * 32])
+def test_by_hash_rejects_non_hex(store, monkeypatch, path):
+    store.append(_receipt(1))
+    monkeypatch.setattr(app.main, "receipt_store", store)
+    r = TestClient(app.main.app).get(f"/receipt/by-hash/{path}")
+    assert r.status_code == 404
+    assert r.json()["detail"].startswith("unknown_receipt")
+    assert store.get_by_hash("é") is None
+
+
+def test_failed_fsync_fails_waiters_and_later_appends(tmp_path, monkeypatch):
+    s = ReceiptStore(str(tmp_path), fsync_interval=0).open()
+
+    def eio(retired, fd):
+        raise OSError(5, "Input/output error")
+
+    monkeypatch.setattr(s, "_sync", eio)
+
+    async def write():
+        seq = s.append(_receipt(1))
+        await asyncio.wait_for(s.durable(seq), 5)
+
+    with pytest.raises(StoreError, match="fsync failed"):
+        asyncio.run(write())
+    s._flusher.join(5)
+    assert not s._flusher.is_alive()
+    with pytest.raises(StoreError, match="fsync failed"):
+        s.append(_receipt(2))
+    monkeypatch.undo()
+    s.close()
+    # без підтвердженого fsync індекс брудний: після перезапуску його перебудовують
+    again = ReceiptStore(str(tmp_path)).open()
+    try:
+        assert again.rebuilt
+    finally:
+        again.close()
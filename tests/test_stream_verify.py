@@ -0,0 +1,84 @@
+import hashlib
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import verify.stream_verify as stream
+from app.main import app, key_manager
+from app.models import ReceiptSignRequest
+from app.signer import sign_receipt
+from verify.stream_verify import StreamCandidates, verify_receipt_stream
+from verify.verify_receipt import VerifyError, verify_receipt
+
+COMMIT = hashlib.sha256(b"stream").hexdigest()
+# екрановані символи й не-ASCII, щоб межі блоків падали посеред escape-послідовностей
+CANDS = [f'agent_{i:04d}{"_é" if i % 7 == 0 else ""}{chr(34) if i % 11 == 0 else ""}' for i in range(1500)]
+
+
+@pytest.fixture(autouse=True)
+def small_reads(monkeypatch):
+    monkeypatch.setattr(stream, "READ_CHUNK", 97)
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+def _signed(client, drop=(), **extra) -> dict:
+    body = {"task_id": "stream", "task_commit_sha256": COMMIT, "candidates": CANDS, **extra}
+    r = client.post("/allocate", json=body)
+    assert r.status_code == 200, r.text
+    alloc = {k: v for k, v in r.json().items() if k != "ok" and k not in drop}
+    return sign_receipt(ReceiptSignRequest.model_validate({**extra, **alloc}), key_manager.get(None))
+
+
+def _reordered(receipt: dict, first: tuple) -> bytes:
+    out = {k: receipt[k] for k in first}
+    out.update((k, v) for k, v in receipt.items() if k not in first)
+    return json.dumps(out, indent=1).encode()
+
+
+def _stream(data: bytes):
+    cands = StreamCandidates(io.BytesIO(data))
+    return stream.check_parsed(cands.parse(), cands), cands.passes
+
+
+@pytest.mark.parametrize("extra", [{}, {"winners": 5},
+                                   {"allocation_mode": "weighted", "weights": [i % 5 for i in range(1500)]}])
+def test_matches_verify_receipt(client, extra):
+    receipt = _signed(client, **extra)
+    summary = verify_receipt(receipt)
+    assert _stream(json.dumps(receipt).encode())[0] == summary
+    assert _stream(_reordered(receipt, ("candidates",)))[0] == summary
+
+
+def test_one_pass_when_winner_comes_first(client):
+    # без allocation_rule нічого не треба брати за індексом: вистачає членства й хешу з першого проходу
+    receipt = _signed(client, drop=("allocation_rule",))
+    before = tuple(k for k in sorted(receipt) if k < "candidates")
+    assert _stream(_reordered(receipt, before + ("winner",)))[1] == 1
+    assert _stream(_reordered(receipt, ("candidates", "winner")))[1] == 2
+
+
+@pytest.mark.parametrize("patch", [
+    {"winner": "nobody"},
+    {"task_id": "forged"},
+    {"candidates": CANDS[:700] + CANDS[701:702] + CANDS[700:701] + CANDS[702:]},
+    {"candidates": CANDS[:-1] + [5]},
+])
+def test_same_reason_codes(client, patch):
+    receipt = {**_signed(client), **patch}
+    with pytest.raises(VerifyError) as want:
+        verify_receipt(receipt)
+    with pytest.raises(VerifyError) as got:
+        verify_receipt_stream(io.BytesIO(json.dumps(receipt).encode()))
+    assert got.value.reason == want.value.reason
+
+
+def test_truncated_file(client):
+    data = json.dumps(_signed(client)).encode()
+    with pytest.raises((VerifyError, ValueError)):
+        verify_receipt_stream(io.BytesIO(data[: len(data) // 2]))
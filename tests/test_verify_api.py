@@ -0,0 +1,80 @@
+import json
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app, key_manager
+from app.models import ReceiptSignRequest
+from app.signer import sign_receipt, verify_result
+from verify.verify_receipt import VerifyError, verify_receipt
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture(scope="module")
+def signed() -> dict:
+    req = ReceiptSignRequest.model_validate(
+        json.loads((ROOT / "demo" / "sample_receipt.json").read_text(encoding="utf-8")))
+    return sign_receipt(req, key_manager.get(None))
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+def test_verify_result_lone_surrogate(signed):
+    res = verify_result({**signed, "task_id": "\ud800"})
+    assert res["valid"] is False
+    assert res["reason"] == "invalid_receipt"
+
+
+@pytest.mark.parametrize("field, reason", [("task_id", "invalid_receipt"), ("re4ctor_error", "re4ctor_error")])
+def test_verify_endpoint_lone_surrogate(client, signed, field, reason):
+    body = json.dumps({**signed, field: "\ud800"})
+    r = client.post("/receipt/verify", content=body, headers={"Content-Type": "application/json"})
+    assert r.status_code == 200
+    assert r.json()["valid"] is False
+    assert r.json()["reason"] == reason
+
+
+def test_verify_batch_lone_surrogate(client, signed):
+    lines = [json.dumps(signed), json.dumps({**signed, "task_id": "\ud800"}),
+             json.dumps({**signed, "re4ctor_error": "\ud800"}), json.dumps(signed)]
+    r = client.post("/receipt/verify/batch", content="\n".join(lines),
+                    headers={"Content-Type": "application/x-ndjson"})
+    assert r.status_code == 200
+    out = [json.loads(line) for line in r.text.splitlines()]
+    assert [(x["index"], x["valid"]) for x in out] == [(0, True), (1, False), (2, False), (3, True)]
+    assert [x.get("reason") for x in out[1:3]] == ["invalid_receipt", "re4ctor_error"]
+
+
+@pytest.mark.parametrize("commit", [5, None, ["ab"]])
+def test_allocation_rule_with_non_string_commit(signed, commit):
+    receipt = {**signed, "allocation_rule": "commit-v0", "task_commit_sha256": commit}
+    with pytest.raises(VerifyError) as e:
+        verify_receipt(receipt)
+    assert e.value.reason == "invalid_receipt"
+
+
+@pytest.mark.parametrize("extra", [{"epoch": "2026-W42", "re4ctor_random": "ab" * 32},
+                                   {"allocation_rule": "commit-v0"}])
+def test_verify_endpoints_agree_on_malformed_receipt(client, signed, extra):
+    body = json.dumps({**signed, **extra, "task_commit_sha256": 5})
+    r = client.post("/receipt/verify", content=body, headers={"Content-Type": "application/json"})
+    assert r.status_code == 200
+    assert (r.json()["valid"], r.json()["reason"]) == (False, "invalid_receipt")
+    r = client.post("/receipt/verify/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert r.status_code == 200
+    assert (json.loads(r.text)["valid"], json.loads(r.text)["reason"]) == (False, "invalid_receipt")
+
+
+def test_verify_result_never_raises(signed, monkeypatch):
+    def boom(receipt):
+        raise KeyError("unexpected")
+    monkeypatch.setattr("app.signer.verify_receipt", boom)
+    res = verify_result(signed)
+    assert (res["valid"], res["reason"]) == (False, "invalid_receipt")
+    assert "KeyError" in res["error"]
@@ -0,0 +1,57 @@
+from hashlib import sha256
+
+import pytest
+
+from app.main import key_manager
+from app.models import ReceiptSignRequest
+from app.signer import sign_receipt
+from verify import verify_receipt, vrf_ecdsa
+from verify.vrf_ecdsa import SignerCache, VrfSignatureError, check_vrf_signature, public_address, sign_recoverable
+
+PRIV = int.from_bytes(sha256(b"test-vrf-signer").digest(), "big")
+ADDR = public_address(PRIV)
+
+
+def _receipt(rnd: str = "ab" * 32, ts: str = "2026-01-01T00:00:00Z") -> dict:
+    msg_hash = sha256(f"{rnd}|{ts}".encode()).digest()
+    r, s, v = sign_recoverable(PRIV, msg_hash)
+    return {"re4ctor_random": rnd, "re4ctor_timestamp": ts, "re4ctor_msg_hash": msg_hash.hex(),
+            "re4ctor_signature": {"v": v, "r": hex(r), "s": hex(s), "signer_addr": ADDR}}
+
+
+@pytest.mark.parametrize("binding", ["none", "random|timestamp"])
+def test_bound_receipt_passes(binding):
+    assert check_vrf_signature(_receipt(), frozenset([ADDR]), SignerCache(), binding) == ADDR
+
+
+def test_swapped_random_is_caught_only_with_binding():
+    forged = {**_receipt(), "re4ctor_random": "cd" * 32}
+    assert check_vrf_signature(forged, frozenset([ADDR]), SignerCache(), "none") == ADDR
+    with pytest.raises(VrfSignatureError) as e:
+        check_vrf_signature(forged, frozenset([ADDR]), SignerCache(), "random|timestamp")
+    assert e.value.reason == "vrf_unbound"
+
+
+def test_binding_is_the_default():
+    assert vrf_ecdsa.MSG_BINDING == "random|timestamp"
+    forged = {**_receipt(), "re4ctor_random": "cd" * 32}
+    with pytest.raises(VrfSignatureError) as e:
+        check_vrf_signature(forged, frozenset([ADDR]), SignerCache())
+    assert e.value.reason == "vrf_unbound"
+    # без re4ctor_random (напр. підписаний хеш іншої розмітки) - теж не зв'язаний
+    bare = {k: v for k, v in _receipt().items() if k != "re4ctor_random"}
+    with pytest.raises(VrfSignatureError, match="re4ctor_random"):
+        check_vrf_signature(bare, frozenset([ADDR]), SignerCache())
+
+
+@pytest.mark.parametrize("binding, bound", [("random|timestamp", True), ("none", False)])
+def test_verify_summary_reports_binding(monkeypatch, binding, bound):
+    req = ReceiptSignRequest.model_validate({
+        "task_id": "t1", "task_commit_sha256": "ab" * 32, "candidate_order": "lexicographic",
+        "candidates": ["agent_alpha", "agent_beta"], "winner": "agent_alpha", **_receipt()})
+    signed = sign_receipt(req, key_manager.get(None))
+    monkeypatch.setattr(verify_receipt, "VRF_SIGNERS", frozenset([ADDR]))
+    monkeypatch.setattr(verify_receipt, "MSG_BINDING", binding)
+    monkeypatch.setattr(vrf_ecdsa, "MSG_BINDING", binding)
+    summary = verify_receipt.verify_receipt(signed)
+    assert summary["vrf_signer"] == ADDR and summary["vrf_bound"] is bound
@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from demo import mock_vrf_server
+from demo.mock_vrf_server import MockVrf, serve_in_thread
+from demo.vrf_client import VrfClient, VrfError, vrf_receipt_fields
+from verify.vrf_ecdsa import check_vrf_signature
+
+
+@pytest.fixture
+def server():
+    started = []
+
+    def start(**kw):
+        vrf = MockVrf(api_key="k", **kw)
+        srv, url = serve_in_thread(vrf)
+        started.append(srv)
+        return vrf, url
+    yield start
+    for srv in started:
+        srv.shutdown()
+        srv.server_close()
+
+
+def _client(url, **kw) -> VrfClient:
+    kw = {"api_key": "k", "backoff": 0.001, "max_backoff": 0.01, **kw}
+    return VrfClient(url, **kw)
+
+
+def test_keep_alive_and_signed_outputs(server):
+    vrf, url = server()
+    with _client(url, pool_size=1) as client:
+        outs = [client.get() for _ in range(5)]
+    assert vrf.stats == {"served": 5, "failed": 0, "connections": 1}
+    assert len({o["random"] for o in outs}) == 5
+    for out in outs:
+        assert check_vrf_signature(vrf_receipt_fields(out), frozenset({vrf.signer_addr})) == vrf.signer_addr
+
+
+def test_retries_until_success(server, monkeypatch):
+    vrf, url = server(fail_rate=0.5)
+    # перші дві відповіді - 503 з Retry-After: 0, далі 200
+    rolls = iter([0.0, 0.0, 1.0])
+    monkeypatch.setattr(mock_vrf_server, "random", type("R", (), {
+        "random": staticmethod(lambda: next(rolls)), "uniform": staticmethod(lambda a, b: 0.0)}))
+    with _client(url, retries=3) as client:
+        assert "random" in client.fetch()
+        assert (client.stats["requests"], client.stats["retries"]) == (3, 2)
+    assert vrf.stats["failed"] == 2 and vrf.stats["served"] == 1
+
+
+def test_gives_up_after_retries(server):
+    vrf, url = server(fail_rate=1.0)
+    with _client(url, retries=2) as client:
+        with pytest.raises(VrfError) as e:
+            client.fetch()
+    assert e.value.status == 503
+    assert vrf.stats["failed"] == 3
+
+
+def test_client_errors_are_not_retried(server):
+    vrf, url = server()
+    with _client(url, api_key="wrong", retries=3) as client:
+        with pytest.raises(VrfError) as e:
+            client.fetch()
+        assert e.value.status == 401 and client.stats["retries"] == 0
+
+
+def test_read_timeout_is_retried(server):
+    vrf, url = server(latency_ms=300)
+    t0 = time.perf_counter()
+    with _client(url, read_timeout=0.05, retries=1) as client:
+        with pytest.raises(VrfError) as e:
+            client.fetch()
+        assert client.stats["retries"] == 1
+    assert e.value.status is None
+    assert time.perf_counter() - t0 < 2.0
+
+
+def test_prefetch_hands_each_output_out_once(server):
+    vrf, url = server()
+    with _client(url, prefetch=2) as client:
+        deadline = time.monotonic() + 5
+        while len(client._buffer) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        outs = [client.get() for _ in range(4)]
+        assert client.stats["prefetch_hits"] >= 2
+    assert len({o["random"] for o in outs}) == 4
+
+
+def test_prefetch_drops_stale_outputs(server):
+    vrf, url = server()
+    with _client(url, prefetch=1, max_age=0.05) as client:
+        deadline = time.monotonic() + 5
+        while not client._buffer and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        client.get()
+        assert client.stats["stale_dropped"] >= 1
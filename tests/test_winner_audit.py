@@ -0,0 +1,106 @@
+import hashlib
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from verify import winner_audit
+from verify.selection import RULE_COMMIT, RULE_EPOCH, RULE_VRF_SHA256, vrf_sha256_index
+from verify.verify_receipt import VerifyError
+
+CANDS = [f"agent_{i:02d}" for i in range(20)]
+COMMIT = hashlib.sha256(b"audit").hexdigest()
+RANDOM = "5e" * 32
+
+
+@pytest.fixture(scope="module")
+def allocated() -> dict:
+    """/allocate output for each selection shape (uniform, k-of-n, weighted)."""
+    client = TestClient(app)
+    out = {}
+    for name, extra in (("uniform", {}), ("k_of_n", {"winners": 3}),
+                        ("weighted", {"allocation_mode": "weighted", "weights": list(range(1, 21))})):
+        r = client.post("/allocate", json={"task_id": name, "task_commit_sha256": COMMIT, "candidates": CANDS,
+                                           **extra})
+        assert r.status_code == 200, r.text
+        out[name] = {k: v for k, v in r.json().items() if k != "ok"}
+    return out
+
+
+def _vrf_receipt() -> dict:
+    winner = CANDS[vrf_sha256_index(COMMIT, RANDOM, len(CANDS))]
+    return {"task_id": "vrf", "task_commit_sha256": COMMIT, "candidates": CANDS, "winner": winner,
+            "re4ctor_random": RANDOM}
+
+
+@pytest.mark.parametrize("receipt, expected", [
+    ({"allocation_rule": RULE_VRF_SHA256, "epoch": "e", "note": "deterministic mock allocation"},
+     (RULE_VRF_SHA256, "field")),
+    ({"epoch": "2026-W42", "note": "commit + vrf_random"}, (RULE_EPOCH, "epoch")),
+    ({"note": "winner = commit + vrf_random (vrf-sha256)"}, (RULE_VRF_SHA256, "note")),
+    ({"note": "Mock VRF seed=task_commit_sha256. Replace later."}, (RULE_COMMIT, "note")),
+    ({"re4ctor_random": RANDOM}, (RULE_VRF_SHA256, "inferred")),
+    ({"re4ctor_random": ""}, (RULE_COMMIT, "inferred")),
+    ({}, (RULE_COMMIT, "inferred")),
+])
+def test_detect_rule(receipt, expected):
+    assert winner_audit.detect_rule(receipt) == expected
+
+
+def test_rederive_accepts_every_shape(allocated):
+    for receipt in allocated.values():
+        winner_audit.rederive(receipt, RULE_COMMIT)
+    winner_audit.rederive(_vrf_receipt(), RULE_VRF_SHA256)
+
+
+@pytest.mark.parametrize("patch, rule, reason", [
+    ({"winner": "agent_99"}, RULE_COMMIT, "winner_mismatch"),
+    ({"winners": CANDS[:3]}, RULE_COMMIT, "winner_mismatch"),
+    ({"winners": []}, RULE_COMMIT, "invalid_receipt"),
+    ({"candidates": []}, RULE_COMMIT, "invalid_receipt"),
+    ({"task_commit_sha256": "zz"}, RULE_COMMIT, "invalid_receipt"),
+    ({}, "commit-v9", "unknown_rule"),
+    ({}, RULE_VRF_SHA256, "missing_randomness"),
+])
+def test_rederive_reasons(allocated, patch, rule, reason):
+    receipt = {**allocated["k_of_n"], **patch}
+    with pytest.raises(VerifyError) as e:
+        winner_audit.rederive(receipt, rule)
+    assert e.value.reason == reason
+
+
+def test_compact_receipts_check_winner_index(allocated):
+    receipt = {k: v for k, v in allocated["uniform"].items() if k != "candidates"}
+    index = CANDS.index(receipt["winner"])
+    receipt.update(candidates_root="00" * 32, candidates_count=len(CANDS), winner_index=index)
+    winner_audit.rederive(receipt, RULE_COMMIT)
+    with pytest.raises(VerifyError) as e:
+        winner_audit.rederive({**receipt, "winner_index": (index + 1) % len(CANDS)}, RULE_COMMIT)
+    assert e.value.reason == "winner_mismatch"
+
+
+def test_main_summary_and_exit_codes(allocated, tmp_path, capsys):
+    vrf = _vrf_receipt()
+    wrong = next(c for c in CANDS if c != vrf["winner"])
+    lines = [json.dumps(r) for r in allocated.values()]
+    lines += [json.dumps(vrf), json.dumps({**vrf, "winner": wrong}), "{not json", json.dumps([1])]
+    (tmp_path / "receipts.jsonl").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    failures = tmp_path / "failures.out"
+
+    assert winner_audit.main([str(tmp_path), "--workers", "1", "--failures", str(failures)]) == 1
+    summary = json.loads(capsys.readouterr().out)
+    assert (summary["total"], summary["ok"], summary["failed"]) == (7, 4, 3)
+    assert summary["reasons"] == {"winner_mismatch": 1, "bad_json": 1, "invalid_receipt": 1}
+    assert summary["rules"] == {"-": {"ok": 0, "failed": 2}, RULE_COMMIT: {"ok": 3, "failed": 0},
+                                RULE_VRF_SHA256: {"ok": 1, "failed": 1}}
+    assert summary["detected_by"] == {"field": 3, "inferred": 2}
+    rows = [json.loads(line) for line in failures.read_text(encoding="utf-8").splitlines()]
+    assert [r["reason"] for r in rows] == ["winner_mismatch", "bad_json", "invalid_receipt"]
+    assert rows[0]["rule"] == RULE_VRF_SHA256 and rows[0]["task_id"] == "vrf"
+
+    assert winner_audit.main([str(tmp_path), "--workers", "2", "--chunk", "2",
+                              "--max-failure-rate", "0.5"]) == 0
+    assert json.loads(capsys.readouterr().out)["reasons"] == summary["reasons"]
+    (tmp_path / "empty").mkdir()
+    assert winner_audit.main([str(tmp_path / "empty"), "--workers", "1"]) == 2
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Bulk receipt verifier: one interpreter, many receipts, a process pool.
+
+Inputs (any mix):
+  - *.json files: one receipt object, or a JSON array of receipts
+  - *.cbor files: the same in canonical CBOR (see verify/receipt_convert.py)
+  - *.jsonl / *.ndjson files: one receipt per line
+  - directories (searched recursively for the above)
+  - glob patterns ("receipts/2026-02-*/**/*.json", quoted so the shell leaves them alone)
+  - "-" for stdin (JSONL)
+
+Single-receipt .json files above --stream-above-mb are verified by verify/stream_verify.py
+in bounded memory.
+
+Prints a JSON summary (reason-coded tally + throughput) to stdout, optionally writes
+every failure to a JSONL side file, and exits 1 when failure_rate > --max-failure-rate.
+
+--vrf-signers (or VRF_SIGNERS) also recovers each receipt's VRF ECDSA signer and checks
+it against the allowlist (verify/vrf_ecdsa.py); every worker caches recovered signers.
+
+--replay-index PATH keeps every valid receipt in an on-disk index (verify/replay_index.py)
+and fails replays, conflicting receipts and duplicates for the same task_id across runs.
+With an index, runs are incremental: unchanged files are skipped and grown .jsonl files
+are read from where the last run stopped.
+
+Usage:
+  python3 verify/bulk_verify.py receipts/ more/*.jsonl [--failures failures.jsonl]
+                                [--workers 8] [--chunk 256] [--max-failure-rate 0.0]
+                                [--replay-index receipts.idx]
+  cat receipts.jsonl | python3 verify/bulk_verify.py -
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from verify.replay_index import DEFAULT_CAPACITY, ReplayIndex, receipt_identity  # noqa: E402
+from verify.stream_verify import StreamCandidates, check_parsed  # noqa: E402
+from verify.verify_receipt import VerifyError, configure_vrf_signers, load_receipt_bytes, verify_receipt  # noqa: E402
+
+RECEIPT_FILE_SUFFIXES = (".json", ".cbor")
+LINES_FILE_SUFFIXES = (".jsonl", ".ndjson")
+
+# single-receipt .json files above this size go through verify/stream_verify.py
+STREAM_ABOVE_BYTES = 32 << 20
+
+# ("file", path, stream_above) - воркер читає файл сам; ("line", source, text) - рядок JSONL
+Item = Tuple[str, ...]
+
+
+def _verified(receipt) -> dict:
+    verify_receipt(receipt)
+    return receipt
+
+
+def _verified_file(path: str) -> dict:
+    """verify/stream_verify.py for one large receipt file; returns its top-level fields."""
+    with open(path, "rb") as fp:
+        cands = StreamCandidates(fp)
+        receipt = cands.parse()
+        check_parsed(receipt, cands)
+    return receipt
+
+
+def _check_one(source: str, receipt, verify=_verified, identify: bool = False) -> dict:
+    try:
+        fields = verify(receipt)
+        if identify:
+            return {"source": source, "ok": True, "identity": receipt_identity(fields)}
+        return {"source": source, "ok": True}
+    except VerifyError as e:
+        reason, error = e.reason, str(e)
+    except Exception as e:  # сюди не має потрапляти нічого, але один кривий файл не валить прогін
+        reason, error = "error", f"{type(e).__name__}: {e}"
+    out = {"source": source, "ok": False, "reason": reason, "error": error}
+    if isinstance(receipt, dict) and "task_id" in receipt:
+        out["task_id"] = receipt["task_id"]
+    return out
+
+
+def _check_item(item: Item, identify: bool = False) -> List[dict]:
+    if item[0] == "file":
+        _, source, stream_above = item
+        if _is_large_object(source, stream_above):
+            return [_check_one(source, source, _verified_file, identify)]
+        try:
+            with open(source, "rb") as f:
+                obj = load_receipt_bytes(f.read())
+        except OSError as e:
+            return [{"source": source, "ok": False, "reason": "bad_json", "error": str(e)}]
+        except VerifyError as e:
+            return [{"source": source, "ok": False, "reason": e.reason, "error": str(e)}]
+        if isinstance(obj, list):
+            return [_check_one(f"{source}[{i}]", r, identify=identify) for i, r in enumerate(obj)]
+        return [_check_one(source, obj, identify=identify)]
+
+    _, source, text = item
+    try:
+        obj = json.loads(text)
+    except ValueError as e:
+        return [{"source": source, "ok": False, "reason": "bad_json", "error": str(e)}]
+    return [_check_one(source, obj, identify=identify)]
+
+
+def _is_large_object(path: str, stream_above: int) -> bool:
+    try:
+        if os.path.getsize(path) <= stream_above:
+            return False
+        with open(path, "rb") as f:
+            return f.read(64).lstrip().startswith(b"{")
+    except OSError:
+        return False
+
+
+def check_chunk(items: List[Item], identify: bool = False) -> List[dict]:
+    out = []
+    for item in items:
+        out.extend(_check_item(item, identify))
+    return out
+
+
+def _lines(source: str, f, lineno: int = 0) -> Iterator[Item]:
+    for lineno, line in enumerate(f, lineno + 1):
+        if line.strip():
+            yield ("line", f"{source}:{lineno}", line)
+
+
+# path -> (size, mtime_ns, offset, lines), як у таблиці sources індексу
+SourceStates = Dict[str, Tuple[int, int, int, int]]
+
+
+class Sources:
+    """Which inputs still need reading, given a replay index (incremental runs)."""
+
+    def __init__(self, index: Optional[ReplayIndex]):
+        self.index = index
+        self.states: SourceStates = {}
+        self.skipped = 0
+
+    def file_unchanged(self, path: str) -> bool:
+        if self.index is None:
+            return False
+        st = os.stat(path)
+        state = self.index.source_state(path)
+        if state is not None and tuple(state[:2]) == (st.st_size, st.st_mtime_ns):
+            self.skipped += 1
+            return True
+        self.states[path] = (st.st_size, st.st_mtime_ns, st.st_size, 0)
+        return False
+
+    def lines(self, path: str) -> Iterator[Item]:
+        if self.index is None:
+            with open(path, "r", encoding="utf-8") as f:
+                yield from _lines(path, f)
+            return
+        st = os.stat(path)
+        state = self.index.source_state(path)
+        if state is not None and tuple(state[:2]) == (st.st_size, st.st_mtime_ns):
+            self.skipped += 1
+            return
+        # файл лише доріс (append-only лог): продовжуємо після останнього цілого рядка
+        offset, lineno = (state[2], state[3]) if state is not None and st.st_size >= state[2] else (0, 0)
+        self.states[path] = (offset, st.st_mtime_ns, offset, lineno)
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                lineno += 1
+                if line.strip():
+                    yield ("line", f"{path}:{lineno}", line)
+                if line.endswith(b"\n"):
+                    # обірваний останній рядок ще пишеться: наступний прогін прочитає його знову
+                    offset += len(line)
+                    self.states[path] = (offset, st.st_mtime_ns, offset, lineno)
+
+
+def _expand(arg: str) -> Iterator[str]:
+    if any(ch in arg for ch in "*?["):
+        paths = sorted(glob.glob(arg, recursive=True))
+    else:
+        paths = [arg]
+    for p in paths:
+        if os.path.isdir(p):
+            for root, dirs, files in os.walk(p):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(RECEIPT_FILE_SUFFIXES + LINES_FILE_SUFFIXES):
+                        yield os.path.join(root, name)
+        else:
+            yield p
+
+
+def iter_items(inputs: List[str], stream_above: int = STREAM_ABOVE_BYTES,
+               sources: Optional[Sources] = None) -> Iterator[Item]:
+    sources = sources or Sources(None)
+    for arg in inputs:
+        if arg == "-":
+            yield from _lines("<stdin>", sys.stdin)
+            continue
+        for path in _expand(arg):
+            if path.endswith(LINES_FILE_SUFFIXES):
+                yield from sources.lines(path)
+            elif not sources.file_unchanged(path):
+                yield ("file", path, stream_above)
+
+
+def _chunks(items: Iterator[Item], size: int) -> Iterator[List[Item]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(inputs: List[str], workers: int, chunk_size: int,
+        stream_above: int = STREAM_ABOVE_BYTES, sources: Optional[Sources] = None) -> Iterator[dict]:
+    """
+    Results in input order. At most workers * 4 chunks are in flight, so huge inputs stream.
+    With sources.index, valid receipts go through the replay index (here, in this process).
+    """
+    index = sources.index if sources is not None else None
+    results = _run(iter_items(inputs, stream_above, sources), workers, chunk_size, index is not None)
+    if index is None:
+        yield from results
+        return
+    for res in results:
+        identity = res.pop("identity", None)
+        if identity is not None:
+            flagged = index.check(res["source"], *identity)
+            if flagged is not None:
+                res.update(ok=False, reason=flagged[0], error=flagged[1], task_id=identity[0])
+        yield res
+
+
+def _run(items: Iterator[Item], workers: int, chunk_size: int, identify: bool) -> Iterator[dict]:
+    chunks = _chunks(items, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from check_chunk(chunk, identify)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(ex.submit(check_chunk, chunk, identify))
+            while len(pending) >= workers * 4:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Verify many receipts in one run.")
+    ap.add_argument("inputs", nargs="+", help="files, directories, glob patterns or - for stdin (JSONL)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes (1 = no pool)")
+    ap.add_argument("--chunk", type=int, default=256, help="receipts per task sent to a worker")
+    ap.add_argument("--failures", help="write failed receipts here as JSONL")
+    ap.add_argument("--stream-above-mb", type=float, default=STREAM_ABOVE_BYTES / (1 << 20),
+                    help="verify single-receipt .json files larger than this in bounded memory")
+    ap.add_argument("--max-failure-rate", type=float, default=0.0,
+                    help="exit 1 when failed/total is above this (default 0: any failure fails)")
+    ap.add_argument("--vrf-signers", help="trusted VRF signer addresses (comma-separated or @file); "
+                                          "checks every receipt's re4ctor_signature (default: $VRF_SIGNERS)")
+    ap.add_argument("--replay-index", help="SQLite replay/duplicate index (created if missing; makes runs incremental)")
+    ap.add_argument("--bloom-capacity", type=int, default=DEFAULT_CAPACITY,
+                    help="initial Bloom filter capacity in keys (two per receipt; grows when full)")
+    args = ap.parse_args()
+    if args.vrf_signers:
+        # до старту пулу: воркери успадковують allowlist через env
+        configure_vrf_signers(args.vrf_signers)
+
+    reasons = Counter()
+    total = failed = 0
+    t0 = time.perf_counter()
+    index = ReplayIndex(args.replay_index, args.bloom_capacity).open() if args.replay_index else None
+    sources = Sources(index)
+    failures_f = open(args.failures, "w", encoding="utf-8") if args.failures else None
+    try:
+        for res in run(args.inputs, args.workers, max(1, args.chunk), int(args.stream_above_mb * (1 << 20)),
+                       sources):
+            total += 1
+            if not res["ok"]:
+                failed += 1
+                reasons[res["reason"]] += 1
+                if failures_f is not None:
+                    failures_f.write(json.dumps({k: v for k, v in res.items() if k != "ok"}, ensure_ascii=False) + "\n")
+        if index is not None:
+            # лише після повного прогону: перерваний прогін наступного разу перечитає ці файли
+            index.mark_sources(sources.states)
+            index_summary = index.summary()
+    finally:
+        if failures_f is not None:
+            failures_f.close()
+        if index is not None:
+            index.close()
+    seconds = time.perf_counter() - t0
+
+    failure_rate = failed / total if total else 0.0
+    summary = {
+        "total": total,
+        "ok": total - failed,
+        "failed": failed,
+        "failure_rate": round(failure_rate, 6),
+        "reasons": dict(reasons.most_common()),
+        "seconds": round(seconds, 3),
+        "receipts_per_sec": round(total / seconds, 1) if seconds > 0 else None,
+        "workers": args.workers,
+    }
+    if index is not None:
+        summary["skipped_sources"] = sources.skipped
+        summary["replay_index"] = index_summary
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+    if total == 0 and not sources.skipped:
+        print("No receipts found", file=sys.stderr)
+        return 2
+    return 1 if failure_rate > args.max_failure_rate else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
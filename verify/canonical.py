@@ -0,0 +1,148 @@
+"""
+Canonical JSON for receipts (shared by app/, demo/ and verify/).
+
+Canonical form is, by definition, what the stdlib produces:
+
+    json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+Backends:
+  - "orjson" (optional, fast): used only when its output is byte-identical to the
+    definition above. Floats are formatted differently by orjson (1e16 vs 1e+16), so
+    objects containing floats, ints beyond 64 bits or non-str keys go to the stdlib.
+  - "stdlib": always available.
+
+CANONICAL_JSON_BACKEND=auto|orjson|stdlib selects the backend (default: auto).
+See verify/canonical_conformance.py for the byte-identity suite.
+"""
+import json
+import os
+import time
+from hashlib import sha256
+from typing import Tuple
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+
+# стільки елементів списку кодуємо за один json.dumps при потоковому хешуванні
+LIST_CHUNK = 4096
+
+_SEPARATORS = (",", ":")
+
+
+def _stdlib_dumps(obj) -> str:
+    return json.dumps(obj, sort_keys=True, separators=_SEPARATORS, ensure_ascii=False)
+
+
+def available_backends() -> list:
+    return ["orjson", "stdlib"] if orjson is not None else ["stdlib"]
+
+
+def _resolve_backend(backend=None) -> str:
+    name = (backend or os.getenv("CANONICAL_JSON_BACKEND", "auto")).strip().lower()
+    if name == "auto":
+        return "orjson" if orjson is not None else "stdlib"
+    if name not in ("orjson", "stdlib"):
+        raise ValueError(f"Unknown canonical JSON backend: {name!r}")
+    if name == "orjson" and orjson is None:
+        raise RuntimeError("CANONICAL_JSON_BACKEND=orjson but orjson is not installed")
+    return name
+
+
+BACKEND = _resolve_backend()
+
+
+def _use_orjson(backend=None) -> bool:
+    return (_resolve_backend(backend) if backend else BACKEND) == "orjson"
+
+
+def _has_float(obj) -> bool:
+    t = type(obj)
+    if t is dict:
+        return any(map(_has_float, obj.values()))
+    if t is list or t is tuple:
+        # швидкий шлях для candidates: list[str]
+        if all(map(str.__instancecheck__, obj)):
+            return False
+        return any(map(_has_float, obj))
+    return isinstance(obj, float)
+
+
+def _orjson_bytes(obj):
+    """orjson output, or None when it cannot be byte-identical to the stdlib."""
+    if _has_float(obj):
+        return None
+    try:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    except TypeError:
+        # int > 64 bit, non-str keys, unsupported types: stdlib decides
+        return None
+
+
+def canonical_bytes(obj, backend=None) -> bytes:
+    if _use_orjson(backend):
+        out = _orjson_bytes(obj)
+        if out is not None:
+            return out
+    return _stdlib_dumps(obj).encode("utf-8")
+
+
+def iter_canonical_chunks(obj):
+    """
+    Canonical bytes in pieces (stdlib encoder). Dicts with str keys are walked key by
+    key and long lists are encoded LIST_CHUNK items at a time, so no piece is much
+    larger than one chunk of a list.
+    """
+    t = type(obj)
+    if t is dict and all(map(str.__instancecheck__, obj)):
+        yield b"{"
+        first = True
+        for k in sorted(obj):
+            if not first:
+                yield b","
+            first = False
+            yield _stdlib_dumps(k).encode("utf-8") + b":"
+            yield from iter_canonical_chunks(obj[k])
+        yield b"}"
+    elif (t is list or t is tuple) and len(obj) > LIST_CHUNK:
+        yield b"["
+        for i in range(0, len(obj), LIST_CHUNK):
+            if i:
+                yield b","
+            yield _stdlib_dumps(obj[i:i + LIST_CHUNK])[1:-1].encode("utf-8")
+        yield b"]"
+    else:
+        yield _stdlib_dumps(obj).encode("utf-8")
+
+
+def canonical_sha256(obj, backend=None) -> bytes:
+    """sha256(canonical_bytes(obj)).digest(), without building the full str/bytes twice."""
+    if _use_orjson(backend):
+        out = _orjson_bytes(obj)
+        if out is not None:
+            return sha256(out).digest()
+    h = sha256()
+    for piece in iter_canonical_chunks(obj):
+        h.update(piece)
+    return h.digest()
+
+
+def canonical_sha256_timed(obj, backend=None) -> Tuple[bytes, float, float]:
+    """canonical_sha256 plus (encode_seconds, hash_seconds), for callers that report both stages."""
+    clock = time.perf_counter
+    t0 = clock()
+    if _use_orjson(backend):
+        out = _orjson_bytes(obj)
+        if out is not None:
+            t1 = clock()
+            digest = sha256(out).digest()
+            return digest, t1 - t0, clock() - t1
+    h = sha256()
+    hash_sec = 0.0
+    for piece in iter_canonical_chunks(obj):
+        t = clock()
+        h.update(piece)
+        hash_sec += clock() - t
+    return h.digest(), clock() - t0 - hash_sec, hash_sec
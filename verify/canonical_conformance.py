@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Byte-identity suite for verify/canonical.py.
+
+Every available backend must produce exactly the reference bytes
+(json.dumps(sort_keys=True, separators=(",", ":"), ensure_ascii=False)) for the corpus in
+verify/conformance/canonical_cases.json plus generated cases (huge candidate lists, deep
+nesting, non-str keys), and canonical_sha256 must match sha256 of those bytes.
+
+Usage:
+  python3 verify/canonical_conformance.py [--huge 1000000] [--bench]
+"""
+import argparse
+import json
+import sys
+import time
+from hashlib import sha256
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from verify.canonical import LIST_CHUNK, available_backends, canonical_bytes, canonical_sha256  # noqa: E402
+
+CORPUS = ROOT / "verify" / "conformance" / "canonical_cases.json"
+
+
+def reference_bytes(obj) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def generated_cases(huge: int):
+    cands = sorted(f"agent_{i:07d}" for i in range(huge))
+    yield "huge_candidates", {
+        "task_id": "task_huge",
+        "candidate_order": "lexicographic",
+        "candidates": cands,
+        "winner": cands[len(cands) // 2],
+        "re4ctor_signature": {"type": "ecdsa", "v": 28, "r": "0x" + "aa" * 32, "s": "0x" + "bb" * 32},
+    }
+    yield "list_chunk_boundary", [f"c{i}" for i in range(LIST_CHUNK * 2)]
+    yield "list_chunk_boundary_plus_one", [f"c{i}" for i in range(LIST_CHUNK * 2 + 1)]
+    yield "huge_unicode_candidates", [f"агент_{i}_\U0001f3b2" for i in range(LIST_CHUNK * 3 + 7)]
+    yield "huge_mixed_list", [i if i % 3 else {"i": i, "f": i / 7} for i in range(LIST_CHUNK + 5)]
+
+    deep = {"leaf": "x"}
+    for i in range(200):
+        deep = {"re4ctor_signature": deep, "level": i}
+    yield "deep_nested_signature", deep
+
+    yield "non_str_keys", {1: "a", 2: "b"}
+    yield "tuple_values", {"t": ("b", "a"), "n": (1, 2.5)}
+
+
+def corpus_cases():
+    for case in json.loads(CORPUS.read_text(encoding="utf-8")):
+        yield case["name"], case["value"], case["sha256"]
+
+
+def run(huge: int) -> int:
+    backends = available_backends()
+    failures = 0
+    total = 0
+
+    cases = [(n, v, h) for n, v, h in corpus_cases()]
+    cases += [(n, v, None) for n, v in generated_cases(huge)]
+
+    for name, value, expected_hex in cases:
+        ref = reference_bytes(value)
+        ref_hash = sha256(ref).digest()
+        if expected_hex is not None and ref_hash.hex() != expected_hex:
+            print(f"FAIL {name}: corpus sha256 mismatch for reference encoder")
+            failures += 1
+        for backend in backends:
+            total += 1
+            out = canonical_bytes(value, backend=backend)
+            digest = canonical_sha256(value, backend=backend)
+            if out != ref:
+                print(f"FAIL {name} [{backend}]: canonical_bytes differs from reference")
+                failures += 1
+            elif digest != ref_hash:
+                print(f"FAIL {name} [{backend}]: canonical_sha256 differs from sha256(reference)")
+                failures += 1
+
+    print(json.dumps({"backends": backends, "cases": len(cases), "checks": total, "failures": failures}))
+    return 1 if failures else 0
+
+
+def bench(huge: int) -> None:
+    cands = sorted(f"agent_{i:07d}" for i in range(huge))
+    receipt = {"task_id": "t", "candidate_order": "lexicographic", "candidates": cands, "winner": cands[0]}
+    for backend in available_backends():
+        for fn in (canonical_bytes, canonical_sha256):
+            t0 = time.perf_counter()
+            fn(receipt, backend=backend)
+            ms = (time.perf_counter() - t0) * 1000
+            print(json.dumps({"backend": backend, "fn": fn.__name__, "candidates": huge, "ms": round(ms, 2)}))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--huge", type=int, default=200000, help="candidates in the huge-list case")
+    ap.add_argument("--bench", action="store_true", help="also print timings per backend")
+    args = ap.parse_args()
+
+    rc = run(args.huge)
+    if args.bench:
+        bench(args.huge)
+    return rc
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,296 @@
+"""
+Canonical CBOR for receipts (shared by app/ and verify/).
+
+Binary alternative to canonical JSON (verify/canonical.py) over the same data model:
+null, booleans, integers, floats, text strings, arrays and maps with text keys. The
+encoding is the "core deterministic encoding" of RFC 8949, section 4.2.1:
+
+  - shortest-form heads for integers and lengths, definite lengths only
+  - map keys sorted by the bytewise order of their encoded form
+  - floats in the shortest of half / single / double precision that keeps the value
+  - integers outside 64 bits as bignums (tags 2 / 3)
+
+Byte strings and other tags are rejected on both sides, so converting a receipt
+between JSON and CBOR is lossless and signatures over either canonical form still
+verify after conversion (see verify/receipt_convert.py).
+
+Scheme "ed25519(sha256(canonical_cbor))" signs sha256(canonical_cbor(unsigned receipt)).
+"""
+import math
+import operator
+import struct
+from hashlib import sha256
+from typing import Any, Iterator, List, Tuple
+
+CBOR_SIGNATURE_SCHEME = "ed25519(sha256(canonical_cbor))"
+CBOR_MEDIA_TYPE = "application/cbor"
+CBOR_SEQ_MEDIA_TYPE = "application/cbor-seq"
+
+MAX_DEPTH = 256
+
+_F16 = struct.Struct(">e")
+_F32 = struct.Struct(">f")
+_F64 = struct.Struct(">d")
+
+
+class CBORIncomplete(ValueError):
+    """The buffer ends in the middle of an item (more input may complete it)."""
+
+
+# ---------- encoding ----------
+def _head(major: int, n: int) -> bytes:
+    mt = major << 5
+    if n < 24:
+        return bytes((mt | n,))
+    if n < 0x100:
+        return bytes((mt | 24, n))
+    if n < 0x10000:
+        return bytes((mt | 25,)) + n.to_bytes(2, "big")
+    if n < 0x100000000:
+        return bytes((mt | 26,)) + n.to_bytes(4, "big")
+    return bytes((mt | 27,)) + n.to_bytes(8, "big")
+
+
+def _text(s: str) -> bytes:
+    raw = s.encode("utf-8")
+    return _head(3, len(raw)) + raw
+
+
+# голови текстових рядків довжиною < 256 як latin-1 символи: ASCII-рядок + голова = ті самі байти
+_TEXT_HEAD_CHARS = [_head(3, n).decode("latin-1") for n in range(256)]
+
+
+def _text_items(items) -> bytes:
+    """Concatenated encodings of a list[str] (the candidates fast path)."""
+    if "".join(items).isascii():
+        try:
+            heads = map(_TEXT_HEAD_CHARS.__getitem__, map(len, items))
+            return "".join(map(operator.add, heads, items)).encode("latin-1")
+        except IndexError:  # рядок довший за 255 символів
+            pass
+    return b"".join(map(_text, items))
+
+
+def _int(n: int) -> bytes:
+    if n >= 0:
+        if n < 1 << 64:
+            return _head(0, n)
+        tag, mag = 0xC2, n
+    else:
+        if -n - 1 < 1 << 64:
+            return _head(1, -n - 1)
+        tag, mag = 0xC3, -n - 1
+    raw = mag.to_bytes((mag.bit_length() + 7) // 8, "big")
+    return bytes((tag,)) + _head(2, len(raw)) + raw
+
+
+def _float(x: float) -> bytes:
+    if math.isnan(x):
+        return b"\xf9\x7e\x00"
+    try:
+        if _F16.unpack(_F16.pack(x))[0] == x:
+            return b"\xf9" + _F16.pack(x)
+    except OverflowError:
+        pass
+    try:
+        if _F32.unpack(_F32.pack(x))[0] == x:
+            return b"\xfa" + _F32.pack(x)
+    except OverflowError:
+        pass
+    return b"\xfb" + _F64.pack(x)
+
+
+def _encode(obj, out: List[bytes], depth: int = 0) -> None:
+    if depth > MAX_DEPTH:
+        raise ValueError("CBOR: nesting too deep")
+    t = type(obj)
+    if t is str:
+        out.append(_text(obj))
+    elif obj is None:
+        out.append(b"\xf6")
+    elif obj is True:
+        out.append(b"\xf5")
+    elif obj is False:
+        out.append(b"\xf4")
+    elif t is int:
+        out.append(_int(obj))
+    elif t is float:
+        out.append(_float(obj))
+    elif t is list or t is tuple:
+        out.append(_head(4, len(obj)))
+        # швидкий шлях для candidates: list[str]
+        if all(map(str.__instancecheck__, obj)):
+            out.append(_text_items(obj))
+        else:
+            for item in obj:
+                _encode(item, out, depth + 1)
+    elif t is dict:
+        entries = []
+        for k, v in obj.items():
+            if type(k) is not str:
+                raise TypeError(f"CBOR: map keys must be str, not {type(k).__name__}")
+            entries.append((_text(k), v))
+        entries.sort(key=lambda e: e[0])
+        out.append(_head(5, len(entries)))
+        for k, v in entries:
+            out.append(k)
+            _encode(v, out, depth + 1)
+    elif isinstance(obj, bool):
+        out.append(b"\xf5" if obj else b"\xf4")
+    elif isinstance(obj, int):
+        out.append(_int(int(obj)))
+    elif isinstance(obj, float):
+        out.append(_float(float(obj)))
+    elif isinstance(obj, str):
+        out.append(_text(str(obj)))
+    else:
+        raise TypeError(f"CBOR: unsupported type {t.__name__}")
+
+
+def canonical_cbor(obj) -> bytes:
+    out: List[bytes] = []
+    _encode(obj, out)
+    return b"".join(out)
+
+
+def iter_canonical_cbor_items(items) -> Iterator[bytes]:
+    """Encoded array items, without the array head (used for streamed candidate lists)."""
+    if all(map(str.__instancecheck__, items)):
+        yield _text_items(items)
+    else:
+        out: List[bytes] = []
+        for item in items:
+            _encode(item, out, 1)
+        yield b"".join(out)
+
+
+def cbor_head(major: int, n: int) -> bytes:
+    return _head(major, n)
+
+
+def cbor_key_order(keys) -> List[str]:
+    """keys in canonical map order."""
+    return sorted(keys, key=_text)
+
+
+def canonical_cbor_sha256(obj) -> bytes:
+    return sha256(canonical_cbor(obj)).digest()
+
+
+# ---------- decoding ----------
+def _need(data, pos: int, n: int) -> None:
+    if pos + n > len(data):
+        raise CBORIncomplete("CBOR: unexpected end of data")
+
+
+def _arg(data, pos: int, info: int) -> Tuple[int, int]:
+    if info < 24:
+        return info, pos
+    if info == 24:
+        _need(data, pos, 1)
+        return data[pos], pos + 1
+    if info in (25, 26, 27):
+        size = 1 << (info - 24)
+        _need(data, pos, size)
+        return int.from_bytes(data[pos:pos + size], "big"), pos + size
+    if info == 31:
+        raise ValueError("CBOR: indefinite-length items are not supported")
+    raise ValueError(f"CBOR: reserved additional information {info}")
+
+
+def decode_item(data, pos: int = 0, depth: int = 0) -> Tuple[Any, int]:
+    """(item, end offset) for the item starting at pos; CBORIncomplete if data is cut short."""
+    if depth > MAX_DEPTH:
+        raise ValueError("CBOR: nesting too deep")
+    if depth == 0 and not isinstance(data, (bytes, bytearray)):
+        data = bytes(data)
+    _need(data, pos, 1)
+    ib = data[pos]
+    major, info = ib >> 5, ib & 0x1F
+    pos += 1
+
+    if major == 7:
+        if info == 20:
+            return False, pos
+        if info == 21:
+            return True, pos
+        if info == 22:
+            return None, pos
+        if info in (25, 26, 27):
+            fmt = {25: _F16, 26: _F32, 27: _F64}[info]
+            _need(data, pos, fmt.size)
+            return fmt.unpack_from(data, pos)[0], pos + fmt.size
+        raise ValueError(f"CBOR: unsupported simple value {info}")
+
+    n, pos = _arg(data, pos, info)
+    if major == 0:
+        return n, pos
+    if major == 1:
+        return -1 - n, pos
+    if major == 3:
+        _need(data, pos, n)
+        try:
+            return bytes(data[pos:pos + n]).decode("utf-8"), pos + n
+        except UnicodeDecodeError as e:
+            raise ValueError(f"CBOR: invalid UTF-8 in text string: {e}")
+    if major == 4:
+        items = []
+        append = items.append
+        size = len(data)
+        for _ in range(n):
+            # короткі рядки (candidates) розбираємо на місці, без рекурсії
+            if pos < size and 0x60 <= data[pos] < 0x78:
+                end = pos + data[pos] - 0x5F
+                if end > size:
+                    raise CBORIncomplete("CBOR: unexpected end of data")
+                try:
+                    append(data[pos + 1:end].decode("utf-8"))
+                except UnicodeDecodeError as e:
+                    raise ValueError(f"CBOR: invalid UTF-8 in text string: {e}")
+                pos = end
+            else:
+                item, pos = decode_item(data, pos, depth + 1)
+                append(item)
+        return items, pos
+    if major == 5:
+        obj = {}
+        for _ in range(n):
+            key, pos = decode_item(data, pos, depth + 1)
+            if type(key) is not str:
+                raise ValueError("CBOR: map keys must be text strings")
+            if key in obj:
+                raise ValueError(f"CBOR: duplicate map key {key!r}")
+            obj[key], pos = decode_item(data, pos, depth + 1)
+        return obj, pos
+    if major == 6 and n in (2, 3):
+        _need(data, pos, 1)
+        if data[pos] >> 5 != 2:
+            raise ValueError("CBOR: bignum tag must wrap a byte string")
+        size, pos = _arg(data, pos + 1, data[pos] & 0x1F)
+        _need(data, pos, size)
+        mag = int.from_bytes(data[pos:pos + size], "big")
+        return (mag if n == 2 else -1 - mag), pos + size
+    if major == 2:
+        raise ValueError("CBOR: byte strings have no JSON equivalent")
+    raise ValueError(f"CBOR: unsupported tag {n}")
+
+
+def cbor_loads(data) -> Any:
+    obj, end = decode_item(data, 0)
+    if end != len(data):
+        raise ValueError("CBOR: extra data after item")
+    return obj
+
+
+def iter_cbor_seq(data) -> Iterator[Any]:
+    """Items of a CBOR sequence (RFC 8742)."""
+    pos = 0
+    while pos < len(data):
+        obj, pos = decode_item(data, pos)
+        yield obj
+
+
+def looks_like_cbor(data: bytes) -> bool:
+    """JSON receipts start with '{' / '[' (possibly after whitespace); a CBOR map or array does not."""
+    head = data.lstrip()[:1]
+    return bool(data) and head not in (b"{", b"[")
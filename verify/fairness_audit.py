@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Fairness audit: does any candidate win more (or less) often than the selection rules say?
+
+Reads receipt archives (the same inputs as verify/bulk_verify.py: .json / .cbor / .jsonl
+files, directories, globs, "-") and, per candidate, compares the observed win count with
+the expected one, summed over every draw the candidate took part in:
+
+  uniform      p = 1 / n           (pool size n varies per receipt)
+  k-of-n       p = k / n
+  weighted     p = w_i / sum(w)
+
+Statistics (per candidate, over all epochs and per epoch):
+  - Pearson chi-square of observed vs expected wins, with its p-value (scaled for the
+    Var(O) = sum p(1-p) of varying pools)
+  - z = (O - E) / sqrt(sum p(1-p)) and a two-sided binomial tail p-value (binomial over
+    the candidate's draws with their mean p; normal approximation for very large counts)
+  - candidates whose Bonferroni-adjusted p is below --alpha are "flagged"
+  - per-epoch drift: each epoch's chi-square and total variation distance between observed
+    and expected win shares, and a heterogeneity chi-square (sum of the epoch chi-squares
+    minus the overall one) that tests whether the bias changes between epochs
+
+The epoch is the receipt's epoch field (epoch beacon receipts), else the ISO week of its
+timestamp (2026-W42, as in scripts/autopost_weekly.sh).
+
+Candidate ids and epochs are encoded as integers; every chunk of receipts is reduced in a
+worker to per-(epoch, candidate) sums with NumPy, and this process only keeps those sums
+for the pairs that occur, so memory is O(distinct (epoch, candidate) pairs) whatever the
+number of receipts; a pool that changes between epochs costs no epochs x candidates
+matrix. Signatures are not checked here: run verify/bulk_verify.py on the same archive.
+Compact receipts (no candidate list) are skipped and counted.
+
+Writes the result as JSON (-o, default stdout); report.lines are ready for the
+"Fairness audit" bullets of templates/weekly.md. Exits 1 when a candidate is flagged or
+the overall chi-square p-value is below --alpha (2: no receipts).
+
+Usage:
+  python3 verify/fairness_audit.py receipts/ more/*.jsonl [-o audit.json]
+                                   [--workers 8] [--chunk 512] [--alpha 0.01] [--top 20]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from verify.bulk_verify import Item, _chunks, iter_items  # noqa: E402
+from verify.verify_receipt import VerifyError, load_receipt_bytes  # noqa: E402
+
+# вище цієї дисперсії точний binomial tail (continued fraction) замінюємо нормальним
+EXACT_TAIL_MAX_VAR = 1e5
+_EPS = 1e-14
+_FPMIN = 1e-300
+
+_lgamma = np.frompyfunc(math.lgamma, 1, 1)
+
+
+# --- reading (in the workers) ---
+
+def _epoch_of(receipt: dict) -> str:
+    epoch = receipt.get("epoch")
+    if isinstance(epoch, str) and epoch:
+        return epoch
+    try:
+        y, w, _ = datetime.fromisoformat(str(receipt["timestamp"]).replace("Z", "+00:00")).isocalendar()
+        return f"{y}-W{w:02d}"
+    except (KeyError, ValueError):
+        return "unknown"
+
+
+def _draw(receipt) -> tuple:
+    """(candidates, probabilities or None for 1/n, k, winners) or raises ValueError(skip reason)."""
+    if not isinstance(receipt, dict):
+        raise ValueError("invalid")
+    if "candidates_root" in receipt:
+        raise ValueError("compact")
+    cands = receipt.get("candidates")
+    if not isinstance(cands, list) or not cands:
+        raise ValueError("no_candidates")
+    winners = receipt.get("winners")
+    if not isinstance(winners, list) or not winners:
+        winners = [receipt.get("winner")]
+    if len(winners) > len(cands) or any(w not in cands for w in winners):
+        raise ValueError("winner_not_in_candidates")
+    if receipt.get("allocation_mode", "uniform") == "weighted":
+        weights = receipt.get("weights")
+        if not isinstance(weights, list) or len(weights) != len(cands) or len(winners) != 1:
+            raise ValueError("invalid")
+        total = float(sum(weights))
+        if total <= 0:
+            raise ValueError("invalid")
+        return cands, [w / total for w in weights], 1, winners
+    return cands, None, len(winners), winners
+
+
+def _receipts(item: Item):
+    if item[0] == "file":
+        with open(item[1], "rb") as f:
+            obj = load_receipt_bytes(f.read())
+        yield from obj if isinstance(obj, list) else [obj]
+    else:
+        yield json.loads(item[2])
+
+
+def reduce_chunk(items: List[Item]) -> dict:
+    """One chunk of inputs -> per-(epoch, candidate) sums over local integer ids."""
+    vmap, emap = {}, {}
+    ids, probs, ns, eps, win_keys = [], [], [], [], []
+    skipped = Counter()
+    for item in items:
+        try:
+            receipts = list(_receipts(item))
+        except (OSError, ValueError, VerifyError):
+            skipped["bad_json"] += 1
+            continue
+        for receipt in receipts:
+            try:
+                cands, weights, k, winners = _draw(receipt)
+                row = [vmap.setdefault(c, len(vmap)) for c in cands]
+            except ValueError as e:
+                skipped[str(e)] += 1
+                continue
+            except TypeError:  # нехешований id кандидата або нечислова вага
+                skipped["invalid"] += 1
+                continue
+            n = len(cands)
+            e = emap.setdefault(_epoch_of(receipt), len(emap))
+            ids.extend(row)
+            probs.extend(weights if weights is not None else [k / n] * n)
+            ns.append(n)
+            eps.append(e)
+            win_keys.extend((e, vmap[w]) for w in winners)
+
+    out = {"vocab": list(vmap), "epochs": list(emap), "skipped": dict(skipped),
+           "receipts": np.bincount(np.asarray(eps, dtype=np.int64), minlength=len(emap))}
+    n_cands = max(len(vmap), 1)
+    p = np.asarray(probs, dtype=np.float64)
+    keys = np.repeat(np.asarray(eps, dtype=np.int64), ns) * n_cands + np.asarray(ids, dtype=np.int64)
+    uniq, inv = np.unique(keys, return_inverse=True)
+    wk = np.asarray(win_keys, dtype=np.int64).reshape(-1, 2)
+    out.update(
+        epoch=uniq // n_cands,
+        cand=uniq % n_cands,
+        expected=np.bincount(inv, weights=p, minlength=len(uniq)),
+        variance=np.bincount(inv, weights=p * (1.0 - p), minlength=len(uniq)),
+        draws=np.bincount(inv, minlength=len(uniq)),
+        observed=np.bincount(np.searchsorted(uniq, wk[:, 0] * n_cands + wk[:, 1]), minlength=len(uniq)),
+    )
+    return out
+
+
+# --- aggregation (this process) ---
+
+class WinStats:
+    """
+    Per-(epoch, candidate) expected / variance / draws / observed sums, kept sparse: only
+    the pairs that occur, as sorted int64 keys (epoch << 32 | candidate) with one value
+    array per field. Chunk results are buffered and merged with np.unique once the buffer
+    outgrows the merged table, so merging stays amortized O(pairs log pairs).
+    """
+
+    FIELDS = ("expected", "variance", "draws", "observed")
+    MIN_MERGE = 1 << 16
+
+    def __init__(self):
+        self.candidates, self.cmap = [], {}
+        self.epochs, self.emap = [], {}
+        self.receipts = np.zeros(0, dtype=np.int64)
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.sums = {f: np.zeros(0) for f in self.FIELDS}
+        self._pending: list = []
+        self._pending_len = 0
+        self.skipped = Counter()
+
+    @staticmethod
+    def _ids(names: list, mapping: dict, out: list) -> np.ndarray:
+        ids = []
+        for name in names:
+            i = mapping.get(name)
+            if i is None:
+                i = mapping[name] = len(out)
+                out.append(name)
+            ids.append(i)
+        return np.asarray(ids, dtype=np.int64)
+
+    def add(self, part: dict) -> None:
+        cid = self._ids(part["vocab"], self.cmap, self.candidates)
+        eid = self._ids(part["epochs"], self.emap, self.epochs)
+        self.skipped.update(part["skipped"])
+        if len(self.epochs) > len(self.receipts):
+            # подвоєння: амортизовано O(1) копій на нову епоху
+            receipts = np.zeros(max(len(self.epochs), 2 * len(self.receipts)), dtype=np.int64)
+            receipts[:len(self.receipts)] = self.receipts
+            self.receipts = receipts
+        self.receipts[eid] += part["receipts"]
+        keys = (eid[part["epoch"]] << 32) | cid[part["cand"]]
+        self._pending.append((keys, [np.asarray(part[f], dtype=np.float64) for f in self.FIELDS]))
+        self._pending_len += len(keys)
+        if self._pending_len > max(len(self.keys), self.MIN_MERGE):
+            self._merge()
+
+    def _merge(self) -> None:
+        if not self._pending:
+            return
+        keys = np.concatenate([self.keys] + [k for k, _ in self._pending])
+        self.keys, inv = np.unique(keys, return_inverse=True)
+        for i, f in enumerate(self.FIELDS):
+            values = np.concatenate([self.sums[f]] + [v[i] for _, v in self._pending])
+            self.sums[f] = np.bincount(inv, weights=values, minlength=len(self.keys))
+        self._pending, self._pending_len = [], 0
+
+    def view(self) -> dict:
+        """
+        The pairs grouped by epoch (epochs in sorted order): epoch j owns the slice
+        bounds[j]:bounds[j + 1] of cand and of every field.
+        """
+        self._merge()
+        order = np.argsort(np.asarray(self.epochs, dtype=object), kind="stable").astype(np.int64)
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        e = rank[self.keys >> 32] if len(self.keys) else np.zeros(0, dtype=np.int64)
+        c = self.keys & 0xFFFFFFFF
+        by_epoch = np.lexsort((c, e))
+        e = e[by_epoch]
+        return {
+            "epochs": [self.epochs[i] for i in order],
+            "receipts": self.receipts[:len(self.epochs)][order],
+            "bounds": np.searchsorted(e, np.arange(len(order) + 1)),
+            "cand": c[by_epoch],
+            **{f: s[by_epoch] for f, s in self.sums.items()},
+        }
+
+
+# --- statistics ---
+
+def _gammaincc(a: float, x: float) -> float:
+    """Regularized upper incomplete gamma Q(a, x) (series / continued fraction)."""
+    if x <= 0:
+        return 1.0
+    gln = math.lgamma(a)
+    if x < a + 1:
+        term = total = 1.0 / a
+        ap = a
+        for _ in range(100000):
+            ap += 1
+            term *= x / ap
+            total += term
+            if abs(term) < abs(total) * _EPS:
+                break
+        return max(0.0, 1.0 - total * math.exp(-x + a * math.log(x) - gln))
+    b = x + 1 - a
+    c, d = 1.0 / _FPMIN, 1.0 / b
+    h = d
+    for i in range(1, 100000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = _FPMIN if abs(d) < _FPMIN else d
+        c = b + an / c
+        c = _FPMIN if abs(c) < _FPMIN else c
+        d = 1.0 / d
+        h *= d * c
+        if abs(d * c - 1) < _EPS:
+            break
+    return math.exp(-x + a * math.log(x) - gln) * h
+
+
+def chi2_sf(x: float, df: int) -> float:
+    if df <= 0:
+        return 1.0
+    if df > 10000:
+        # Wilson–Hilferty: для великих df точніше за ряд і без тисяч ітерацій
+        z = ((x / df) ** (1 / 3) - (1 - 2 / (9 * df))) / math.sqrt(2 / (9 * df))
+        return 0.5 * math.erfc(z / math.sqrt(2))
+    return _gammaincc(df / 2.0, x / 2.0)
+
+
+def _betacf(a: np.ndarray, b: np.ndarray, x: np.ndarray, max_iter: int) -> np.ndarray:
+    """Continued fraction of the incomplete beta (Numerical Recipes betacf), elementwise."""
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = np.ones_like(x)
+    d = 1.0 - qab * x / qap
+    d = 1.0 / np.where(np.abs(d) < _FPMIN, _FPMIN, d)
+    h = d.copy()
+    for m in range(1, max_iter + 1):
+        m2 = 2 * m
+        for aa in (m * (b - m) * x / ((qam + m2) * (a + m2)),
+                   -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))):
+            d = 1.0 + aa * d
+            d = 1.0 / np.where(np.abs(d) < _FPMIN, _FPMIN, d)
+            c = 1.0 + aa / c
+            c = np.where(np.abs(c) < _FPMIN, _FPMIN, c)
+            h *= d * c
+        if np.all(np.abs(d * c - 1.0) < 1e-12):
+            break
+    return h
+
+
+def _betainc(a: np.ndarray, b: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Regularized incomplete beta I_x(a, b) for a, b > 0 and 0 < x < 1, elementwise."""
+    if not len(x):
+        return x
+    lbt = (_lgamma(a + b) - _lgamma(a) - _lgamma(b)).astype(np.float64) + a * np.log(x) + b * np.log1p(-x)
+    bt = np.exp(lbt)
+    direct = x < (a + 1.0) / (a + b + 2.0)
+    max_iter = int(10 * math.sqrt(float(np.max(np.maximum(a, b))))) + 100
+    out = np.empty_like(x)
+    if direct.any():
+        i = direct
+        out[i] = bt[i] * _betacf(a[i], b[i], x[i], max_iter) / a[i]
+    if (~direct).any():
+        i = ~direct
+        out[i] = 1.0 - bt[i] * _betacf(b[i], a[i], 1.0 - x[i], max_iter) / b[i]
+    return np.clip(out, 0.0, 1.0)
+
+
+def binomial_two_sided(observed: np.ndarray, draws: np.ndarray, expected: np.ndarray,
+                       variance: np.ndarray) -> np.ndarray:
+    """
+    Two-sided tail p-value of observed wins, per candidate: Binomial(draws, expected / draws)
+    (exact, via the incomplete beta), or the normal approximation with continuity
+    correction above EXACT_TAIL_MAX_VAR.
+    """
+    o, n = observed.astype(np.float64), draws.astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = np.where(n > 0, expected / n, 0.0)
+    upper, lower = np.ones_like(o), np.ones_like(o)
+    # p = 0 або 1: результат детермінований, tail = 1
+    degenerate = (p <= 0) | (p >= 1)
+    normal = ~degenerate & (variance > EXACT_TAIL_MAX_VAR)
+    exact = ~degenerate & ~normal
+
+    # P(X >= o) = I_p(o, n - o + 1);  P(X <= o) = 1 - I_p(o + 1, n - o)
+    i = exact & (o >= 1)
+    upper[i] = _betainc(o[i], n[i] - o[i] + 1, p[i])
+    i = exact & (o < n)
+    lower[i] = 1.0 - _betainc(o[i] + 1, n[i] - o[i], p[i])
+
+    sd = np.sqrt(variance[normal])
+    upper[normal] = 0.5 * _erfc(((o[normal] - 0.5) - expected[normal]) / sd / math.sqrt(2))
+    lower[normal] = 0.5 * _erfc((expected[normal] - (o[normal] + 0.5)) / sd / math.sqrt(2))
+
+    return np.minimum(1.0, 2.0 * np.minimum(upper, lower))
+
+
+def _erfc(z: np.ndarray) -> np.ndarray:
+    return np.array([math.erfc(v) for v in z.tolist()], dtype=np.float64)
+
+
+def pearson(observed: np.ndarray, expected: np.ndarray, variance: np.ndarray) -> dict:
+    """
+    Pearson chi-square of win counts, scaled so its mean is df (first-order Rao-Scott).
+    With one fixed pool this is the plain Pearson test; with pools that vary (or k-of-n)
+    Var(O) = sum p(1-p) is below E and the raw statistic would run low.
+    """
+    live = (expected > 0) & (variance > 0)
+    df = max(int(live.sum()) - 1, 0)
+    if df == 0:
+        return {"chi2": 0.0, "df": 0, "p_value": 1.0}
+    o, e = observed[live], expected[live]
+    chi2 = float(np.sum((o - e) ** 2 / e)) * df / float(np.sum(variance[live] / e))
+    return {"chi2": round(chi2, 4), "df": df, "p_value": chi2_sf(chi2, df)}
+
+
+def audit(stats: WinStats, alpha: float, top: int) -> dict:
+    v = stats.view()
+    n_cands = len(stats.candidates)
+    cand, bounds = v["cand"], v["bounds"]
+    exp, var, draws, obs = (np.bincount(cand, weights=v[f], minlength=n_cands) for f in WinStats.FIELDS)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(var > 0, (obs - exp) / np.sqrt(var), 0.0)
+        ratio = np.where(exp > 0, obs / exp, np.nan)
+    p_tail = binomial_two_sided(obs, draws, exp, var)
+    tested = int(np.sum(var > 0))
+    p_adj = np.minimum(1.0, p_tail * max(tested, 1))
+    overall = pearson(obs, exp, var)
+
+    def row(i: int) -> dict:
+        return {
+            "candidate": stats.candidates[i],
+            "draws": int(draws[i]),
+            "expected": round(float(exp[i]), 3),
+            "observed": int(obs[i]),
+            "ratio": None if np.isnan(ratio[i]) else round(float(ratio[i]), 4),
+            "z": round(float(z[i]), 3),
+            "p_value": float(p_tail[i]),
+            "p_adjusted": float(p_adj[i]),
+        }
+
+    order = np.lexsort((-np.abs(z), p_tail))
+    flagged = [row(i) for i in order if p_adj[i] < alpha]
+
+    epochs, chi2_sum, df_sum = [], 0.0, 0
+    n_epochs = len(v["epochs"])
+    for j, name in enumerate(v["epochs"]):
+        # лише кандидати, що брали участь в епосі: нульові пари не змінюють жодної статистики
+        sl = slice(bounds[j], bounds[j + 1])
+        ej, oj, vj = v["expected"][sl], v["observed"][sl], v["variance"][sl]
+        test = pearson(oj, ej, vj)
+        chi2_sum += test["chi2"]
+        df_sum += test["df"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            zj = np.where(vj > 0, (oj - ej) / np.sqrt(vj), 0.0)
+        k = int(np.argmax(np.abs(zj))) if len(zj) else 0
+        wins = oj.sum()
+        tv = 0.5 * float(np.abs(oj / wins - ej / ej.sum()).sum()) if wins > 0 else 0.0
+        epochs.append({
+            "epoch": name,
+            "receipts": int(v["receipts"][j]),
+            "wins": int(wins),
+            **test,
+            "tv_distance": round(tv, 6),
+            "max_abs_z": round(abs(float(zj[k])), 3) if len(zj) else 0.0,
+            "max_abs_z_candidate": stats.candidates[cand[sl][k]] if len(zj) else None,
+            "flagged": test["p_value"] * n_epochs < alpha,
+        })
+    het_chi2 = max(chi2_sum - overall["chi2"], 0.0)
+    het_df = max(df_sum - overall["df"], 0)
+
+    return {
+        "receipts": int(v["receipts"].sum()),
+        "candidates": int(np.sum(draws > 0)),
+        "epochs": n_epochs,
+        "skipped": dict(stats.skipped.most_common()),
+        "alpha": alpha,
+        "overall": overall,
+        "binomial": {
+            "candidates_tested": tested,
+            "min_p_adjusted": float(p_adj.min()) if len(p_adj) else 1.0,
+            "flagged": len(flagged),
+        },
+        "epoch_heterogeneity": {"chi2": round(het_chi2, 4), "df": het_df, "p_value": chi2_sf(het_chi2, het_df)},
+        "flagged": flagged,
+        "top": [row(i) for i in order[:top]],
+        "per_epoch": epochs,
+    }
+
+
+def report_lines(result: dict) -> List[str]:
+    o, h = result["overall"], result["epoch_heterogeneity"]
+    span = f"{result['per_epoch'][0]['epoch']}..{result['per_epoch'][-1]['epoch']}" if result["per_epoch"] else "-"
+    lines = [
+        f"{result['receipts']:,} receipts, {result['candidates']:,} candidates, epochs {span}",
+        f"win counts vs expected: chi2 = {o['chi2']:.1f} (df {o['df']}), p = {o['p_value']:.3g}",
+        f"candidates flagged (binomial tail, Bonferroni, alpha {result['alpha']}): {result['binomial']['flagged']}",
+        f"drift between epochs: chi2 = {h['chi2']:.1f} (df {h['df']}), p = {h['p_value']:.3g}; "
+        f"epochs flagged: {sum(e['flagged'] for e in result['per_epoch'])}",
+    ]
+    if result["skipped"]:
+        lines.append("skipped: " + ", ".join(f"{k} {v:,}" for k, v in result["skipped"].items()))
+    return lines
+
+
+def _reduce_all(inputs: List[str], workers: int, chunk_size: int, stats: WinStats) -> None:
+    chunks = _chunks(iter_items(inputs), chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            stats.add(reduce_chunk(chunk))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(ex.submit(reduce_chunk, chunk))
+            while len(pending) >= workers * 4:
+                stats.add(pending.popleft().result())
+        while pending:
+            stats.add(pending.popleft().result())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Per-candidate win-rate audit over receipt archives.")
+    ap.add_argument("inputs", nargs="+", help="receipt files / dirs / globs, or - for stdin (JSONL)")
+    ap.add_argument("-o", "--out", help="write the audit JSON here (default: stdout)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes (1 = no pool)")
+    ap.add_argument("--chunk", type=int, default=512, help="inputs (lines / files) per worker task")
+    ap.add_argument("--alpha", type=float, default=0.01, help="family-wise significance level")
+    ap.add_argument("--top", type=int, default=20, help="candidates listed in top (lowest p first)")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    stats = WinStats()
+    _reduce_all(args.inputs, args.workers, max(1, args.chunk), stats)
+    result = audit(stats, args.alpha, args.top)
+    seconds = time.perf_counter() - t0
+    result["report"] = {"lines": report_lines(result)}
+    result["seconds"] = round(seconds, 3)
+    result["receipts_per_sec"] = round(result["receipts"] / seconds, 1) if seconds > 0 else None
+    result["workers"] = args.workers
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if result["receipts"] == 0:
+        print("No receipts found", file=sys.stderr)
+        return 2
+    return 1 if result["binomial"]["flagged"] or result["overall"]["p_value"] < args.alpha else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
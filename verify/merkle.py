@@ -0,0 +1,102 @@
+"""
+Merkle-batched receipt signatures (shared by app/ and verify/).
+
+Scheme "ed25519(merkle_root(sha256(canonical_json)))": the signer hashes each unsigned
+receipt as usual (msg_hash = sha256(canonical_json)), builds a Merkle tree over a batch
+of them and signs the 32-byte root once. Tree hashing and inclusion proofs follow
+RFC 6962 / RFC 9162 (section 2.1):
+
+    leaf = sha256(0x00 || msg_hash)
+    node = sha256(0x01 || left || right)
+
+Each receipt carries merkle_root, merkle_leaf_index, merkle_tree_size and merkle_path
+(sibling hashes, leaf to root, hex).
+
+The same tree over the UTF-8 agent ids of a lexicographically sorted candidate list
+gives candidates_root: a compact receipt carries that root, candidates_count and an
+inclusion proof for the winner instead of the full list (docs/protocol.md, 4b).
+"""
+from hashlib import sha256
+from typing import List, Sequence, Tuple
+
+MERKLE_SIGNATURE_SCHEME = "ed25519(merkle_root(sha256(canonical_json)))"
+MERKLE_FIELDS = ("merkle_root", "merkle_leaf_index", "merkle_tree_size", "merkle_path")
+# компактний receipt: замість candidates (k-of-n додає winners_proof)
+CANDIDATES_FIELDS = ("candidates_root", "candidates_count", "winner_index", "winner_proof")
+
+_LEAF = b"\x00"
+_NODE = b"\x01"
+
+
+def leaf_hash(data: bytes) -> bytes:
+    return sha256(_LEAF + data).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return sha256(_NODE + left + right).digest()
+
+
+def build_levels(msg_hashes: Sequence[bytes]) -> List[List[bytes]]:
+    """
+    Levels from leaves to root. Nodes are paired left to right; a lone last node moves
+    up unchanged, which gives the same tree as RFC 6962's largest-power-of-two split.
+    """
+    if not msg_hashes:
+        raise ValueError("empty Merkle tree")
+    level = [leaf_hash(h) for h in msg_hashes]
+    levels = [level]
+    while len(level) > 1:
+        nxt = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        levels.append(nxt)
+        level = nxt
+    return levels
+
+
+def audit_path(levels: List[List[bytes]], index: int) -> List[bytes]:
+    path = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            path.append(level[sibling])
+        index >>= 1
+    return path
+
+
+def merkle_proofs(msg_hashes: Sequence[bytes]) -> Tuple[bytes, List[List[bytes]]]:
+    """(root, audit path for every leaf)."""
+    levels = build_levels(msg_hashes)
+    return levels[-1][0], [audit_path(levels, i) for i in range(len(msg_hashes))]
+
+
+def candidate_levels(sorted_candidates: Sequence[str]) -> List[List[bytes]]:
+    """Tree levels over the agent ids (UTF-8) in list order; levels[-1][0] is candidates_root."""
+    return build_levels([c.encode("utf-8") for c in sorted_candidates])
+
+
+def root_from_path(leaf: bytes, index: int, size: int, path: Sequence[bytes]) -> bytes:
+    """
+    RFC 9162 inclusion-proof check: the root the path leads to from leaf data (msg_hash,
+    or an agent id as UTF-8); ValueError if the path is malformed.
+    """
+    if not 0 <= index < size:
+        raise ValueError("merkle_leaf_index out of range")
+    fn, sn = index, size - 1
+    r = leaf_hash(leaf)
+    for p in path:
+        if sn == 0:
+            raise ValueError("merkle_path is too long")
+        if fn & 1 or fn == sn:
+            r = node_hash(p, r)
+            if not fn & 1:
+                while not fn & 1 and fn != 0:
+                    fn >>= 1
+                    sn >>= 1
+        else:
+            r = node_hash(r, p)
+        fn >>= 1
+        sn >>= 1
+    if sn != 0:
+        raise ValueError("merkle_path is too short")
+    return r
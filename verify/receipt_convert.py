@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Convert receipts between JSON and canonical CBOR without breaking signatures.
+
+Both encodings carry the same data model, so a receipt converts losslessly either way:
+a signature over canonical JSON (ed25519(sha256(canonical_json))) or over canonical
+CBOR (ed25519(sha256(canonical_cbor))) verifies the same before and after. The
+direction is picked from the input unless --to is given.
+
+  receipt.json  <->  receipt.cbor          one receipt (or a JSON array <-> CBOR array)
+  receipts.jsonl <->  receipts.cborseq     --seq: one receipt per line <-> CBOR sequence (RFC 8742)
+
+JSON output is canonical JSON (--indent for humans). --verify runs verify_receipt on
+every converted receipt.
+
+Usage:
+  python3 verify/receipt_convert.py <in | -> [-o out] [--to cbor|json] [--seq] [--verify] [--indent N]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from verify.canonical import canonical_bytes  # noqa: E402
+from verify.cbor import canonical_cbor, cbor_loads, iter_cbor_seq, looks_like_cbor  # noqa: E402
+from verify.verify_receipt import VerifyError, verify_receipt  # noqa: E402
+
+
+def _json_out(obj, indent) -> bytes:
+    if indent is None:
+        return canonical_bytes(obj)
+    return json.dumps(obj, sort_keys=True, indent=indent, ensure_ascii=False).encode("utf-8")
+
+
+def convert(data: bytes, to: str = "", seq: bool = False, indent=None):
+    """(converted bytes, decoded receipts)."""
+    src_cbor = looks_like_cbor(data)
+    to = to or ("json" if src_cbor else "cbor")
+
+    if seq:
+        if src_cbor:
+            items = list(iter_cbor_seq(data))
+        else:
+            items = [json.loads(line) for line in data.decode("utf-8").splitlines() if line.strip()]
+        if to == "cbor":
+            return b"".join(canonical_cbor(x) for x in items), items
+        return b"".join(canonical_bytes(x) + b"\n" for x in items), items
+
+    obj = cbor_loads(data) if src_cbor else json.loads(data)
+    items = obj if isinstance(obj, list) else [obj]
+    if to == "cbor":
+        return canonical_cbor(obj), items
+    out = _json_out(obj, indent)
+    return out + b"\n" if indent is not None else out, items
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Convert receipts between JSON and canonical CBOR.")
+    ap.add_argument("path", help="input file, or - for stdin")
+    ap.add_argument("-o", "--out", help="output file (default: stdout)")
+    ap.add_argument("--to", choices=("cbor", "json"), help="target encoding (default: the other one)")
+    ap.add_argument("--seq", action="store_true", help="JSONL <-> CBOR sequence")
+    ap.add_argument("--indent", type=int, help="pretty JSON output (not canonical)")
+    ap.add_argument("--verify", action="store_true", help="verify every receipt after conversion")
+    args = ap.parse_args()
+
+    data = sys.stdin.buffer.read() if args.path == "-" else Path(args.path).read_bytes()
+    try:
+        out, items = convert(data, args.to or "", args.seq, args.indent)
+    except (ValueError, TypeError) as e:
+        print(f"Cannot convert: {e}", file=sys.stderr)
+        return 2
+
+    if args.verify:
+        failed = 0
+        for i, receipt in enumerate(items):
+            try:
+                verify_receipt(receipt)
+            except VerifyError as e:
+                failed += 1
+                print(f"[{i}] {e.reason}: {e}", file=sys.stderr)
+        if failed:
+            print(f"{failed} of {len(items)} receipts do not verify", file=sys.stderr)
+            return 1
+
+    if args.out:
+        Path(args.out).write_bytes(out)
+    else:
+        sys.stdout.buffer.write(out)
+    print(f"{len(data)} -> {len(out)} bytes, {len(items)} receipt(s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
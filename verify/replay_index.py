@@ -0,0 +1,258 @@
+"""
+Replay / duplicate index for bulk verification (verify/bulk_verify.py --replay-index).
+
+Every valid receipt is recorded by (task_id, task_commit_sha256, signature) in an SQLite
+file, and by task_id with the first receipt's task_commit_sha256 and winner. A later
+receipt is flagged as:
+
+  replay               the same (task_id, task_commit_sha256, signature) seen at another source
+  conflicting_receipt  the same task_id with a different task_commit_sha256 or winner
+  duplicate_receipt    the same task_id, commit and winner, but another signature (re-signed)
+
+Seeing a receipt again at the same source (path:line, path[i]) is not a replay: that is
+an input being verified a second time.
+
+A Bloom filter over both keys sits in front of SQLite, so a new receipt (the common case)
+costs two filter probes and two inserts, no lookups. It is saved next to the database
+(<path>.bloom) on close() and only trusted after a clean close; otherwise it is rebuilt
+from the database. When it fills up it is rebuilt at twice the capacity. Memory stays
+bounded by the filter and SQLite's page cache, whatever the number of receipts.
+
+The sources table makes runs incremental: an input file that has not changed since it
+was indexed is skipped, and a .jsonl file that only grew is resumed after the last line
+already indexed.
+"""
+import json
+import math
+import os
+import sqlite3
+import struct
+from hashlib import sha256
+from typing import Dict, Optional, Sequence, Tuple
+
+REPLAY_REASONS = ("replay", "conflicting_receipt", "duplicate_receipt")
+
+_BLOOM_HEADER = struct.Struct(">8sQII")   # magic, bits, hashes, capacity
+BLOOM_MAGIC = b"R4RBLM01"
+DEFAULT_CAPACITY = 4_000_000
+FALSE_POSITIVE_RATE = 0.01
+COMMIT_EVERY = 10_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS receipts (rkey BLOB PRIMARY KEY, source TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tasks (
+    tkey BLOB PRIMARY KEY, task_commit_sha256 TEXT, winner TEXT, source TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, offset INTEGER, lines INTEGER
+) WITHOUT ROWID;
+"""
+
+
+def _key(prefix: bytes, parts: Sequence) -> bytes:
+    return sha256(prefix + json.dumps(list(parts), ensure_ascii=False).encode("utf-8")).digest()[:16]
+
+
+def receipt_key(task_id, task_commit_sha256, signature) -> bytes:
+    return _key(b"r:", (task_id, task_commit_sha256, signature))
+
+
+def task_key(task_id) -> bytes:
+    return _key(b"t:", (task_id,))
+
+
+class BloomFilter:
+    """m bits, k positions per key by double hashing over sha256(key)."""
+
+    def __init__(self, bits: int, hashes: int, capacity: int, data: Optional[bytearray] = None):
+        self.bits = bits
+        self.hashes = hashes
+        self.capacity = capacity
+        self.data = data if data is not None else bytearray((bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, fp_rate: float = FALSE_POSITIVE_RATE) -> "BloomFilter":
+        bits = max(64, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        hashes = max(1, round(bits / capacity * math.log(2)))
+        return cls(bits, hashes, capacity)
+
+    def _positions(self, key: bytes):
+        d = sha256(key).digest()
+        h1, h2 = int.from_bytes(d[:8], "big"), int.from_bytes(d[8:16], "big") | 1
+        m = self.bits
+        return [(h1 + i * h2) % m for i in range(self.hashes)]
+
+    def add(self, key: bytes) -> None:
+        data = self.data
+        for p in self._positions(key):
+            data[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key: bytes) -> bool:
+        data = self.data
+        return all(data[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_BLOOM_HEADER.pack(BLOOM_MAGIC, self.bits, self.hashes, self.capacity))
+            f.write(self.data)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BloomFilter"]:
+        try:
+            with open(path, "rb") as f:
+                magic, bits, hashes, capacity = _BLOOM_HEADER.unpack(f.read(_BLOOM_HEADER.size))
+                data = bytearray(f.read())
+        except (OSError, struct.error):
+            return None
+        if magic != BLOOM_MAGIC or len(data) != (bits + 7) // 8:
+            return None
+        return cls(bits, hashes, capacity, data)
+
+
+class ReplayIndex:
+    """See the module docstring. One writer at a time (the bulk verifier's main process)."""
+
+    def __init__(self, path: str, capacity: int = DEFAULT_CAPACITY):
+        self.path = path
+        self.bloom_path = path + ".bloom"
+        self.capacity = capacity
+        self.db: Optional[sqlite3.Connection] = None
+        self.bloom: Optional[BloomFilter] = None
+        self.entries = 0        # ключів у фільтрі (receipts + tasks)
+        self.pending = 0        # вставок з останнього commit
+        self.stats = {"indexed": 0, "bloom_negatives": 0, "lookups": 0, "already_indexed": 0,
+                      "bloom_rebuilds": 0, **{r: 0 for r in REPLAY_REASONS}}
+
+    # ---------- lifecycle ----------
+    def open(self) -> "ReplayIndex":
+        self.db = sqlite3.connect(self.path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+        self.entries = self._count("receipts") + self._count("tasks")
+        bloom = BloomFilter.load(self.bloom_path)
+        # фільтр без чистого close() міг пропустити вставки - йому не можна вірити
+        if os.path.exists(self.bloom_path):
+            os.remove(self.bloom_path)
+        if bloom is None or bloom.capacity < self.entries:
+            self._rebuild_bloom()
+        else:
+            self.bloom = bloom
+        self.db.execute("BEGIN")
+        return self
+
+    def close(self) -> None:
+        if self.db is None:
+            return
+        self.db.execute("COMMIT")
+        self.db.close()
+        self.db = None
+        self.bloom.save(self.bloom_path)
+
+    def _count(self, table: str) -> int:
+        return self.db.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+    def _rebuild_bloom(self) -> None:
+        capacity = self.capacity
+        while capacity < 2 * self.entries:
+            capacity *= 2
+        self.capacity = capacity
+        self.bloom = BloomFilter.for_capacity(capacity)
+        for (k,) in self.db.execute("SELECT rkey FROM receipts"):
+            self.bloom.add(k)
+        for (k,) in self.db.execute("SELECT tkey FROM tasks"):
+            self.bloom.add(k)
+        self.stats["bloom_rebuilds"] += 1
+
+    def _added(self, n: int) -> None:
+        self.entries += n
+        self.pending += n
+        if self.pending >= COMMIT_EVERY:
+            self.db.execute("COMMIT")
+            self.db.execute("BEGIN")
+            self.pending = 0
+        if self.entries > self.bloom.capacity:
+            self._rebuild_bloom()
+
+    # ---------- checks ----------
+    def check(self, source: str, task_id, task_commit_sha256, signature, winner) -> Optional[Tuple[str, str]]:
+        """Records a verified receipt; (reason, error) if it is a replay, conflict or duplicate."""
+        location = _location(source)
+        rkey = receipt_key(task_id, task_commit_sha256, signature)
+        if rkey in self.bloom:
+            self.stats["lookups"] += 1
+            row = self.db.execute("SELECT source FROM receipts WHERE rkey = ?", (rkey,)).fetchone()
+            if row is not None:
+                if location is not None and row[0] == location:
+                    self.stats["already_indexed"] += 1
+                    return None
+                self.stats["replay"] += 1
+                return "replay", f"Receipt already seen at {row[0]}"
+        else:
+            self.stats["bloom_negatives"] += 1
+
+        stored = location if location is not None else source
+        self.db.execute("INSERT INTO receipts (rkey, source) VALUES (?, ?)", (rkey, stored))
+        self.bloom.add(rkey)
+        self.stats["indexed"] += 1
+        added = 1
+
+        tkey = task_key(task_id)
+        first = None
+        if tkey in self.bloom:
+            self.stats["lookups"] += 1
+            first = self.db.execute(
+                "SELECT task_commit_sha256, winner, source FROM tasks WHERE tkey = ?", (tkey,)).fetchone()
+        if first is None:
+            self.db.execute("INSERT INTO tasks (tkey, task_commit_sha256, winner, source) VALUES (?, ?, ?, ?)",
+                            (tkey, task_commit_sha256, winner, stored))
+            self.bloom.add(tkey)
+            added += 1
+        self._added(added)
+        if first is None:
+            return None
+
+        commit0, winner0, source0 = first
+        if commit0 != task_commit_sha256:
+            self.stats["conflicting_receipt"] += 1
+            return "conflicting_receipt", f"task_id {task_id!r} has a receipt with another task_commit_sha256 at {source0}"
+        if winner0 != winner:
+            self.stats["conflicting_receipt"] += 1
+            return "conflicting_receipt", f"task_id {task_id!r} has a receipt with winner {winner0!r} at {source0}"
+        self.stats["duplicate_receipt"] += 1
+        return "duplicate_receipt", f"task_id {task_id!r} already has a receipt at {source0}"
+
+    # ---------- incremental runs ----------
+    def source_state(self, path: str) -> Optional[Tuple[int, int, int, int]]:
+        """(size, mtime_ns, offset, lines) recorded for path, or None."""
+        return self.db.execute("SELECT size, mtime_ns, offset, lines FROM sources WHERE path = ?",
+                               (os.path.abspath(path),)).fetchone()
+
+    def mark_sources(self, states: Dict[str, Tuple[int, int, int, int]]) -> None:
+        self.db.executemany(
+            "INSERT OR REPLACE INTO sources (path, size, mtime_ns, offset, lines) VALUES (?, ?, ?, ?, ?)",
+            [(os.path.abspath(p), *st) for p, st in states.items()])
+
+    def summary(self) -> dict:
+        return {
+            "receipts": self._count("receipts"),
+            "tasks": self._count("tasks"),
+            "bloom_bits": self.bloom.bits,
+            "bloom_capacity": self.bloom.capacity,
+            **self.stats,
+        }
+
+
+def _location(source: str) -> Optional[str]:
+    # stdin не має сталого місця: повторний прогін того самого потоку - це replay
+    if source.startswith("<stdin>"):
+        return None
+    return os.path.abspath(source)
+
+
+def receipt_identity(receipt: dict) -> list:
+    """What ReplayIndex.check needs from a verified receipt (small enough to ship from a worker)."""
+    return [receipt.get("task_id"), receipt.get("task_commit_sha256"), receipt.get("signature"), receipt.get("winner")]
+
@@ -0,0 +1,194 @@
+"""
+Winner selection rules shared by the server (app/) and the verifier (verify/).
+
+uniform:  idx = int(task_commit_sha256, 16) % n
+weighted: Vose alias table over non-negative integer weights (exact integer
+          arithmetic, no floats), sampled in O(1) from the same integer:
+            r = int(task_commit_sha256, 16)
+            col = r % n
+            u = (r // n) % W          # W = sum(weights)
+            idx = col if u < prob[col] else alias[col]
+k-of-n:   k distinct indices via a sparse partial Fisher-Yates shuffle driven by
+          a sha256 counter stream over the commit (see sample_k_indices)
+
+Epoch beacon receipts (epoch + re4ctor_random) draw from epoch_draw_sha256 instead of
+task_commit_sha256, with the same rules.
+
+allocation_rule names the rule version that picked a receipt's winner:
+  commit-v0        the rules above over task_commit_sha256 (POST /allocate)
+  vrf-sha256-v0    uniform only: idx = int(sha256(commit_hex "|" vrf_random)[:8]) % n
+                   (demo/run_lottery.py)
+  epoch-beacon-v0  the rules above over epoch_draw_sha256 (demo/epoch_lottery.py)
+"""
+from hashlib import sha256
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from verify.canonical import canonical_sha256
+
+
+ALLOCATION_MODES = ("uniform", "weighted")
+
+MULTI_WINNER_DOMAIN = b"re4ctor:alloc:multi:v0"
+ALLOC_DOMAIN = b"re4ctor:alloc:v0"
+
+RULE_COMMIT = "commit-v0"
+RULE_VRF_SHA256 = "vrf-sha256-v0"
+RULE_EPOCH = "epoch-beacon-v0"
+ALLOCATION_RULES = (RULE_COMMIT, RULE_VRF_SHA256, RULE_EPOCH)
+
+
+def pick_uniform_index(task_commit_sha256: str, n: int) -> int:
+    return int(task_commit_sha256, 16) % n
+
+
+def vrf_sha256_index(task_commit_sha256: str, vrf_random: str, n: int) -> int:
+    """vrf-sha256-v0: first 8 bytes of sha256(commit_hex || "|" || vrf_random), big-endian, mod n."""
+    digest = sha256(f"{task_commit_sha256}|{vrf_random}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % n
+
+
+def check_rule_shape(rule: str, epoch: bool, uniform_single: bool) -> None:
+    """ValueError when a receipt of this shape cannot come from rule (rule is in ALLOCATION_RULES)."""
+    if (rule == RULE_EPOCH) != epoch:
+        raise ValueError(f"allocation_rule {RULE_EPOCH} goes with epoch receipts, and only with them")
+    if rule == RULE_VRF_SHA256 and not uniform_single:
+        raise ValueError(f"allocation_rule {RULE_VRF_SHA256} is uniform single-winner only")
+
+
+def rule_uniform_index(rule: str, source: str, n: int, vrf_random: Optional[str] = None) -> int:
+    """Uniform single-winner index under rule; source is the commit (or the epoch draw)."""
+    if rule == RULE_VRF_SHA256:
+        if not isinstance(vrf_random, str) or not vrf_random:
+            raise ValueError(f"allocation_rule {RULE_VRF_SHA256} needs re4ctor_random")
+        return vrf_sha256_index(source, vrf_random, n)
+    if rule in (RULE_COMMIT, RULE_EPOCH):
+        return pick_uniform_index(source, n)
+    raise ValueError(f"Unknown allocation_rule: {rule!r}")
+
+
+def _check_hex(task_commit_sha256) -> None:
+    # той самий формат, що й для uniform; не-рядок (5, None) - ValueError, а не TypeError з int()
+    if not isinstance(task_commit_sha256, str):
+        raise ValueError("task_commit_sha256 must be a hex string")
+    int(task_commit_sha256, 16)
+
+
+def epoch_seed(task_commit_sha256: str, epoch: str) -> bytes:
+    """seed = sha256("re4ctor:alloc:v0" || "|" || commit_hex || "|" || epoch) (docs/protocol.md, step 2)."""
+    _check_hex(task_commit_sha256)
+    return sha256(ALLOC_DOMAIN + b"|" + task_commit_sha256.lower().encode("ascii") + b"|"
+                  + epoch.encode("utf-8")).digest()
+
+
+def epoch_draw_sha256(task_commit_sha256: str, epoch: str, beacon_random: str) -> str:
+    """
+    Per-task draw in epoch beacon mode, hex: sha256(seed || "|" || beacon_random), where
+    beacon_random is the epoch's VRF random as the VRF returned it.
+    """
+    return sha256(epoch_seed(task_commit_sha256, epoch) + b"|" + beacon_random.encode("utf-8")).hexdigest()
+
+
+def weights_sha256(weights: Sequence[int]) -> str:
+    return canonical_sha256(list(weights)).hex()
+
+
+def check_weights(weights, n: int) -> List[int]:
+    if not isinstance(weights, (list, tuple)) or len(weights) != n:
+        raise ValueError(f"weights must be a list of {n} integers (one per candidate)")
+    for w in weights:
+        if type(w) is not int or w < 0:
+            raise ValueError("weights must be non-negative integers")
+    if not any(weights):
+        raise ValueError("at least one weight must be positive")
+    return list(weights)
+
+
+class AliasTable:
+    """
+    Vose alias table with integer probabilities: column i keeps itself with
+    probability prob[i] / total, otherwise yields alias[i]. P(i) == weights[i] / total exactly.
+    """
+
+    __slots__ = ("n", "total", "prob", "alias")
+
+    def __init__(self, n: int, total: int, prob: List[int], alias: List[int]):
+        self.n = n
+        self.total = total
+        self.prob = prob
+        self.alias = alias
+
+    @classmethod
+    def build(cls, weights: Sequence[int]) -> "AliasTable":
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n for w in weights]
+        prob = [total] * n
+        alias = list(range(n))
+
+        # стеки обробляються у фіксованому порядку - таблиця має бути однаковою у сервера й верифікатора
+        small = [i for i in range(n) if scaled[i] < total]
+        large = [i for i in range(n) if scaled[i] >= total]
+        while small and large:
+            s = small.pop()
+            g = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = g
+            scaled[g] = scaled[g] + scaled[s] - total
+            if scaled[g] < total:
+                small.append(g)
+            else:
+                large.append(g)
+        # що лишилось, має рівно total - колонка без alias
+        for i in small + large:
+            prob[i] = total
+            alias[i] = i
+        return cls(n, total, prob, alias)
+
+    def pick_index(self, task_commit_sha256: str) -> int:
+        r = int(task_commit_sha256, 16)
+        col = r % self.n
+        u = (r // self.n) % self.total
+        return col if u < self.prob[col] else self.alias[col]
+
+
+def commit_stream(task_commit_sha256: str, domain: bytes = MULTI_WINNER_DOMAIN) -> Iterator[int]:
+    """
+    64-bit words from sha256(domain || "|" || commit_hex || "|" || counter_be32), counter = 0, 1, ...
+    """
+    prefix = domain + b"|" + task_commit_sha256.lower().encode("ascii") + b"|"
+    counter = 0
+    while True:
+        block = sha256(prefix + counter.to_bytes(4, "big")).digest()
+        for i in range(0, 32, 8):
+            yield int.from_bytes(block[i:i + 8], "big")
+        counter += 1
+
+
+def _below(stream: Iterator[int], m: int) -> int:
+    # без modulo bias: відкидаємо хвіст 2^64 % m
+    limit = (1 << 64) - ((1 << 64) % m)
+    while True:
+        x = next(stream)
+        if x < limit:
+            return x % m
+
+
+def sample_k_indices(task_commit_sha256: str, n: int, k: int) -> List[int]:
+    """
+    k distinct indices out of range(n), in draw order. Partial Fisher-Yates where the
+    swapped positions live in a dict, so time and memory are O(k) regardless of n:
+      for i in 0..k-1: j = i + below(n - i); swap(pos[i], pos[j]); take pos[i]
+    """
+    if not 1 <= k <= n:
+        raise ValueError(f"winners must be between 1 and {n}")
+    _check_hex(task_commit_sha256)
+    stream = commit_stream(task_commit_sha256)
+    swapped: Dict[int, int] = {}
+    out = []
+    for i in range(k):
+        j = i + _below(stream, n - i)
+        vi = swapped.get(i, i)
+        vj = swapped.get(j, j)
+        swapped[j] = vi
+        out.append(vj)
+    return out
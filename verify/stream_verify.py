@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Streaming, bounded-memory verification for receipts with huge candidate lists.
+
+Same rules, reason codes and output as verify/verify_receipt.py (check_receipt is
+shared), but the receipt is parsed incrementally from the file:
+  - "candidates" is tokenized in batches and never held in memory as a whole; sort
+    order is checked per batch and across batch boundaries in one linear pass
+  - every other field is small and is decoded as usual
+  - the canonical bytes of the unsigned receipt go straight into sha256
+
+Pass 1 reads the file once. If "winner" is already known when "candidates" starts and
+no key that sorts before "candidates" appears after it, membership and hashing happen
+in pass 1 too. Otherwise (e.g. "winner" after "candidates", or weighted / k-of-n picks
+that need n first) the file is read a second time; stdin is spooled to a temp file.
+
+Memory is O(read buffer + small fields). Weighted receipts also keep their weights
+list: the alias table needs all of it.
+
+Usage:
+  python3 verify/stream_verify.py <receipt.json | -> [--stats]
+"""
+import argparse
+import codecs
+import json
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from hashlib import sha256
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from verify.canonical import canonical_bytes  # noqa: E402
+from verify.cbor import canonical_cbor, cbor_head, cbor_key_order, iter_canonical_cbor_items  # noqa: E402
+from verify.verify_receipt import SIGNATURE_FIELDS, CompactCandidates, VerifyError, check_receipt, print_summary  # noqa: E402
+
+READ_CHUNK = 1 << 20
+
+_WS = re.compile(r"[ \t\n\r]*")
+# ряд повних рядків-елементів масиву, кожен з комою після нього
+_STR_RUN = re.compile(r'(?:[ \t\n\r]*"[^"\\]*(?:\\.[^"\\]*)*"[ \t\n\r]*,)+')
+_DECODER = json.JSONDecoder()
+
+
+class _Source:
+    """Text over a binary file, decoded incrementally; keeps only the unread tail in memory."""
+
+    def __init__(self, fp: BinaryIO):
+        self.fp = fp
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, at_least: int = 0) -> bool:
+        if self.eof:
+            return False
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        data = self.fp.read(max(READ_CHUNK, at_least))
+        try:
+            self.buf += self.decoder.decode(data, final=not data)
+        except UnicodeDecodeError as e:
+            raise VerifyError("bad_json", f"receipt is not valid UTF-8: {e}")
+        if not data:
+            self.eof = True
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at end of input)."""
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise VerifyError("bad_json", f"expected {ch!r} at char {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buf, self.pos)
+                # значення, що впирається в кінець буфера, може бути обрізаним числом
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise VerifyError("bad_json", str(e))
+            # зростаємо геометрично: великий weights розбирається за O(n), а не O(n^2)
+            self.fill(len(self.buf) - self.pos)
+
+
+def _candidate_batches(src: _Source):
+    """
+    Lists of array items, in order. Strings come in large batches, anything else one at a
+    time. A value that is not an array is consumed and reported as a single None.
+    """
+    if src.peek() != "[":
+        src.value()
+        yield None
+        return
+    src.pos += 1
+    if src.peek() == "]":
+        src.pos += 1
+        return
+    while True:
+        m = _STR_RUN.match(src.buf, src.pos)
+        if m:
+            try:
+                yield json.loads("[" + src.buf[src.pos:m.end() - 1] + "]")
+            except json.JSONDecodeError as e:
+                raise VerifyError("bad_json", f"candidates: {e}")
+            src.pos = m.end()
+            continue
+        # останній елемент, не-рядок або елемент на межі буфера
+        yield [src.value()]
+        c = src.peek()
+        src.pos += 1
+        if c == "]":
+            return
+        if c != ",":
+            raise VerifyError("bad_json", "expected ',' or ']' in candidates")
+
+
+def _entry(key: str, value) -> bytes:
+    return json.dumps(key, ensure_ascii=False).encode("utf-8") + b":" + canonical_bytes(value)
+
+
+def _encode_batch(batch: list) -> bytes:
+    return canonical_bytes(batch)[1:-1]
+
+
+class StreamCandidates:
+    """CandidateList interface (see verify_receipt.py) over a receipt file."""
+
+    def __init__(self, fp: BinaryIO):
+        if not fp.seekable():
+            spool = tempfile.TemporaryFile()
+            shutil.copyfileobj(fp, spool, READ_CHUNK)
+            spool.seek(0)
+            fp = spool
+        self.fp = fp
+        self.start = fp.tell()
+        self.passes = 0
+        self.n = 0
+        self._str_list = True
+        self._sorted = True
+        self._last: Optional[str] = None
+        self._fields: Dict[str, object] = {}
+        self._member: Optional[bool] = None
+        self._picked: Dict[int, object] = {}
+        self._hasher = None  # спекулятивний sha256 з першого проходу
+        self._digest: Optional[bytes] = None
+
+    # ---------- parsing ----------
+    def _parse(self, on_candidates: Callable[[_Source], None]) -> List[str]:
+        """One pass over the file; returns the top-level keys seen after "candidates"."""
+        self.passes += 1
+        self.fp.seek(self.start)
+        src = _Source(self.fp)
+        c = src.peek()
+        if c != "{":
+            if c == "":
+                raise VerifyError("bad_json", "empty input")
+            raise VerifyError("invalid_receipt", "receipt must be a JSON object")
+        src.pos += 1
+        seen_candidates = False
+        after: List[str] = []
+        if src.peek() == "}":
+            src.pos += 1
+        else:
+            while True:
+                key = src.value()
+                if not isinstance(key, str):
+                    raise VerifyError("bad_json", "object keys must be strings")
+                src.expect(":")
+                if key == "candidates":
+                    if seen_candidates:
+                        raise VerifyError("invalid_receipt", "duplicate candidates field")
+                    seen_candidates = True
+                    on_candidates(src)
+                else:
+                    value = src.value()
+                    if self.passes == 1:
+                        self._fields[key] = value
+                    if seen_candidates:
+                        after.append(key)
+                c = src.peek()
+                src.pos += 1
+                if c == "}":
+                    break
+                if c != ",":
+                    raise VerifyError("bad_json", "expected ',' or '}' in receipt")
+        if src.peek() != "":
+            raise VerifyError("bad_json", "extra data after receipt")
+        if seen_candidates and self.passes == 1:
+            self._fields["candidates"] = self
+        return after
+
+    def parse(self) -> dict:
+        """Pass 1: returns the receipt with this object standing in for "candidates"."""
+        after = self._parse(self._first_pass)
+        if self._hasher is not None and any(k < "candidates" and k not in SIGNATURE_FIELDS for k in after):
+            self._hasher = None
+        return self._fields
+
+    def _head(self) -> "sha256":
+        h = sha256(b"{")
+        for k in sorted(k for k in self._fields if k < "candidates" and k not in SIGNATURE_FIELDS):
+            h.update(_entry(k, self._fields[k]) + b",")
+        h.update(b'"candidates":[')
+        return h
+
+    def _first_pass(self, src: _Source) -> None:
+        winner = self._fields.get("winner")
+        track = "winner" in self._fields
+        if track:
+            self._member = False
+            self._hasher = self._head()
+        first = True
+        for batch in _candidate_batches(src):
+            self._check_batch(batch)
+            if track and batch is not None:
+                if not self._member and winner in batch:
+                    self._member = True
+                if batch:
+                    self._hasher.update(_encode_batch(batch) if first else b"," + _encode_batch(batch))
+                    first = False
+        if track:
+            self._hasher.update(b"]")
+
+    def _check_batch(self, batch: Optional[list]) -> None:
+        if batch is None:
+            self._str_list = False
+            return
+        if not batch:
+            return
+        self.n += len(batch)
+        if not self._str_list:
+            return
+        if not all(map(str.__instancecheck__, batch)):
+            self._str_list = False
+            return
+        if self._sorted:
+            if (self._last is not None and self._last > batch[0]) or batch != sorted(batch):
+                self._sorted = False
+            self._last = batch[-1]
+
+    def _second_pass(self, winner, indices: List[int], want_digest: bool) -> None:
+        want = sorted(set(i for i in indices if 0 <= i < self.n and i not in self._picked))
+        need_member = self._member is None
+        h = self._head() if want_digest else None
+        member = False
+
+        def on_candidates(src: _Source) -> None:
+            nonlocal member
+            offset = 0
+            w = 0
+            first = True
+            for batch in _candidate_batches(src):
+                if batch is None:
+                    continue
+                if need_member and not member and winner in batch:
+                    member = True
+                end = offset + len(batch)
+                while w < len(want) and want[w] < end:
+                    self._picked[want[w]] = batch[want[w] - offset]
+                    w += 1
+                if h is not None and batch:
+                    h.update(_encode_batch(batch) if first else b"," + _encode_batch(batch))
+                    first = False
+                offset = end
+            if h is not None:
+                h.update(b"]")
+
+        self._parse(on_candidates)
+        if need_member:
+            self._member = member
+        if h is not None:
+            self._hasher = h
+
+    # ---------- CandidateList interface ----------
+    def is_str_list(self) -> bool:
+        return self._str_list
+
+    def is_sorted(self) -> bool:
+        return self._sorted
+
+    def prefetch(self, winner, planned_indices) -> None:
+        indices = planned_indices()
+        if self._member is None or any(i not in self._picked for i in indices):
+            self._second_pass(winner, indices, want_digest=self._hasher is None)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __contains__(self, item) -> bool:
+        if self._member is None:
+            self._second_pass(item, [], want_digest=self._hasher is None)
+        return self._member
+
+    def __getitem__(self, i: int):
+        if not 0 <= i < self.n:
+            raise IndexError(i)
+        if i not in self._picked:
+            self._second_pass(None, [i], want_digest=False)
+        return self._picked[i]
+
+    def unsigned_digest(self, unsigned: dict, encoding: str = "json") -> bytes:
+        if encoding == "cbor":
+            return self._cbor_digest(unsigned)
+        if self._digest is None:
+            if self._hasher is None:
+                self._second_pass(None, [], want_digest=True)
+            h = self._hasher.copy()
+            for k in sorted(k for k in unsigned if k > "candidates"):
+                h.update(b"," + _entry(k, unsigned[k]))
+            h.update(b"}")
+            self._digest = h.digest()
+        return self._digest
+
+    def _cbor_digest(self, unsigned: dict) -> bytes:
+        # канонічний CBOR: довжина масиву йде першою, тож потрібен n з першого проходу і ще один прохід
+        keys = cbor_key_order(unsigned)
+        at = keys.index("candidates")
+        h = sha256(cbor_head(5, len(keys)))
+        for k in keys[:at]:
+            h.update(canonical_cbor(k) + canonical_cbor(unsigned[k]))
+        h.update(canonical_cbor("candidates") + cbor_head(4, self.n))
+
+        def on_candidates(src: _Source) -> None:
+            for batch in _candidate_batches(src):
+                if batch:
+                    for piece in iter_canonical_cbor_items(batch):
+                        h.update(piece)
+
+        self._parse(on_candidates)
+        for k in keys[at + 1:]:
+            h.update(canonical_cbor(k) + canonical_cbor(unsigned[k]))
+        return h.digest()
+
+
+def verify_receipt_stream(fp: BinaryIO) -> dict:
+    """verify_receipt for a receipt read from a binary file object, in bounded memory."""
+    cands = StreamCandidates(fp)
+    return check_parsed(cands.parse(), cands)
+
+
+def check_parsed(receipt: dict, cands: StreamCandidates) -> dict:
+    """check_receipt for the fields returned by cands.parse()."""
+    # компактний receipt (candidates_root) не має списку - перевіряється доказами, як у verify_receipt
+    if "candidates_root" in receipt:
+        return check_receipt(receipt, CompactCandidates(receipt))
+    return check_receipt(receipt, cands)
+
+
+def verify_receipt_file(path: str) -> dict:
+    with open(path, "rb") as fp:
+        return verify_receipt_stream(fp)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("path", help="receipt JSON file, or - for stdin")
+    ap.add_argument("--stats", action="store_true", help="print passes, candidates, time and peak RSS to stderr")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    fp = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    cands = StreamCandidates(fp)
+    try:
+        summary = check_parsed(cands.parse(), cands)
+    finally:
+        if args.stats:
+            print(json.dumps({
+                "passes": cands.passes,
+                "candidates": cands.n,
+                "seconds": round(time.perf_counter() - t0, 3),
+                "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            }), file=sys.stderr)
+    print_summary(summary)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,31 @@
+"""
+Task commit layout (docs/protocol.md, step 1), shared by demo/make_task_commit.py,
+demo/bulk_commit.py and verify/verify_reveals.py:
+
+  task_commit_sha256 = sha256(f"{task_id}||{description}||{reward}||{nonce_hex}")
+
+Fields are formatted with Python str() of the JSON value (a missing field is ""), so a
+reward of 2 and 2.0 commit differently; keep rewards integers or strings. nonce_hex is
+32 random bytes as lowercase hex.
+"""
+import os
+from hashlib import sha256
+
+# що лишається секретом до reveal: у публічний commit не потрапляє
+SECRET_FIELDS = ("description", "reward", "nonce_hex")
+REVEAL_FIELDS = ("task_id", "description", "reward", "nonce_hex", "task_commit_sha256")
+NONCE_BYTES = 32
+
+
+def new_nonce() -> str:
+    return os.urandom(NONCE_BYTES).hex()
+
+
+def task_commit_sha256(task_id, description, reward, nonce_hex: str) -> str:
+    payload = f"{task_id}||{description}||{reward}"
+    return sha256((payload + "||" + nonce_hex).encode("utf-8")).hexdigest()
+
+
+def commit_of(task: dict, nonce_hex: str) -> str:
+    """task_commit_sha256 for a task dict (missing description / reward count as "")."""
+    return task_commit_sha256(task.get("task_id", ""), task.get("description", ""), task.get("reward", ""), nonce_hex)
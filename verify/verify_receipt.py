@@ -1,68 +1,420 @@
 import json
+import os
 import sys
-from hashlib import sha256
+from functools import lru_cache
+from pathlib import Path
+from cryptography.exceptions import InvalidSignature
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from verify.canonical import canonical_sha256  # noqa: E402
+from verify.cbor import CBOR_SIGNATURE_SCHEME, canonical_cbor_sha256, cbor_loads, looks_like_cbor  # noqa: E402
+from verify.merkle import CANDIDATES_FIELDS, MERKLE_FIELDS, MERKLE_SIGNATURE_SCHEME, root_from_path  # noqa: E402
+from verify.selection import (  # noqa: E402
+    ALLOCATION_RULES, RULE_EPOCH, AliasTable, check_rule_shape, check_weights, epoch_draw_sha256, rule_uniform_index,
+    sample_k_indices, weights_sha256,
+)
+from verify.vrf_ecdsa import MSG_BINDING, VrfSignatureError, check_vrf_signature, trusted_signers_from_env  # noqa: E402
 
-def canonical_bytes(obj) -> bytes:
-    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
 
+# розібрані Ed25519PublicKey за signer_pubkey_hex: підписантів мало, receipts - мільйони
+PUBKEY_CACHE_SIZE = int(os.getenv("VERIFY_PUBKEY_CACHE", "1024"))
 
-if len(sys.argv) != 2:
-    raise SystemExit("Usage: python3 verify/verify_receipt.py <path_to_receipt.json>")
 
-path = sys.argv[1]
-receipt = json.load(open(path, "r", encoding="utf-8"))
+@lru_cache(maxsize=PUBKEY_CACHE_SIZE)
+def load_public_key(pk_hex: str) -> Ed25519PublicKey:
+    return Ed25519PublicKey.from_public_bytes(bytes.fromhex(pk_hex))
 
-required = ["task_id", "task_commit_sha256", "candidate_order", "candidates", "winner", "timestamp"]
-for k in required:
-    if k not in receipt:
-        raise Exception(f"Missing field: {k}")
 
-order = receipt.get("candidate_order")
-if order not in ("as-listed", "lexicographic"):
-    raise Exception(f"Unsupported candidate_order: {order!r}")
+# перевірені (pubkey, root, signature): усі receipts одного Merkle-батчу - одна перевірка підпису
+ROOT_CACHE_SIZE = int(os.getenv("VERIFY_ROOT_CACHE", "4096"))
 
-cands = receipt["candidates"]
-if not isinstance(cands, list) or not all(isinstance(x, str) for x in cands):
-    raise Exception("candidates must be a list[str]")
 
-if order == "lexicographic":
-    if cands != sorted(cands):
-        raise Exception("Candidates not lexicographically sorted")
+@lru_cache(maxsize=ROOT_CACHE_SIZE)
+def root_signature_ok(pk_hex: str, root_hex: str, sig_hex: str) -> bool:
+    try:
+        load_public_key(pk_hex).verify(bytes.fromhex(sig_hex), bytes.fromhex(root_hex))
+        return True
+    except (InvalidSignature, TypeError, ValueError):
+        return False
 
-winner = receipt["winner"]
-if winner not in cands:
-    raise Exception("Winner is not in candidates list")
 
-# Fail-closed: receipt with upstream error is invalid
-if receipt.get("re4ctor_error"):
-    raise Exception(f"Receipt has re4ctor_error: {receipt['re4ctor_error']}")
+# довірені адреси VRF signer (VRF_SIGNERS); порожньо - re4ctor_signature не перевіряється
+VRF_SIGNERS = trusted_signers_from_env()
 
-# Signature verification (required)
-sig = receipt.get("signature")
-pk_hex = receipt.get("signer_pubkey_hex")
-scheme = receipt.get("signature_scheme")
 
-if not (sig and pk_hex and scheme):
-    raise Exception("Missing required signature fields: signature, signer_pubkey_hex, signature_scheme")
+def configure_vrf_signers(spec: str) -> None:
+    """Sets the VRF signer allowlist (VRF_SIGNERS syntax) for this process and the workers it starts."""
+    global VRF_SIGNERS
+    os.environ["VRF_SIGNERS"] = spec
+    VRF_SIGNERS = trusted_signers_from_env()
 
-if scheme != "ed25519(sha256(canonical_json))":
-    raise Exception(f"Unsupported signature_scheme: {scheme!r}")
 
-unsigned = dict(receipt)
-unsigned.pop("signature", None)
-unsigned.pop("signer_pubkey_hex", None)
-unsigned.pop("signature_scheme", None)
+class VerifyError(Exception):
+    """A receipt failed verification; reason is a stable machine-readable code."""
 
-msg = canonical_bytes(unsigned)
-msg_hash = sha256(msg).digest()
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
 
-pk = Ed25519PublicKey.from_public_bytes(bytes.fromhex(pk_hex))
-pk.verify(bytes.fromhex(sig), msg_hash)
 
-print("OK: receipt valid")
-print("task_id:", receipt["task_id"])
-print("candidate_order:", order)
-print("winner:", winner)
-print("signature: ok")
+SIGNATURE_SCHEME = "ed25519(sha256(canonical_json))"
+SIGNATURE_FIELDS = ("signature", "signer_pubkey_hex", "signature_scheme") + MERKLE_FIELDS
+SUPPORTED_SCHEMES = (SIGNATURE_SCHEME, CBOR_SIGNATURE_SCHEME, MERKLE_SIGNATURE_SCHEME)
+
+
+def load_receipt_bytes(data: bytes):
+    """A receipt from JSON or canonical CBOR bytes (sniffed); VerifyError("bad_json") if neither parses."""
+    try:
+        if looks_like_cbor(data):
+            return cbor_loads(data)
+        return json.loads(data)
+    except ValueError as e:
+        raise VerifyError("bad_json", f"receipt is neither JSON nor CBOR: {e}")
+
+
+class CandidateList:
+    """
+    The candidates of an in-memory receipt, as seen by check_receipt.
+    verify/stream_verify.py provides the same interface over a file, without loading the list.
+    """
+
+    def __init__(self, cands):
+        self.cands = cands
+
+    def is_str_list(self) -> bool:
+        return isinstance(self.cands, list) and all(isinstance(x, str) for x in self.cands)
+
+    def is_sorted(self) -> bool:
+        return self.cands == sorted(self.cands)
+
+    def prefetch(self, winner, planned_indices) -> None:
+        """Hint: membership of winner and cands[i] for planned_indices() are about to be read."""
+
+    def __len__(self) -> int:
+        return len(self.cands)
+
+    def __contains__(self, item) -> bool:
+        return item in self.cands
+
+    def __getitem__(self, i: int) -> str:
+        return self.cands[i]
+
+    def unsigned_digest(self, unsigned: dict, encoding: str = "json") -> bytes:
+        try:
+            if encoding == "cbor":
+                return canonical_cbor_sha256(unsigned)
+            return canonical_sha256(unsigned)
+        except UnicodeEncodeError as e:
+            # напр. самотній сурогат "\ud800" з JSON: у канонічний UTF-8 його не закодувати
+            raise VerifyError("invalid_receipt", f"Receipt is not encodable as UTF-8: {e}")
+
+
+class CompactCandidates(CandidateList):
+    """
+    The candidates of a compact receipt (docs/protocol.md, 4b): candidates_root,
+    candidates_count and inclusion proofs for the drawn positions instead of the list.
+    Membership and cands[i] come from the proofs, O(log n) each. The sorted order is
+    vouched for by the signature; recomputing candidates_root from the full list (e.g.
+    GET /candidate-sets/{candidate_set_id}) checks it.
+    """
+
+    def __init__(self, receipt: dict):
+        super().__init__(None)
+        self.receipt = receipt
+        # index -> agent_id, перевірені доказами (будується при першому зверненні)
+        self._proven = None
+
+    def is_str_list(self) -> bool:
+        root, n = self.receipt.get("candidates_root"), self.receipt.get("candidates_count")
+        if not isinstance(root, str) or len(root) != 64:
+            raise VerifyError("invalid_receipt", "candidates_root must be 64 hex chars")
+        if type(n) is not int or n < 1:
+            raise VerifyError("invalid_receipt", "candidates_count must be a positive integer")
+        return True
+
+    def is_sorted(self) -> bool:
+        return True
+
+    def __len__(self) -> int:
+        return self.receipt["candidates_count"]
+
+    def __contains__(self, item) -> bool:
+        return item in self.proven().values()
+
+    def __getitem__(self, i: int) -> str:
+        proven = self.proven()
+        if i not in proven:
+            raise VerifyError("bad_candidates_proof", f"No inclusion proof for candidate index {i}")
+        return proven[i]
+
+    def proven(self) -> dict:
+        if self._proven is None:
+            r = self.receipt
+            entries = [(r["winner_index"], r["winner"], r["winner_proof"])]
+            winners = r.get("winners")
+            if isinstance(winners, list) and winners:
+                # k-of-n: позиції переможців задає сам розіграш, доказ - на кожного
+                paths = r.get("winners_proof")
+                if not isinstance(paths, list) or len(paths) != len(winners):
+                    raise VerifyError("bad_candidates_proof", "winners_proof must hold one proof per winner")
+                try:
+                    indices = sample_k_indices(draw_source(r), len(self), len(winners))
+                except (TypeError, ValueError) as e:
+                    raise VerifyError("invalid_receipt", str(e))
+                if r["winner_index"] != indices[0]:
+                    raise VerifyError("bad_candidates_proof", "winner_index does not match the k-of-n draw")
+                entries.extend(zip(indices, winners, paths))
+            self._proven = {}
+            for index, agent, path in entries:
+                self._proven[index] = self._check_proof(index, agent, path)
+        return self._proven
+
+    def _check_proof(self, index, agent, path) -> str:
+        root_hex = self.receipt["candidates_root"]
+        try:
+            if type(index) is not int or not isinstance(agent, str) or not isinstance(path, list):
+                raise ValueError("winner_index must be an integer, proofs lists of hex strings")
+            root = root_from_path(agent.encode("utf-8"), index, len(self), [bytes.fromhex(p) for p in path])
+        except (TypeError, ValueError) as e:
+            raise VerifyError("bad_candidates_proof", f"Malformed candidates proof: {e}")
+        if root.hex() != root_hex.lower():
+            raise VerifyError("bad_candidates_proof",
+                              f"Proof for {agent!r} at index {index} does not lead to candidates_root")
+        return agent
+
+
+def receipt_candidates(receipt: dict) -> CandidateList:
+    """CandidateList for the full form, CompactCandidates when the receipt carries candidates_root."""
+    if "candidates_root" in receipt:
+        return CompactCandidates(receipt)
+    return CandidateList(receipt.get("candidates"))
+
+
+def draw_source(receipt: dict) -> str:
+    """
+    The hex the selection rules draw from: task_commit_sha256, or for an epoch beacon
+    receipt (epoch + re4ctor_random) the per-task epoch draw (docs/protocol.md, 2a).
+    """
+    if "epoch" not in receipt:
+        return receipt["task_commit_sha256"]
+    epoch, beacon = receipt["epoch"], receipt.get("re4ctor_random")
+    if not isinstance(epoch, str) or not epoch:
+        raise VerifyError("invalid_receipt", "epoch must be a non-empty string")
+    if not isinstance(beacon, str) or not beacon:
+        raise VerifyError("invalid_receipt", "an epoch receipt needs the epoch beacon in re4ctor_random")
+    try:
+        return epoch_draw_sha256(receipt["task_commit_sha256"], epoch, beacon)
+    except (AttributeError, TypeError, ValueError):
+        raise VerifyError("invalid_receipt", "task_commit_sha256 must be hex")
+
+
+def planned_indices(receipt: dict, n: int) -> list:
+    """Candidate indices the weighted / k-of-n / epoch rules will look up (best effort, never raises)."""
+    out = []
+    try:
+        source = draw_source(receipt)
+        winners = receipt.get("winners")
+        if receipt.get("allocation_mode", "uniform") == "weighted":
+            weights = check_weights(receipt.get("weights"), n)
+            out.append(AliasTable.build(weights).pick_index(source))
+        elif not winners and ("epoch" in receipt or "allocation_rule" in receipt):
+            out.append(rule_uniform_index(receipt.get("allocation_rule") or RULE_EPOCH, source, n,
+                                          receipt.get("re4ctor_random")))
+        if isinstance(winners, list) and winners:
+            out.extend(sample_k_indices(source, n, len(winners)))
+    except (TypeError, ValueError, VerifyError):
+        pass
+    return out
+
+
+def verify_receipt(receipt: dict) -> dict:
+    """Raises VerifyError on the first problem; returns a short summary for a valid receipt."""
+    if not isinstance(receipt, dict):
+        raise VerifyError("invalid_receipt", "receipt must be a JSON object")
+    return check_receipt(receipt, receipt_candidates(receipt))
+
+
+def check_receipt(receipt: dict, cands) -> dict:
+    """The verification rules; cands is a CandidateList (or a streaming equivalent)."""
+    compact = isinstance(cands, CompactCandidates)
+    required = ["task_id", "task_commit_sha256", "candidate_order", "winner", "timestamp"]
+    required[3:3] = CANDIDATES_FIELDS if compact else ("candidates",)
+    for k in required:
+        if k not in receipt:
+            raise VerifyError("missing_field", f"Missing field: {k}")
+
+    order = receipt.get("candidate_order")
+    if order not in ("as-listed", "lexicographic"):
+        raise VerifyError("invalid_receipt", f"Unsupported candidate_order: {order!r}")
+    if compact:
+        if "candidates" in receipt:
+            raise VerifyError("invalid_receipt", "Pass either candidates or candidates_root, not both")
+        if order != "lexicographic":
+            raise VerifyError("invalid_receipt", "candidates_root requires candidate_order=lexicographic")
+        if receipt.get("allocation_mode", "uniform") != "uniform":
+            raise VerifyError("invalid_receipt", "candidates_root is supported only with allocation_mode=uniform")
+
+    if not cands.is_str_list():
+        raise VerifyError("invalid_receipt", "candidates must be a list[str]")
+
+    if order == "lexicographic":
+        if not cands.is_sorted():
+            raise VerifyError("not_sorted", "Candidates not lexicographically sorted")
+
+    winner = receipt["winner"]
+    cands.prefetch(winner, lambda: planned_indices(receipt, len(cands)))
+    if winner not in cands:
+        raise VerifyError("winner_not_member", "Winner is not in candidates list")
+
+    # Weighted allocation: recompute the alias-table draw
+    mode = receipt.get("allocation_mode", "uniform")
+    if mode not in ("uniform", "weighted"):
+        raise VerifyError("invalid_receipt", f"Unsupported allocation_mode: {mode!r}")
+    winners = receipt.get("winners")
+    rule = receipt.get("allocation_rule")
+    if rule is not None:
+        if rule not in ALLOCATION_RULES:
+            raise VerifyError("unknown_rule", f"Unknown allocation_rule: {rule!r}")
+        try:
+            check_rule_shape(rule, "epoch" in receipt, mode == "uniform" and winners is None)
+        except ValueError as e:
+            raise VerifyError("invalid_receipt", str(e))
+    source = draw_source(receipt)
+    if mode == "weighted":
+        if order != "lexicographic":
+            raise VerifyError("invalid_receipt", "allocation_mode=weighted requires candidate_order=lexicographic")
+        try:
+            weights = check_weights(receipt.get("weights"), len(cands))
+        except ValueError as e:
+            raise VerifyError("bad_weights", str(e))
+        if receipt.get("weights_sha256") != weights_sha256(weights):
+            raise VerifyError("weights_hash_mismatch", "weights_sha256 does not match weights")
+        try:
+            idx = AliasTable.build(weights).pick_index(source)
+        except (TypeError, ValueError):
+            raise VerifyError("invalid_receipt", "task_commit_sha256 must be hex")
+        if cands[idx] != winner:
+            raise VerifyError("winner_mismatch", f"Winner does not match the weighted draw (expected {cands[idx]!r})")
+
+    # Multi-winner (k-of-n): recompute the partial Fisher-Yates draw
+    if winners is not None:
+        if mode != "uniform":
+            raise VerifyError("invalid_receipt", "winners is supported only with allocation_mode=uniform")
+        if not isinstance(winners, list) or not winners or not all(isinstance(x, str) for x in winners):
+            raise VerifyError("invalid_receipt", "winners must be a non-empty list[str]")
+        if winners[0] != winner:
+            raise VerifyError("invalid_receipt", "winner must equal winners[0]")
+        try:
+            expected = [cands[i] for i in sample_k_indices(source, len(cands), len(winners))]
+        except (TypeError, ValueError) as e:
+            raise VerifyError("invalid_receipt", str(e))
+        if expected != winners:
+            raise VerifyError("winner_mismatch", f"winners do not match the k-of-n draw (expected {expected!r})")
+    elif mode == "uniform" and ("epoch" in receipt or rule is not None):
+        # epoch beacon або явний allocation_rule: переможця можна перерахувати
+        rule = rule or RULE_EPOCH
+        try:
+            idx = rule_uniform_index(rule, source, len(cands), receipt.get("re4ctor_random"))
+        except (TypeError, ValueError) as e:
+            raise VerifyError("invalid_receipt", str(e))
+        if compact and receipt["winner_index"] != idx:
+            raise VerifyError("winner_mismatch", f"winner_index does not match the {rule} draw ({idx})")
+        if cands[idx] != winner:
+            raise VerifyError("winner_mismatch", f"Winner does not match the {rule} draw (expected {cands[idx]!r})")
+
+    # Fail-closed: receipt with upstream error is invalid
+    if receipt.get("re4ctor_error"):
+        raise VerifyError("re4ctor_error", f"Receipt has re4ctor_error: {receipt['re4ctor_error']}")
+
+    # Signature verification (required)
+    sig = receipt.get("signature")
+    pk_hex = receipt.get("signer_pubkey_hex")
+    scheme = receipt.get("signature_scheme")
+
+    if not (sig and pk_hex and scheme):
+        raise VerifyError("missing_signature",
+                          "Missing required signature fields: signature, signer_pubkey_hex, signature_scheme")
+
+    if scheme not in SUPPORTED_SCHEMES:
+        raise VerifyError("unsupported_scheme", f"Unsupported signature_scheme: {scheme!r}")
+    if scheme == MERKLE_SIGNATURE_SCHEME and any(k not in receipt for k in MERKLE_FIELDS):
+        raise VerifyError("missing_signature", f"Missing Merkle proof fields: {', '.join(MERKLE_FIELDS)}")
+
+    unsigned = {k: v for k, v in receipt.items() if k not in SIGNATURE_FIELDS}
+    msg_hash = cands.unsigned_digest(unsigned, "cbor" if scheme == CBOR_SIGNATURE_SCHEME else "json")
+
+    try:
+        pk = load_public_key(pk_hex)
+    except (TypeError, ValueError):
+        raise VerifyError("bad_pubkey", "signer_pubkey_hex is not a 32-byte Ed25519 public key")
+
+    if scheme == MERKLE_SIGNATURE_SCHEME:
+        _check_merkle_proof(receipt, msg_hash)
+        if not root_signature_ok(pk_hex, receipt["merkle_root"], sig):
+            raise VerifyError("bad_sig", "Signature over merkle_root does not verify")
+    else:
+        try:
+            pk.verify(bytes.fromhex(sig), msg_hash)
+        except (InvalidSignature, TypeError, ValueError):
+            raise VerifyError("bad_sig", "Signature does not verify")
+
+    # Randomness root of trust: the VRF output must be signed by an allowlisted signer
+    vrf_signer = None
+    if VRF_SIGNERS:
+        try:
+            vrf_signer = check_vrf_signature(receipt, VRF_SIGNERS)
+        except VrfSignatureError as e:
+            raise VerifyError(e.reason, str(e))
+
+    return {
+        "task_id": receipt["task_id"],
+        "candidate_order": order,
+        "allocation_mode": mode,
+        "winner": winner,
+        "winners": winners,
+        "vrf_signer": vrf_signer,
+        # False лише з VRF_MSG_BINDING=none: підпис VRF не покриває re4ctor_random
+        "vrf_bound": None if vrf_signer is None else MSG_BINDING != "none",
+    }
+
+
+def _check_merkle_proof(receipt: dict, msg_hash: bytes) -> None:
+    root_hex, index, size, path = (receipt[k] for k in MERKLE_FIELDS)
+    try:
+        if type(index) is not int or type(size) is not int or not isinstance(path, list):
+            raise ValueError("merkle_leaf_index / merkle_tree_size must be integers, merkle_path a list")
+        root = root_from_path(msg_hash, index, size, [bytes.fromhex(p) for p in path])
+    except (TypeError, ValueError) as e:
+        raise VerifyError("bad_merkle_proof", f"Malformed Merkle proof: {e}")
+    if not isinstance(root_hex, str) or root.hex() != root_hex.lower():
+        raise VerifyError("bad_merkle_proof", "Merkle path does not lead to merkle_root")
+
+
+def main() -> int:
+    if len(sys.argv) != 2:
+        raise SystemExit("Usage: python3 verify/verify_receipt.py <path_to_receipt.json|.cbor>")
+
+    path = sys.argv[1]
+    with open(path, "rb") as f:
+        receipt = load_receipt_bytes(f.read())
+    print_summary(verify_receipt(receipt))
+    return 0
+
+
+def print_summary(summary: dict) -> None:
+    print("OK: receipt valid")
+    print("task_id:", summary["task_id"])
+    print("candidate_order:", summary["candidate_order"])
+    print("allocation_mode:", summary["allocation_mode"])
+    print("winner:", summary["winner"])
+    if summary["winners"] is not None:
+        print("winners:", ", ".join(summary["winners"]))
+    print("signature: ok")
+    if summary.get("vrf_signer"):
+        note = "" if summary.get("vrf_bound") else " (re4ctor_random NOT bound: VRF_MSG_BINDING=none)"
+        print(f"vrf signer: ok {summary['vrf_signer']}{note}")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Commit-reveal checker: do the revealed tasks hash to what was committed?
+
+  --commits  JSONL with task_id + task_commit_sha256 per line: demo/bulk_commit.py
+             --commits output, signed receipts, or any task file (repeatable)
+  reveals    JSONL of task_id, description, reward, nonce_hex (demo/bulk_commit.py
+             --reveals output), or - for stdin
+
+Every reveal is recomputed with the commit layout of verify/task_commit.py and must equal
+the commit on record for its task_id. Reason codes:
+
+  bad_json, bad_reveal  the line does not parse, misses task_id / nonce_hex, or its fields
+                        are not valid UTF-8
+  no_commit             no commit for the task_id
+  commit_mismatch       the recomputed commit differs from the one on record (or from
+                        the reveal's own task_commit_sha256)
+  conflicting_commit    the commits hold two different commits for the task_id
+  duplicate_reveal      the task_id was already revealed
+  unrevealed            (--require-all) a commit that has no reveal
+
+Parsing and hashing run in a process pool, first over the commits, then over the
+reveals; the join by task_id happens in this process, which keeps one 32-byte digest per
+commit (about 150 bytes per task with the dict).
+
+Prints a JSON summary like verify/bulk_verify.py, optionally writes every failure to a
+JSONL side file, and exits 1 when failure_rate > --max-failure-rate (2: no reveals).
+
+Usage:
+  python3 verify/verify_reveals.py --commits commits.jsonl reveals.jsonl [--failures failures.jsonl]
+                                   [--workers 8] [--chunk 2048] [--require-all]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from verify.task_commit import task_commit_sha256  # noqa: E402
+
+# значення в таблиці commits, крім 32-байтного digest
+_REVEALED = object()
+_CONFLICT = object()
+
+Line = Tuple[str, str]      # (source, text)
+
+
+def _digest(value) -> bytes:
+    if not isinstance(value, str) or len(value) != 64:
+        raise ValueError("task_commit_sha256 must be 64 hex chars")
+    return bytes.fromhex(value)
+
+
+def parse_commits(lines: List[Line]) -> Tuple[List[Tuple[str, bytes]], int]:
+    """([(task_id, digest)], lines skipped) for a chunk of commit lines."""
+    out, skipped = [], 0
+    for _, text in lines:
+        try:
+            obj = json.loads(text)
+            task_id = obj["task_id"]
+            if not isinstance(task_id, str):
+                raise TypeError
+            out.append((task_id, _digest(obj["task_commit_sha256"])))
+        except (ValueError, KeyError, TypeError):
+            skipped += 1
+    return out, skipped
+
+
+def check_reveals(lines: List[Line]) -> list:
+    """(source, task_id, recomputed digest, reason, error) per reveal; reason is None when it hashes."""
+    out = []
+    for source, text in lines:
+        try:
+            obj = json.loads(text)
+        except ValueError as e:
+            out.append((source, None, None, "bad_json", str(e)))
+            continue
+        task_id = obj.get("task_id") if isinstance(obj, dict) else None
+        nonce = obj.get("nonce_hex") if isinstance(obj, dict) else None
+        if not isinstance(task_id, str) or not isinstance(nonce, str) or not nonce:
+            out.append((source, task_id, None, "bad_reveal", "a reveal needs task_id and nonce_hex"))
+            continue
+        try:
+            commit = task_commit_sha256(task_id, obj.get("description", ""), obj.get("reward", ""), nonce)
+        except UnicodeEncodeError as e:
+            # самотній сурогат ("\ud800") у полях: такий reveal не міг дати жодного commit
+            out.append((source, task_id, None, "bad_reveal", f"the revealed fields are not valid UTF-8: {e}"))
+            continue
+        claimed = obj.get("task_commit_sha256")
+        if claimed is not None and (not isinstance(claimed, str) or claimed.lower() != commit):
+            out.append((source, task_id, None, "commit_mismatch",
+                        "the revealed fields do not hash to the reveal's task_commit_sha256"))
+            continue
+        out.append((source, task_id, bytes.fromhex(commit), None, None))
+    return out
+
+
+def _lines(paths: List[str]) -> Iterator[Line]:
+    for path in paths:
+        f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+        name = "<stdin>" if path == "-" else path
+        try:
+            for lineno, line in enumerate(f, 1):
+                if line.strip():
+                    yield f"{name}:{lineno}", line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def _chunks(items: Iterator[Line], size: int) -> Iterator[List[Line]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _map(ex, fn, chunks: Iterator[List[Line]], workers: int) -> Iterator:
+    """fn over chunks, results in order; at most workers * 4 chunks in flight."""
+    if ex is None:
+        for chunk in chunks:
+            yield fn(chunk)
+        return
+    pending = deque()
+    for chunk in chunks:
+        pending.append(ex.submit(fn, chunk))
+        while len(pending) >= workers * 4:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class RevealChecker:
+    """The commits table and the join; feed it commits first, then reveals."""
+
+    def __init__(self):
+        self.table = {}
+        self.stats = Counter()
+
+    def add_commits(self, parsed: List[Tuple[str, bytes]]) -> None:
+        table = self.table
+        for task_id, digest in parsed:
+            prev = table.get(task_id)
+            if prev is None:
+                table[task_id] = digest
+                self.stats["commits"] += 1
+            elif prev is not _CONFLICT and prev != digest:
+                table[task_id] = _CONFLICT
+                self.stats["conflicting_commits"] += 1
+
+    def join(self, results: list) -> Iterator[dict]:
+        table = self.table
+        for source, task_id, digest, reason, error in results:
+            if reason is None:
+                rec = table.get(task_id)
+                if rec is None:
+                    reason, error = "no_commit", "no commit for this task_id"
+                elif rec is _REVEALED:
+                    reason, error = "duplicate_reveal", "task_id already revealed"
+                elif rec is _CONFLICT:
+                    reason, error = "conflicting_commit", "the commits hold different commits for this task_id"
+                elif rec != digest:
+                    reason, error = "commit_mismatch", "the revealed fields do not hash to the committed task_commit_sha256"
+                else:
+                    table[task_id] = _REVEALED
+                    yield {"source": source, "ok": True}
+                    continue
+            out = {"source": source, "ok": False, "reason": reason, "error": error}
+            if task_id is not None:
+                out["task_id"] = task_id
+            yield out
+
+    def unrevealed(self) -> Iterator[str]:
+        for task_id, rec in self.table.items():
+            if isinstance(rec, bytes):
+                yield task_id
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Check task reveals against their commits.")
+    ap.add_argument("reveals", nargs="+", help="reveals JSONL files, or - for stdin")
+    ap.add_argument("--commits", action="append", required=True, help="commits JSONL (repeatable)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes (1 = no pool)")
+    ap.add_argument("--chunk", type=int, default=2048, help="lines per task sent to a worker")
+    ap.add_argument("--failures", help="write failed reveals here as JSONL")
+    ap.add_argument("--require-all", action="store_true", help="count commits without a reveal as failures")
+    ap.add_argument("--max-failure-rate", type=float, default=0.0,
+                    help="exit 1 when failed/total is above this (default 0: any failure fails)")
+    args = ap.parse_args(argv)
+
+    checker = RevealChecker()
+    reasons = Counter()
+    total = failed = skipped = 0
+    t0 = time.perf_counter()
+    chunk = max(1, args.chunk)
+    ex = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    # task_id з самотнім сурогатом пишемо як \ud800, а не падаємо на записі
+    failures_f = open(args.failures, "w", encoding="utf-8", errors="backslashreplace") if args.failures else None
+
+    def fail(res: dict) -> None:
+        nonlocal failed
+        failed += 1
+        reasons[res["reason"]] += 1
+        if failures_f is not None:
+            failures_f.write(json.dumps({k: v for k, v in res.items() if k != "ok"}, ensure_ascii=False) + "\n")
+
+    try:
+        for parsed, n_skipped in _map(ex, parse_commits, _chunks(_lines(args.commits), chunk), args.workers):
+            checker.add_commits(parsed)
+            skipped += n_skipped
+        t_commits = time.perf_counter() - t0
+
+        for results in _map(ex, check_reveals, _chunks(_lines(args.reveals), chunk), args.workers):
+            for res in checker.join(results):
+                total += 1
+                if not res["ok"]:
+                    fail(res)
+        unrevealed = 0
+        for task_id in checker.unrevealed():
+            unrevealed += 1
+            if args.require_all:
+                total += 1
+                fail({"source": "commits", "ok": False, "reason": "unrevealed",
+                      "error": "commit without a reveal", "task_id": task_id})
+    finally:
+        if failures_f is not None:
+            failures_f.close()
+        if ex is not None:
+            ex.shutdown(cancel_futures=True)
+    seconds = time.perf_counter() - t0
+
+    failure_rate = failed / total if total else 0.0
+    print(json.dumps({
+        "total": total,
+        "ok": total - failed,
+        "failed": failed,
+        "failure_rate": round(failure_rate, 6),
+        "reasons": dict(reasons.most_common()),
+        "commits": checker.stats["commits"],
+        "conflicting_commits": checker.stats["conflicting_commits"],
+        "commit_lines_skipped": skipped,
+        "unrevealed": unrevealed,
+        "seconds": round(seconds, 3),
+        "commits_seconds": round(t_commits, 3),
+        "reveals_per_sec": round(total / (seconds - t_commits), 1) if seconds > t_commits else None,
+        "workers": args.workers,
+    }, ensure_ascii=False, indent=2))
+
+    if total == 0:
+        print("No reveals found", file=sys.stderr)
+        return 2
+    return 1 if failure_rate > args.max_failure_rate else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
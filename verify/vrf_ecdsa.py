@@ -0,0 +1,454 @@
+"""
+Re4ctoR VRF signer check: recover the secp256k1 (Ethereum-style) signer of a receipt's
+VRF output and compare it with a trusted allowlist.
+
+demo/run_lottery.py stores the VRF response as
+
+    "re4ctor_msg_hash": "<32-byte hex>",
+    "re4ctor_signature": {"type": ..., "v": 27|28, "r": "<hex>", "s": "<hex>", "signer_addr": "0x..."}
+
+The signer is ecrecover(msg_hash, v, r, s) -> keccak256(pubkey)[12:]. It must equal
+signer_addr and be in the allowlist (VRF_SIGNERS: comma-separated addresses, or @file
+with one per line). VRF_MSG_HASH_MODE=eip191 recovers over the "\\x19Ethereum Signed
+Message:\\n32" prefix instead of the raw msg_hash.
+
+The signature covers msg_hash only, so by default (VRF_MSG_BINDING=random|timestamp) the
+check also requires msg_hash == sha256(re4ctor_random || "|" || re4ctor_timestamp), the
+demo/mock_vrf_server.py layout; otherwise the receipt fails as vrf_unbound: a genuine
+signature would not authenticate the randomness the winner was drawn from.
+VRF_MSG_BINDING=none is an explicit opt-out for endpoints that sign another layout; the
+signer is still checked, and verify_receipt reports vrf_bound: false.
+
+Recovery in pure Python costs milliseconds, so two caches sit in front of it (SignerCache):
+  - recovered addresses by (msg_hash, r, s, v) (VRF_RECOVER_CACHE, default 65536): many
+    receipts can share one VRF output;
+  - public keys of signers recovered before: a new signature from a known signer is
+    checked by OpenSSL ECDSA verify (cryptography) against that key instead.
+v is treated as a recovery hint on both paths: a receipt passes when (r, s) is a valid
+signature over msg_hash by signer_addr.
+
+Optional backends, used when installed: coincurve for recovery, pycryptodome for keccak.
+"""
+import hmac
+import os
+import threading
+from collections import OrderedDict
+from hashlib import sha256
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import Prehashed, encode_dss_signature
+
+try:
+    import coincurve
+except ImportError:  # optional
+    coincurve = None
+
+try:
+    from Crypto.Hash import keccak as _pycryptodome_keccak
+except ImportError:  # optional
+    _pycryptodome_keccak = None
+
+
+class VrfSignatureError(ValueError):
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+# ---------- keccak256 ----------
+_RC = [
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+]
+_ROT = [0, 1, 62, 28, 27, 36, 44, 6, 55, 20, 3, 10, 43, 25, 39, 41, 45, 15, 21, 8, 18, 2, 61, 56, 14]
+_MASK = (1 << 64) - 1
+# rho + pi: лінія i (x + 5y) переходить у позицію y + 5 * ((2x + 3y) % 5)
+_PI = [0] * 25
+for _x in range(5):
+    for _y in range(5):
+        _PI[_y + 5 * ((2 * _x + 3 * _y) % 5)] = _x + 5 * _y
+_RATE = 136
+
+
+def _keccak_f(a: list) -> list:
+    for rc in _RC:
+        c = [a[x] ^ a[x + 5] ^ a[x + 10] ^ a[x + 15] ^ a[x + 20] for x in range(5)]
+        d = [c[(x - 1) % 5] ^ (((c[(x + 1) % 5] << 1) | (c[(x + 1) % 5] >> 63)) & _MASK) for x in range(5)]
+        a = [a[i] ^ d[i % 5] for i in range(25)]
+        b = [((a[j] << _ROT[j]) | (a[j] >> (64 - _ROT[j]))) & _MASK if _ROT[j] else a[j] for j in _PI]
+        a = [b[i] ^ (~b[i - i % 5 + (i + 1) % 5] & b[i - i % 5 + (i + 2) % 5]) for i in range(25)]
+        a[0] ^= rc
+    return a
+
+
+def _keccak256_py(data: bytes) -> bytes:
+    # паддінг Keccak (0x01 ... 0x80), не SHA3 (0x06): Ethereum використовує саме його
+    padded = bytearray(data) + b"\x01" + bytes(-(len(data) + 1) % _RATE)
+    padded[-1] |= 0x80
+    state = [0] * 25
+    for off in range(0, len(padded), _RATE):
+        block = padded[off:off + _RATE]
+        for i in range(_RATE // 8):
+            state[i] ^= int.from_bytes(block[8 * i:8 * i + 8], "little")
+        state = _keccak_f(state)
+    return b"".join(state[i].to_bytes(8, "little") for i in range(4))
+
+
+def keccak256(data: bytes) -> bytes:
+    if _pycryptodome_keccak is not None:
+        return _pycryptodome_keccak.new(digest_bits=256, data=data).digest()
+    return _keccak256_py(data)
+
+
+# ---------- secp256k1 ----------
+P = 2 ** 256 - 2 ** 32 - 977
+N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+G = (0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+     0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8)
+
+# Якобіанові координати (X, Y, Z); нескінченність - Z == 0
+_INF = (0, 1, 0)
+
+
+def _double(pt):
+    x, y, z = pt
+    if z == 0 or y == 0:
+        return _INF
+    ysq = y * y % P
+    s = 4 * x * ysq % P
+    m = 3 * x * x % P
+    nx = (m * m - 2 * s) % P
+    ny = (m * (s - nx) - 8 * ysq * ysq) % P
+    return nx, ny, 2 * y * z % P
+
+
+def _add(p1, p2):
+    x1, y1, z1 = p1
+    x2, y2, z2 = p2
+    if z1 == 0:
+        return p2
+    if z2 == 0:
+        return p1
+    z1z1, z2z2 = z1 * z1 % P, z2 * z2 % P
+    u1, u2 = x1 * z2z2 % P, x2 * z1z1 % P
+    s1, s2 = y1 * z2 * z2z2 % P, y2 * z1 * z1z1 % P
+    if u1 == u2:
+        return _double(p1) if s1 == s2 else _INF
+    h, r = (u2 - u1) % P, (s2 - s1) % P
+    hh = h * h % P
+    hhh = h * hh % P
+    v = u1 * hh % P
+    nx = (r * r - hhh - 2 * v) % P
+    ny = (r * (v - nx) - s1 * hhh) % P
+    return nx, ny, h * z1 * z2 % P
+
+
+def _add_affine(p1, x2: int, y2: int):
+    """p1 (Jacobian) + (x2, y2) (affine): the fixed-base table is affine, so Z2 = 1."""
+    x1, y1, z1 = p1
+    if z1 == 0:
+        return x2, y2, 1
+    z1z1 = z1 * z1 % P
+    u2, s2 = x2 * z1z1 % P, y2 * z1 * z1z1 % P
+    if x1 == u2:
+        return _double(p1) if y1 == s2 else _INF
+    h, r = (u2 - x1) % P, (s2 - y1) % P
+    hh = h * h % P
+    hhh = h * hh % P
+    v = x1 * hh % P
+    nx = (r * r - hhh - 2 * v) % P
+    ny = (r * (v - nx) - y1 * hhh) % P
+    return nx, ny, h * z1 % P
+
+
+def _affine(pt) -> Optional[Tuple[int, int]]:
+    x, y, z = pt
+    if z == 0:
+        return None
+    zi = pow(z, -1, P)
+    zi2 = zi * zi % P
+    return x * zi2 % P, y * zi2 * zi % P
+
+
+_G_TABLE = None
+
+
+def _g_table():
+    # 32 вікна по 8 біт: k*G - не більше 32 додавань і жодного подвоєння (будується раз на процес)
+    global _G_TABLE
+    if _G_TABLE is None:
+        table, base = [], (G[0], G[1], 1)
+        for _ in range(32):
+            row, acc = [None], _INF
+            for _ in range(255):
+                acc = _add(acc, base)
+                row.append(_affine(acc))
+            table.append(row)
+            for _ in range(8):
+                base = _double(base)
+        _G_TABLE = table
+    return _G_TABLE
+
+
+def _mul_g(k: int):
+    table, acc = _g_table(), _INF
+    for i in range(32):
+        b = (k >> (8 * i)) & 0xFF
+        if b:
+            acc = _add_affine(acc, *table[i][b])
+    return acc
+
+
+def _mul(pt, k: int):
+    # вікно 4 біти: 15 попередньо обчислених кратних
+    mults = [_INF, pt]
+    for _ in range(14):
+        mults.append(_add(mults[-1], pt))
+    acc = _INF
+    for shift in range((k.bit_length() + 3) // 4 * 4 - 4, -4, -4):
+        for _ in range(4):
+            acc = _double(acc)
+        nib = (k >> shift) & 0xF
+        if nib:
+            acc = _add(acc, mults[nib])
+    return acc
+
+
+def _recover_py(z: int, r: int, s: int, recid: int) -> Tuple[int, int]:
+    x = r + (recid >> 1) * N
+    if x >= P:
+        raise VrfSignatureError("bad_vrf_signature", "r is out of range for this recovery id")
+    alpha = (pow(x, 3, P) + 7) % P
+    y = pow(alpha, (P + 1) // 4, P)
+    if y * y % P != alpha:
+        raise VrfSignatureError("bad_vrf_signature", "r is not the x coordinate of a curve point")
+    if y & 1 != recid & 1:
+        y = P - y
+    r_inv = pow(r, -1, N)
+    q = _add(_mul_g(-z * r_inv % N), _mul((x, y, 1), s * r_inv % N))
+    pub = _affine(q)
+    if pub is None:
+        raise VrfSignatureError("bad_vrf_signature", "recovered point at infinity")
+    return pub
+
+
+def recover_pubkey(msg_hash: bytes, r: int, s: int, recid: int) -> bytes:
+    """Uncompressed public key X || Y (64 bytes) that produced (r, s) over msg_hash."""
+    if not (0 < r < N and 0 < s < N and 0 <= recid <= 3):
+        raise VrfSignatureError("bad_vrf_signature", "r, s or v out of range")
+    if coincurve is not None:
+        sig = r.to_bytes(32, "big") + s.to_bytes(32, "big") + bytes((recid,))
+        try:
+            return coincurve.PublicKey.from_signature_and_message(sig, msg_hash, hasher=None).format(False)[1:]
+        except Exception as e:
+            raise VrfSignatureError("bad_vrf_signature", f"ecrecover failed: {e}")
+    x, y = _recover_py(int.from_bytes(msg_hash, "big"), r, s, recid)
+    return x.to_bytes(32, "big") + y.to_bytes(32, "big")
+
+
+def address_of(pubkey64: bytes) -> str:
+    return "0x" + keccak256(pubkey64)[12:].hex()
+
+
+def sign_recoverable(priv: int, msg_hash: bytes) -> Tuple[int, int, int]:
+    """(r, s, v) with v = 27 + recovery id; RFC 6979 nonce. For mocks, tests and benchmarks."""
+    z = int.from_bytes(msg_hash, "big")
+    k = _rfc6979_nonce(priv, msg_hash)
+    rx, ry = _affine(_mul_g(k))
+    r = rx % N
+    s = pow(k, -1, N) * (z + r * priv) % N
+    recid = (ry & 1) | (2 if rx >= N else 0)
+    if s > N // 2:  # low-s, як в Ethereum
+        s, recid = N - s, recid ^ 1
+    return r, s, 27 + recid
+
+
+def _rfc6979_nonce(priv: int, msg_hash: bytes) -> int:
+    x = priv.to_bytes(32, "big")
+    h = (int.from_bytes(msg_hash, "big") % N).to_bytes(32, "big")
+    v, k = b"\x01" * 32, b"\x00" * 32
+    k = hmac.new(k, v + b"\x00" + x + h, sha256).digest()
+    v = hmac.new(k, v, sha256).digest()
+    k = hmac.new(k, v + b"\x01" + x + h, sha256).digest()
+    v = hmac.new(k, v, sha256).digest()
+    while True:
+        v = hmac.new(k, v, sha256).digest()
+        t = int.from_bytes(v, "big")
+        if 0 < t < N:
+            return t
+        k = hmac.new(k, v + b"\x00", sha256).digest()
+        v = hmac.new(k, v, sha256).digest()
+
+
+def public_address(priv: int) -> str:
+    x, y = _affine(_mul_g(priv))
+    return address_of(x.to_bytes(32, "big") + y.to_bytes(32, "big"))
+
+
+# ---------- receipt check ----------
+def _int(value, what: str) -> int:
+    try:
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(value, str):
+            return int(value, 16) if value.lower().startswith("0x") or len(value) > 8 else int(value)
+    except ValueError:
+        pass
+    raise VrfSignatureError("bad_vrf_signature", f"re4ctor_signature.{what} must be an integer or hex string")
+
+
+def _normalize_addr(addr) -> str:
+    if not isinstance(addr, str):
+        raise VrfSignatureError("bad_vrf_signature", "re4ctor_signature.signer_addr must be a hex address")
+    a = addr.lower()
+    a = a if a.startswith("0x") else "0x" + a
+    if len(a) != 42:
+        raise VrfSignatureError("bad_vrf_signature", "re4ctor_signature.signer_addr must be 20 bytes")
+    return a
+
+
+def trusted_signers_from_env() -> FrozenSet[str]:
+    raw = os.getenv("VRF_SIGNERS", "").strip()
+    if raw.startswith("@"):
+        with open(raw[1:], "r", encoding="utf-8") as f:
+            raw = ",".join(line.split("#")[0].strip() for line in f)
+    return frozenset(_normalize_addr(a.strip()) for a in raw.split(",") if a.strip())
+
+
+MSG_HASH_MODE = os.getenv("VRF_MSG_HASH_MODE", "raw")
+MSG_BINDINGS = ("random|timestamp", "none")
+MSG_BINDING = os.getenv("VRF_MSG_BINDING", "random|timestamp")
+if MSG_BINDING not in MSG_BINDINGS:
+    raise ValueError(f"Unsupported VRF_MSG_BINDING: {MSG_BINDING!r} (expected one of {', '.join(MSG_BINDINGS)})")
+RECOVER_CACHE_SIZE = int(os.getenv("VRF_RECOVER_CACHE", "65536"))
+
+_ECDSA = ec.ECDSA(Prehashed(hashes.SHA256()))
+
+
+def _signed_digest(msg_hash: bytes) -> bytes:
+    if MSG_HASH_MODE == "eip191":
+        return keccak256(b"\x19Ethereum Signed Message:\n32" + msg_hash)
+    return msg_hash
+
+
+class SignerCache:
+    """
+    Recovered signer addresses by (msg_hash, r, s, v), LRU, plus the public keys of every
+    signer recovered so far (few VRF signers, so that dict stays small).
+    """
+
+    def __init__(self, max_entries: int = RECOVER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._addrs: "OrderedDict[Tuple[str, int, int, int], str]" = OrderedDict()
+        self._keys: Dict[str, ec.EllipticCurvePublicKey] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "verified": 0, "recovered": 0}
+
+    def signer(self, msg_hash_hex: str, r: int, s: int, v: int, claimed: str) -> str:
+        """The address that signed msg_hash; claimed is tried first when its key is known."""
+        cache_key = (msg_hash_hex, r, s, v)
+        with self._lock:
+            addr = self._addrs.get(cache_key)
+            if addr is not None:
+                self._addrs.move_to_end(cache_key)
+                self.stats["hits"] += 1
+                return addr
+            key = self._keys.get(claimed)
+        digest = _signed_digest(bytes.fromhex(msg_hash_hex))
+        if key is not None and _verifies(key, digest, r, s):
+            self.stats["verified"] += 1
+            addr = claimed
+        else:
+            self.stats["recovered"] += 1
+            recid = v - 27 if v >= 27 else v
+            addr, pub = self._recover(digest, r, s, recid)
+            if addr != claimed:
+                # v - лише підказка для recovery: перевіряємо підпис (r, s), як і швидкий шлях
+                other, other_pub = self._recover(digest, r, s, recid ^ 1)
+                if other == claimed:
+                    addr, pub = other, other_pub
+            with self._lock:
+                if addr not in self._keys:
+                    x, y = int.from_bytes(pub[:32], "big"), int.from_bytes(pub[32:], "big")
+                    self._keys[addr] = ec.EllipticCurvePublicNumbers(x, y, ec.SECP256K1()).public_key()
+        with self._lock:
+            self._addrs[cache_key] = addr
+            while len(self._addrs) > self.max_entries:
+                self._addrs.popitem(last=False)
+        return addr
+
+    @staticmethod
+    def _recover(digest: bytes, r: int, s: int, recid: int) -> Tuple[str, bytes]:
+        try:
+            pub = recover_pubkey(digest, r, s, recid)
+        except VrfSignatureError:
+            return "", b""
+        return address_of(pub), pub
+
+
+def _verifies(key: ec.EllipticCurvePublicKey, digest: bytes, r: int, s: int) -> bool:
+    try:
+        key.verify(encode_dss_signature(r, s), digest, _ECDSA)
+        return True
+    except InvalidSignature:
+        return False
+
+
+SIGNER_CACHE = SignerCache()
+
+
+def _check_binding(receipt: dict, msg_hash_hex: str, binding: str) -> None:
+    if binding == "none":
+        return
+    if binding not in MSG_BINDINGS:
+        raise ValueError(f"Unsupported VRF_MSG_BINDING: {binding!r} (expected one of {', '.join(MSG_BINDINGS)})")
+    rnd, ts = receipt.get("re4ctor_random"), receipt.get("re4ctor_timestamp")
+    if not isinstance(rnd, str) or not isinstance(ts, str):
+        raise VrfSignatureError("vrf_unbound", "re4ctor_random and re4ctor_timestamp are required")
+    try:
+        expected = sha256(f"{rnd}|{ts}".encode("utf-8")).hexdigest()
+    except UnicodeEncodeError:
+        raise VrfSignatureError("vrf_unbound", "re4ctor_random / re4ctor_timestamp are not valid UTF-8")
+    if msg_hash_hex != expected:
+        raise VrfSignatureError("vrf_unbound",
+                                "re4ctor_msg_hash is not sha256(re4ctor_random | re4ctor_timestamp)")
+
+
+def check_vrf_signature(receipt: dict, trusted: FrozenSet[str], cache: Optional[SignerCache] = None,
+                        binding: Optional[str] = None) -> str:
+    """
+    The VRF signer address; VrfSignatureError unless it signed re4ctor_msg_hash and is
+    trusted (and, per binding / VRF_MSG_BINDING, msg_hash is the hash of re4ctor_random).
+    """
+    sig = receipt.get("re4ctor_signature")
+    msg_hash_hex = receipt.get("re4ctor_msg_hash")
+    if not isinstance(sig, dict) or not msg_hash_hex:
+        raise VrfSignatureError("missing_vrf_signature", "re4ctor_signature and re4ctor_msg_hash are required")
+    claimed = _normalize_addr(sig.get("signer_addr"))
+    if claimed not in trusted:
+        raise VrfSignatureError("untrusted_vrf_signer", f"VRF signer {claimed} is not in the trusted allowlist")
+    try:
+        h = msg_hash_hex[2:] if msg_hash_hex.lower().startswith("0x") else msg_hash_hex
+        if len(bytes.fromhex(h)) != 32:
+            raise ValueError
+    except (AttributeError, ValueError):
+        raise VrfSignatureError("bad_vrf_signature", "re4ctor_msg_hash must be 32 bytes of hex")
+    # дешева перевірка до recovery: підписаний хеш має належати саме цьому random
+    _check_binding(receipt, h.lower(), MSG_BINDING if binding is None else binding)
+    r, s, v = _int(sig.get("r"), "r"), _int(sig.get("s"), "s"), _int(sig.get("v"), "v")
+    if v not in (0, 1, 27, 28) or not (0 < r < N and 0 < s < N):
+        raise VrfSignatureError("bad_vrf_signature", "r, s or v out of range")
+
+    addr = (cache or SIGNER_CACHE).signer(h.lower(), r, s, v, claimed)
+    if not addr:
+        raise VrfSignatureError("bad_vrf_signature", "VRF signature does not recover to any key")
+    if addr != claimed:
+        raise VrfSignatureError("vrf_signer_mismatch", f"VRF signature recovers to {addr}, not signer_addr {claimed}")
+    return addr
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Winner re-derivation audit: recompute every receipt's winner with the selection rule that
+produced it, across receipt archives.
+
+The rule version (verify/selection.py) comes from, in this order:
+  1. allocation_rule             commit-v0 | vrf-sha256-v0 | epoch-beacon-v0
+  2. epoch                       epoch-beacon-v0
+  3. note                        the fixed notes of /allocate, demo/run_lottery.py and
+                                 demo/epoch_lottery.py (NOTE_RULES)
+  4. inferred                    vrf-sha256-v0 when the receipt carries re4ctor_random,
+                                 else commit-v0
+
+The winner (winners for k-of-n, winner_index for compact receipts) must equal the draw:
+uniform / weighted / k-of-n over task_commit_sha256 or the epoch draw, or
+sha256(commit | vrf random)[:8] % n for vrf-sha256-v0. Reason codes:
+
+  bad_json, invalid_receipt   the receipt does not parse / lacks what the rule needs
+  unknown_rule                allocation_rule is not a known rule version
+  missing_randomness          a VRF or epoch rule without re4ctor_random
+  winner_mismatch             the winner is not the one the rule picks
+
+Every receipt of an epoch must carry the same beacon (re4ctor_random): an epoch drawn
+from two beacons was re-rolled. Such epochs are listed under epoch_beacon_conflicts
+(and in the failures file) and fail the run whatever --max-failure-rate says.
+
+Only the draw is checked: no signatures, no Merkle proofs (verify/bulk_verify.py does
+those), so a receipt costs one JSON parse and a hash or two. Workers send back counters
+and failures only. Inputs are the same as verify/bulk_verify.py.
+
+Prints a JSON summary (per rule and per detection source), optionally writes every
+failure to a JSONL side file, and exits 1 when failure_rate > --max-failure-rate
+(2: no receipts).
+
+Usage:
+  python3 verify/winner_audit.py receipts/ more/*.jsonl [--failures failures.jsonl]
+                                 [--workers 8] [--chunk 1024] [--max-failure-rate 0.0]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from verify.bulk_verify import Item, _chunks, iter_items  # noqa: E402
+from verify.canonical import orjson  # noqa: E402
+from verify.selection import (  # noqa: E402
+    ALLOCATION_RULES, RULE_COMMIT, RULE_EPOCH, RULE_VRF_SHA256, AliasTable, check_rule_shape, check_weights,
+    rule_uniform_index, sample_k_indices,
+)
+from verify.verify_receipt import VerifyError, draw_source, load_receipt_bytes  # noqa: E402
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+# незмінні note з коду, що видавав receipts до появи allocation_rule
+NOTE_RULES = (
+    ("commit + vrf_random", RULE_VRF_SHA256),          # demo/run_lottery.py
+    ("commit + epoch + beacon random", RULE_EPOCH),    # demo/epoch_lottery.py
+    ("deterministic mock allocation", RULE_COMMIT),    # POST /allocate
+    ("Mock VRF seed=task_commit_sha256", RULE_COMMIT),  # ранній demo/sample_receipt.json
+)
+
+
+def detect_rule(receipt: dict) -> Tuple[str, str]:
+    """(rule, how it was detected: field | epoch | note | inferred)."""
+    rule = receipt.get("allocation_rule")
+    if rule is not None:
+        return rule, "field"
+    if "epoch" in receipt:
+        return RULE_EPOCH, "epoch"
+    note = receipt.get("note")
+    if isinstance(note, str):
+        for needle, rule in NOTE_RULES:
+            if needle in note:
+                return rule, "note"
+    if receipt.get("re4ctor_random"):
+        return RULE_VRF_SHA256, "inferred"
+    return RULE_COMMIT, "inferred"
+
+
+def rederive(receipt: dict, rule: str) -> None:
+    """Raises VerifyError unless the receipt's winner(s) are what rule draws."""
+    if rule not in ALLOCATION_RULES:
+        raise VerifyError("unknown_rule", f"Unknown allocation_rule: {rule!r}")
+    if not isinstance(receipt.get("task_commit_sha256"), str) or "winner" not in receipt:
+        raise VerifyError("invalid_receipt", "task_commit_sha256 and winner are required")
+    if rule != RULE_COMMIT and not receipt.get("re4ctor_random"):
+        raise VerifyError("missing_randomness", f"allocation_rule {rule} needs re4ctor_random")
+
+    compact = "candidates_root" in receipt
+    cands = None if compact else receipt.get("candidates")
+    n = receipt.get("candidates_count") if compact else (len(cands) if isinstance(cands, list) else None)
+    if type(n) is not int or n < 1:
+        raise VerifyError("invalid_receipt", "candidates (or candidates_count) must be a non-empty list")
+    mode = receipt.get("allocation_mode") or "uniform"
+    winners = receipt.get("winners")
+    if winners is not None and (not isinstance(winners, list) or not winners):
+        raise VerifyError("invalid_receipt", "winners must be a non-empty list")
+
+    try:
+        check_rule_shape(rule, "epoch" in receipt, mode == "uniform" and winners is None)
+        source = draw_source(receipt)
+        if mode == "weighted":
+            idx = [AliasTable.build(check_weights(receipt.get("weights"), n)).pick_index(source)]
+        elif mode != "uniform":
+            raise ValueError(f"Unsupported allocation_mode: {mode!r}")
+        elif winners is not None:
+            idx = sample_k_indices(source, n, len(winners))
+        else:
+            idx = [rule_uniform_index(rule, source, n, receipt.get("re4ctor_random"))]
+    except (TypeError, ValueError) as e:
+        raise VerifyError("invalid_receipt", str(e))
+
+    if compact:
+        # без повного списку звіряємо позицію; членство за доказом перевіряє verify_receipt
+        if receipt.get("winner_index") != idx[0]:
+            raise VerifyError("winner_mismatch", f"winner_index is not the {rule} draw ({idx[0]})")
+        return
+    expected = [cands[i] for i in idx]
+    got = winners if winners is not None else [receipt["winner"]]
+    if got != expected or receipt["winner"] != expected[0]:
+        raise VerifyError("winner_mismatch", f"winner is not the {rule} draw (expected {expected!r})")
+
+
+def _receipts(item: Item):
+    if item[0] == "file":
+        with open(item[1], "rb") as f:
+            obj = load_receipt_bytes(f.read())
+        if isinstance(obj, list):
+            for i, r in enumerate(obj):
+                yield f"{item[1]}[{i}]", r
+        else:
+            yield item[1], obj
+    else:
+        yield item[1], _loads(item[2])
+
+
+def audit_chunk(items: List[Item]) -> tuple:
+    """(ok per rule, failed per rule, detected-by counts, reasons, failures, epoch -> beacons) for a chunk."""
+    ok, failed, how, reasons, failures = Counter(), Counter(), Counter(), Counter(), []
+    beacons: Dict[str, Set[str]] = {}
+    for item in items:
+        try:
+            pairs = list(_receipts(item))
+        except (OSError, ValueError) as e:
+            pairs = [(item[1], VerifyError("bad_json", str(e)))]
+        except VerifyError as e:
+            pairs = [(item[1], e)]
+        for source, receipt in pairs:
+            rule = None
+            try:
+                if isinstance(receipt, VerifyError):
+                    raise receipt
+                if not isinstance(receipt, dict):
+                    raise VerifyError("invalid_receipt", "receipt must be a JSON object")
+                rule, by = detect_rule(receipt)
+                how[by] += 1
+                epoch, rnd = receipt.get("epoch"), receipt.get("re4ctor_random")
+                if isinstance(epoch, str) and isinstance(rnd, str) and rnd:
+                    beacons.setdefault(epoch, set()).add(rnd)
+                rederive(receipt, rule)
+                ok[rule] += 1
+                continue
+            except VerifyError as e:
+                reason, error = e.reason, str(e)
+            key = rule if isinstance(rule, str) else "-"
+            failed[key] += 1
+            reasons[reason] += 1
+            out = {"source": source, "reason": reason, "error": error}
+            if rule is not None:
+                out["rule"] = rule
+            if isinstance(receipt, dict) and "task_id" in receipt:
+                out["task_id"] = receipt["task_id"]
+            failures.append(out)
+    return ok, failed, how, reasons, failures, beacons
+
+
+def run(inputs: List[str], workers: int, chunk_size: int):
+    """audit_chunk results in input order; at most workers * 4 chunks in flight."""
+    chunks = _chunks(iter_items(inputs), chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            yield audit_chunk(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(ex.submit(audit_chunk, chunk))
+            while len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Recompute receipt winners under their selection rule version.")
+    ap.add_argument("inputs", nargs="+", help="receipt files / dirs / globs, or - for stdin (JSONL)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes (1 = no pool)")
+    ap.add_argument("--chunk", type=int, default=1024, help="inputs (lines / files) per worker task")
+    ap.add_argument("--failures", help="write failed receipts here as JSONL")
+    ap.add_argument("--max-failure-rate", type=float, default=0.0,
+                    help="exit 1 when failed/total is above this (default 0: any failure fails)")
+    args = ap.parse_args(argv)
+
+    ok, failed, how, reasons = Counter(), Counter(), Counter(), Counter()
+    beacons: Dict[str, Set[str]] = {}
+    t0 = time.perf_counter()
+    failures_f = open(args.failures, "w", encoding="utf-8") if args.failures else None
+    try:
+        for c_ok, c_failed, c_how, c_reasons, c_failures, c_beacons in run(args.inputs, args.workers,
+                                                                            max(1, args.chunk)):
+            ok.update(c_ok)
+            failed.update(c_failed)
+            how.update(c_how)
+            reasons.update(c_reasons)
+            for epoch, rnds in c_beacons.items():
+                beacons.setdefault(epoch, set()).update(rnds)
+            if failures_f is not None:
+                for f in c_failures:
+                    failures_f.write(json.dumps(f, ensure_ascii=False) + "\n")
+        conflicts = {epoch: sorted(rnds) for epoch, rnds in sorted(beacons.items()) if len(rnds) > 1}
+        if failures_f is not None:
+            for epoch, rnds in conflicts.items():
+                failures_f.write(json.dumps({"epoch": epoch, "reason": "epoch_beacon_conflict",
+                                             "re4ctor_random": rnds}, ensure_ascii=False) + "\n")
+    finally:
+        if failures_f is not None:
+            failures_f.close()
+    seconds = time.perf_counter() - t0
+
+    n_ok, n_failed = sum(ok.values()), sum(failed.values())
+    total = n_ok + n_failed
+    failure_rate = n_failed / total if total else 0.0
+    print(json.dumps({
+        "total": total,
+        "ok": n_ok,
+        "failed": n_failed,
+        "failure_rate": round(failure_rate, 6),
+        "reasons": dict(reasons.most_common()),
+        "rules": {r: {"ok": ok[r], "failed": failed[r]} for r in sorted(set(ok) | set(failed))},
+        "detected_by": dict(how.most_common()),
+        "epochs": len(beacons),
+        "epoch_beacon_conflicts": {epoch: len(rnds) for epoch, rnds in conflicts.items()},
+        "seconds": round(seconds, 3),
+        "receipts_per_sec": round(total / seconds, 1) if seconds > 0 else None,
+        "workers": args.workers,
+    }, ensure_ascii=False, indent=2))
+
+    if total == 0:
+        print("No receipts found", file=sys.stderr)
+        return 2
+    return 1 if failure_rate > args.max_failure_rate or conflicts else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())